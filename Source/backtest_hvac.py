@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: backtest_hvac.py                                                 *
+* Purpose:   Runs the HVAC policy over years of recorded or synthetic         *
+*            weather in one vectorized pass, to tune its thresholds.          *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs
+import systime
+import temperature
+
+import argparse
+import csv
+import itertools
+import sys
+import time
+
+import numpy as np
+
+# names of the HVAC flags in the report
+d_FlagNames = {configs.i_DoNothingFlag: "nothing",
+               configs.i_HeatFlag:      "heat",
+               configs.i_CoolFlag:      "cool"}
+
+'''*****************************************************************
+* Name: DefaultParameters
+* Description: Returns the configured policy parameters, named like the
+*              keyword arguments of temperature.DecideHVAC.
+* Parameters:  N/A
+* Returns:     dict d_Params
+*****************************************************************'''
+def DefaultParameters():
+  return {"f_HeatSetting":        configs.f_HeatSetting,
+          "f_CoolSetting":        configs.f_CoolSetting,
+          "f_HeatThreshold":      configs.f_HeatThreshold,
+          "f_CoolThreshold":      configs.f_CoolThreshold,
+          "f_TemperatureSetback": configs.f_TemperatureSetback,
+          "f_HumThreshold_Pct":   configs.f_HumThreshold_Pct}
+
+'''*****************************************************************
+* Name: SyntheticWeather
+* Description: Makes hourly outdoor weather with a yearly and a daily
+*              cycle and a few days of persistent weather noise.
+* Parameters:  float f_Years
+*                    Length of the record.
+*              int   i_Seed
+*                    Seed for the random numbers.
+*              float f_Start
+*                    Time the record starts at, Jan 1 of this year by
+*                    default.
+* Returns:     dict  d_Weather
+*                    a_Time, a_Temp_F and a_Humidity_Pct arrays.
+*****************************************************************'''
+def SyntheticWeather(f_Years = 5, i_Seed = 0, f_Start = None):
+  if(f_Start == None):
+    f_Start = time.mktime((time.localtime().tm_year, 1, 1, 0, 0, 0, 0, 0, -1))
+  o_Random = np.random.default_rng(i_Seed)
+  i_Hours  = int(f_Years * 8766)
+  a_Time   = f_Start + 3600.0 * np.arange(i_Hours)
+
+  a_DayOfYear = (a_Time - f_Start) / 86400.0 % 365.25
+  a_HourOfDay = (a_Time - f_Start) / 3600.0 % 24
+  # coldest around Jan 20, warmest in the afternoon
+  a_Yearly = -22 * np.cos(2 * np.pi * (a_DayOfYear - 20) / 365.25)
+  a_Daily  = -9 * np.cos(2 * np.pi * (a_HourOfDay - 3) / 24)
+
+  # weather that lasts a few days: an AR(1) process with a ~3 day memory
+  f_Memory = np.exp(-1 / 72.0)
+  a_Shock  = o_Random.normal(0, 6 * np.sqrt(1 - f_Memory ** 2), i_Hours)
+  a_Weather = np.empty(i_Hours)
+  f_Value = 0.0
+  for i in range(i_Hours):
+    f_Value = f_Memory * f_Value + a_Shock[i]
+    a_Weather[i] = f_Value
+
+  # sensor readings are whole degrees C, shown in F
+  a_Temp_C = np.round((50 + a_Yearly + a_Daily + a_Weather - 32) / 1.8)
+  a_Temp_F = 1.8 * a_Temp_C + 32
+
+  # humidity is highest in the early morning and on mild days
+  a_Humidity = 65 - 15 * np.cos(2 * np.pi * (a_HourOfDay - 15) / 24) + o_Random.normal(0, 12, i_Hours)
+  a_Humidity = np.round(np.clip(a_Humidity, 5, 100))
+  return {"a_Time": a_Time, "a_Temp_F": a_Temp_F, "a_Humidity_Pct": a_Humidity}
+
+'''*****************************************************************
+* Name: LoadCSV
+* Description: Loads recorded weather from a CSV file with the columns
+*              time,temperature_f,humidity_pct. Times are seconds since
+*              the epoch.
+* Parameters:  str  s_Path
+* Returns:     dict d_Weather
+*****************************************************************'''
+def LoadCSV(s_Path):
+  l_Time, l_Temp, l_Humidity = [], [], []
+  with open(s_Path, newline = "") as o_File:
+    for d_Row in csv.DictReader(o_File):
+      if(d_Row["temperature_f"] == "" or d_Row["humidity_pct"] == ""):
+        continue
+      l_Time.append(float(d_Row["time"]))
+      l_Temp.append(float(d_Row["temperature_f"]))
+      l_Humidity.append(float(d_Row["humidity_pct"]))
+  a_Order = np.argsort(l_Time, kind = "stable")
+  return {"a_Time":         np.asarray(l_Time)[a_Order],
+          "a_Temp_F":       np.asarray(l_Temp)[a_Order],
+          "a_Humidity_Pct": np.asarray(l_Humidity)[a_Order]}
+
+'''*****************************************************************
+* Name: LoadHistory
+* Description: Loads the outdoor readings recorded by main.py.
+* Parameters:  str  s_Directory
+*                   History directory, see configs.s_HistoryDirectory.
+* Returns:     dict d_Weather
+*****************************************************************'''
+def LoadHistory(s_Directory = configs.s_HistoryDirectory):
+  import timeseries
+  o_Store = timeseries.TimeSeriesStore(s_Directory)
+  try:
+    a_Time, a_Temp = o_Store.query("outdoor_temp_f", 0.0)
+    a_HumTime, a_Humidity = o_Store.query("outdoor_humidity_pct", 0.0)
+  finally:
+    o_Store.close()
+  a_Time = np.frombuffer(a_Time, dtype = np.float64)
+  if(len(a_Time) == 0):
+    return {"a_Time": a_Time, "a_Temp_F": a_Time.copy(), "a_Humidity_Pct": a_Time.copy()}
+  # both channels are appended in the same cycle, a moment apart
+  a_Humidity = np.interp(a_Time, np.frombuffer(a_HumTime, dtype = np.float64),
+                         np.frombuffer(a_Humidity, dtype = np.float64))
+  return {"a_Time": a_Time, "a_Temp_F": np.frombuffer(a_Temp, dtype = np.float64).copy(),
+          "a_Humidity_Pct": a_Humidity}
+
+'''*****************************************************************
+* Name: Calendar
+* Description: Local month and hour of every time, the way Systime sees
+*              them.
+* Parameters:  array a_Time
+*                    Seconds since the epoch.
+* Returns:     array a_Month
+*                    1 to 12.
+*              array a_Hour
+*                    0 to 23.
+*****************************************************************'''
+def Calendar(a_Time):
+  # the UTC offset only changes with daylight saving time, so it is looked
+  # up once per day rather than once per sample
+  a_Day = np.floor(a_Time / 86400.0).astype(np.int64)
+  a_Days, a_Index = np.unique(a_Day, return_inverse = True)
+  a_Offset = np.array([time.localtime(86400.0 * i_Day + 43200).tm_gmtoff for i_Day in a_Days])
+  a_Local = (a_Time + a_Offset[a_Index]).astype("datetime64[s]")
+  a_Month = a_Local.astype("datetime64[M]").astype(np.int64) % 12 + 1
+  a_Hour  = a_Local.astype("datetime64[h]").astype(np.int64) % 24
+  return a_Month, a_Hour
+
+'''*****************************************************************
+* Name: SeasonsOf
+* Description: Vectorized systime.SeasonOf.
+* Parameters:  array a_Month
+* Returns:     array a_Season
+*****************************************************************'''
+def SeasonsOf(a_Month):
+  return np.where((a_Month < configs.i_StartSummerMonth) | (a_Month > configs.i_EndSummerMonth),
+                  configs.i_WintertimeFlag, configs.i_SummertimeFlag)
+
+'''*****************************************************************
+* Name: TimeFlagsOf
+* Description: Vectorized systime.TimeFlagOf.
+* Parameters:  array a_Hour
+* Returns:     array a_TimeFlag
+*****************************************************************'''
+def TimeFlagsOf(a_Hour):
+  return np.where((a_Hour > configs.i_NighttimeHour) | (a_Hour < configs.i_MorningHour),
+                  configs.i_NightFlag, configs.i_DaytimeFlag)
+
+'''*****************************************************************
+* Name: DecideHVACVectorized
+* Description: temperature.DecideHVAC over whole arrays. The branches of
+*              the scalar function become masks; a temperature of exactly
+*              f_HeatThreshold falls through to the cooling case there,
+*              and does here too.
+* Parameters:  array a_Temp
+*              array a_Humidity
+*              array a_Season
+*              array a_TimeFlag
+*              dict  d_Params
+*                    Policy parameters, see DefaultParameters.
+* Returns:     array a_Flag
+*              array a_Setting
+*****************************************************************'''
+def DecideHVACVectorized(a_Temp, a_Humidity, a_Season, a_TimeFlag, d_Params):
+  f_Setback = d_Params["f_TemperatureSetback"]
+  b_Night   = a_TimeFlag == configs.i_NightFlag
+  b_Summer  = a_Season == configs.i_SummertimeFlag
+
+  b_Cold = a_Temp < d_Params["f_HeatThreshold"]
+  b_Mild = ~b_Cold & (a_Temp > d_Params["f_HeatThreshold"]) & (a_Temp < d_Params["f_CoolThreshold"])
+  b_Hot  = ~b_Cold & ~b_Mild
+
+  # case 1: heat in winter, with the night setback
+  b_HeatIdle = b_Cold & b_Summer
+  b_Heat     = b_Cold & ~b_Summer
+  a_Heat     = np.where(b_Night, d_Params["f_HeatSetting"] - f_Setback, d_Params["f_HeatSetting"])
+
+  # case 2: only cool on humid days
+  b_MildIdle = b_Mild & ((a_Humidity < d_Params["f_HumThreshold_Pct"]) | b_Night)
+  b_Dehumid  = b_Mild & ~b_MildIdle
+
+  # case 3: cool, raised at night and lowered when humid, in that order
+  a_Cool = np.where(b_Night, d_Params["f_CoolSetting"] + f_Setback, d_Params["f_CoolSetting"])
+  a_Cool = np.where(a_Humidity > d_Params["f_HumThreshold_Pct"], a_Cool - f_Setback, a_Cool)
+
+  a_Flag = np.select([b_HeatIdle | b_MildIdle, b_Heat, b_Dehumid | b_Hot],
+                     [configs.i_DoNothingFlag, configs.i_HeatFlag, configs.i_CoolFlag])
+  a_Setting = np.select([b_HeatIdle | b_MildIdle, b_Heat, b_Dehumid, b_Hot],
+                        [a_Temp, a_Heat, a_Temp - f_Setback, a_Cool])
+  return a_Flag, a_Setting
+
+'''*****************************************************************
+* Name: SampleHours
+* Description: Hours each sample stands for: the time until the next
+*              one, capped so outages in a recording don't count.
+* Parameters:  array a_Time
+* Returns:     array a_Hours
+*****************************************************************'''
+def SampleHours(a_Time):
+  if(len(a_Time) < 2):
+    return np.ones(len(a_Time))
+  a_Gap = np.diff(a_Time) / 3600.0
+  f_Typical = float(np.median(a_Gap))
+  return np.append(np.minimum(a_Gap, 2 * f_Typical), f_Typical)
+
+'''*****************************************************************
+* Name: Backtest
+* Description: Runs the policy over a weather record.
+* Parameters:  dict d_Weather
+*              dict d_Params
+* Returns:     dict d_Result
+*                   Decisions per sample, and the inputs they came from.
+*****************************************************************'''
+def Backtest(d_Weather, d_Params):
+  a_Temp = d_Weather["a_Temp_F"]
+  if(configs.SW_USE_METRIC_UNITS):
+    a_Temp = (a_Temp - 32) / 1.8
+  a_Month, a_Hour = Calendar(d_Weather["a_Time"])
+  a_Season   = SeasonsOf(a_Month)
+  a_TimeFlag = TimeFlagsOf(a_Hour)
+  a_Flag, a_Setting = DecideHVACVectorized(a_Temp, d_Weather["a_Humidity_Pct"], a_Season, a_TimeFlag, d_Params)
+  return {"a_Temp": a_Temp, "a_Humidity_Pct": d_Weather["a_Humidity_Pct"],
+          "a_Month": a_Month, "a_Hour": a_Hour, "a_Season": a_Season, "a_TimeFlag": a_TimeFlag,
+          "a_Flag": a_Flag, "a_Setting": a_Setting, "a_Hours": SampleHours(d_Weather["a_Time"])}
+
+'''*****************************************************************
+* Name: Verify
+* Description: Checks the vectorized policy against the scalar one, on a
+*              random sample of the backtest and on every combination of
+*              inputs at and around the thresholds.
+* Parameters:  dict d_Result
+*                   Result of Backtest.
+*              dict d_Params
+*              int  i_Samples
+*                   Backtest samples to check.
+* Returns:     int  i_Checked
+*              list l_Mismatches
+*                   (inputs, scalar result, vectorized result) of every
+*                   disagreement.
+*****************************************************************'''
+def Verify(d_Result, d_Params, i_Samples = 20000):
+  l_Mismatches = []
+  i_Checked = 0
+
+  # the calendar rules
+  for i_Month in range(1, 13):
+    if(SeasonsOf(np.array([i_Month]))[0] != systime.SeasonOf(i_Month)):
+      l_Mismatches.append((("month", i_Month), systime.SeasonOf(i_Month), None))
+  for i_Hour in range(24):
+    if(TimeFlagsOf(np.array([i_Hour]))[0] != systime.TimeFlagOf(i_Hour)):
+      l_Mismatches.append((("hour", i_Hour), systime.TimeFlagOf(i_Hour), None))
+
+  # the edges: exactly on, and just either side of, every threshold
+  l_Temps = []
+  for f_Threshold in (d_Params["f_HeatThreshold"], d_Params["f_CoolThreshold"]):
+    l_Temps += [np.nextafter(f_Threshold, -np.inf), f_Threshold, np.nextafter(f_Threshold, np.inf)]
+  f_Hum = d_Params["f_HumThreshold_Pct"]
+  l_Grid = list(itertools.product(l_Temps, [f_Hum - 1, f_Hum, f_Hum + 1],
+                                  [configs.i_SummertimeFlag, configs.i_WintertimeFlag],
+                                  [configs.i_DaytimeFlag, configs.i_NightFlag]))
+  a_Grid = np.array(l_Grid)
+  a_GridFlag, a_GridSetting = DecideHVACVectorized(a_Grid[:, 0], a_Grid[:, 1], a_Grid[:, 2], a_Grid[:, 3], d_Params)
+  l_Cases = [(t_Inputs, a_GridFlag[i], a_GridSetting[i]) for i, t_Inputs in enumerate(l_Grid)]
+
+  # a random sample of the backtest itself
+  i_Count = len(d_Result["a_Flag"])
+  a_Index = np.random.default_rng(0).choice(i_Count, min(i_Samples, i_Count), replace = False)
+  for i in a_Index:
+    t_Inputs = (d_Result["a_Temp"][i], d_Result["a_Humidity_Pct"][i],
+                d_Result["a_Season"][i], d_Result["a_TimeFlag"][i])
+    l_Cases.append((t_Inputs, d_Result["a_Flag"][i], d_Result["a_Setting"][i]))
+
+  for t_Inputs, i_Flag, f_Setting in l_Cases:
+    t_Scalar = temperature.DecideHVAC(*t_Inputs, **d_Params)
+    i_Checked += 1
+    if(t_Scalar[0] != i_Flag or t_Scalar[1] != f_Setting):
+      l_Mismatches.append((t_Inputs, t_Scalar, (i_Flag, f_Setting)))
+  return i_Checked, l_Mismatches
+
+'''*****************************************************************
+* Name: Summarize
+* Description: Hours spent in each state, overall and per season, and
+*              the hours spent at each setting while heating or cooling.
+* Parameters:  dict  d_Result
+*                    Result of Backtest.
+*              float f_BinWidth
+*                    Width of the setting bins.
+* Returns:     dict  d_Summary
+*****************************************************************'''
+def Summarize(d_Result, f_BinWidth = 1.0):
+  a_Flag, a_Hours = d_Result["a_Flag"], d_Result["a_Hours"]
+  d_Summary = {"f_TotalHours": float(a_Hours.sum()), "d_Hours": {}, "d_SeasonHours": {}, "d_Settings": {}}
+  for i_Flag, s_Flag in d_FlagNames.items():
+    b_Flag = a_Flag == i_Flag
+    d_Summary["d_Hours"][s_Flag] = float(a_Hours[b_Flag].sum())
+    for i_Season, s_Season in ((configs.i_SummertimeFlag, "summer"), (configs.i_WintertimeFlag, "winter")):
+      d_Summary["d_SeasonHours"].setdefault(s_Season, {})[s_Flag] = \
+        float(a_Hours[b_Flag & (d_Result["a_Season"] == i_Season)].sum())
+    if(i_Flag != configs.i_DoNothingFlag and b_Flag.any()):
+      a_Bin = np.floor(d_Result["a_Setting"][b_Flag] / f_BinWidth) * f_BinWidth
+      a_Bins, a_Index = np.unique(a_Bin, return_inverse = True)
+      a_BinHours = np.bincount(a_Index, weights = a_Hours[b_Flag])
+      d_Summary["d_Settings"][s_Flag] = [(float(f_Bin), float(f_Hours)) for f_Bin, f_Hours in zip(a_Bins, a_BinHours)]
+  return d_Summary
+
+'''*****************************************************************
+* Name: ParseList
+* Description: Parses a comma separated list of numbers.
+* Parameters:  str  s_Values
+* Returns:     list l_Values
+*****************************************************************'''
+def ParseList(s_Values):
+  return [float(s_Value) for s_Value in s_Values.split(",") if s_Value.strip()]
+
+def main():
+  o_Parser = argparse.ArgumentParser(description = "Backtest the HVAC policy over recorded or synthetic weather.")
+  o_Parser.add_argument("--years", type = float, default = 5, help = "years of synthetic weather")
+  o_Parser.add_argument("--seed", type = int, default = 0, help = "seed for the synthetic weather")
+  o_Parser.add_argument("--csv", help = "recorded weather, CSV with columns time,temperature_f,humidity_pct")
+  o_Parser.add_argument("--history", help = "history directory recorded by main.py")
+  o_Parser.add_argument("--heat-threshold", help = "comma separated values of f_HeatThreshold to try")
+  o_Parser.add_argument("--cool-threshold", help = "comma separated values of f_CoolThreshold to try")
+  o_Parser.add_argument("--setback", help = "comma separated values of f_TemperatureSetback to try")
+  o_Parser.add_argument("--verify-samples", type = int, default = 20000, help = "samples checked against the scalar policy")
+  o_Args = o_Parser.parse_args()
+
+  if(o_Args.csv):
+    d_Weather = LoadCSV(o_Args.csv)
+  elif(o_Args.history):
+    d_Weather = LoadHistory(o_Args.history)
+  else:
+    d_Weather = SyntheticWeather(o_Args.years, o_Args.seed)
+  if(len(d_Weather["a_Time"]) == 0):
+    print("no weather to backtest")
+    sys.exit(1)
+
+  d_Default = DefaultParameters()
+  l_HeatThresholds = ParseList(o_Args.heat_threshold) if o_Args.heat_threshold else [d_Default["f_HeatThreshold"]]
+  l_CoolThresholds = ParseList(o_Args.cool_threshold) if o_Args.cool_threshold else [d_Default["f_CoolThreshold"]]
+  l_Setbacks       = ParseList(o_Args.setback) if o_Args.setback else [d_Default["f_TemperatureSetback"]]
+
+  b_Failed = False
+  l_Rows = []
+  for f_HeatThreshold, f_CoolThreshold, f_Setback in itertools.product(l_HeatThresholds, l_CoolThresholds, l_Setbacks):
+    d_Params = dict(d_Default, f_HeatThreshold = f_HeatThreshold, f_CoolThreshold = f_CoolThreshold,
+                    f_TemperatureSetback = f_Setback)
+    f_Start = time.perf_counter()
+    d_Result = Backtest(d_Weather, d_Params)
+    f_Vector_s = time.perf_counter() - f_Start
+
+    f_Start = time.perf_counter()
+    i_Checked, l_Mismatches = Verify(d_Result, d_Params, o_Args.verify_samples)
+    f_Scalar_s = (time.perf_counter() - f_Start) / max(1, i_Checked) * len(d_Result["a_Flag"])
+    if(len(l_Mismatches) > 0):
+      b_Failed = True
+      print("MISMATCH with the scalar policy for %s:" % d_Params)
+      for t_Mismatch in l_Mismatches[:10]:
+        print("  inputs %s scalar %s vectorized %s" % t_Mismatch)
+
+    d_Summary = Summarize(d_Result)
+    l_Rows.append((f_HeatThreshold, f_CoolThreshold, f_Setback, d_Summary))
+
+    print("heat threshold %g, cool threshold %g, setback %g: %d samples, %.0f hours" %
+          (f_HeatThreshold, f_CoolThreshold, f_Setback, len(d_Result["a_Flag"]), d_Summary["f_TotalHours"]))
+    print("  vectorized pass %.1f ms (scalar would take ~%.0f ms), %d checked against the scalar policy, %d mismatches" %
+          (1000 * f_Vector_s, 1000 * f_Scalar_s, i_Checked, len(l_Mismatches)))
+    for s_Flag, f_Hours in d_Summary["d_Hours"].items():
+      print("  %-8s %9.0f h (%4.1f%%)   summer %8.0f h   winter %8.0f h" %
+            (s_Flag, f_Hours, 100 * f_Hours / d_Summary["f_TotalHours"],
+             d_Summary["d_SeasonHours"]["summer"][s_Flag], d_Summary["d_SeasonHours"]["winter"][s_Flag]))
+    for s_Flag, l_Bins in d_Summary["d_Settings"].items():
+      print("  %s settings: %s" % (s_Flag, ", ".join("%g: %.0f h" % t_Bin for t_Bin in l_Bins)))
+
+  # a compact table when several parameter sets were tried
+  if(len(l_Rows) > 1):
+    print()
+    print("%6s %6s %7s %10s %10s %10s" % ("heat", "cool", "setback", "heat h", "cool h", "nothing h"))
+    for f_HeatThreshold, f_CoolThreshold, f_Setback, d_Summary in l_Rows:
+      print("%6g %6g %7g %10.0f %10.0f %10.0f" % (f_HeatThreshold, f_CoolThreshold, f_Setback,
+            d_Summary["d_Hours"]["heat"], d_Summary["d_Hours"]["cool"], d_Summary["d_Hours"]["nothing"]))
+
+  if(b_Failed):
+    sys.exit(1)
+
+if __name__ == "__main__":
+  main()
+
+################################## end file ###################################
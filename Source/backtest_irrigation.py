@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: backtest_irrigation.py                                           *
+* Purpose:   Replays weather and soil moisture through the watering           *
+*            decision for every soil type, to pick the wilt point and field   *
+*            capacity by data.                                                *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs
+import backtest_hvac
+import water_lawn
+
+import argparse
+import concurrent.futures
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+# inputs of the simulation, set once in each worker process
+d_WorkerInputs = None
+
+'''*****************************************************************
+* Name: DecideWateringVectorized
+* Description: water_lawn.DecideWatering over whole arrays.
+* Parameters:  array a_WaterFlag
+*              array a_Moisture_Pct
+*              array a_OutdoorTemp_F
+*              array a_Rain
+*              float f_Wilt
+*                    Or an array that broadcasts against the others.
+*              float f_Capacity
+* Returns:     array a_WaterFlag
+*****************************************************************'''
+def DecideWateringVectorized(a_WaterFlag, a_Moisture_Pct, a_OutdoorTemp_F, a_Rain, f_Wilt, f_Capacity):
+  b_Blocked = (a_OutdoorTemp_F < 40) | (a_Rain == 1)
+  b_On = np.where(a_WaterFlag == 1, ~(a_Moisture_Pct > f_Capacity), a_Moisture_Pct < f_Wilt)
+  return np.where(b_Blocked, 0, b_On.astype(np.int8)).astype(np.int8)
+
+'''*****************************************************************
+* Name: Verify
+* Description: Checks the vectorized decision against the scalar one at
+*              and around every threshold of every soil type.
+* Parameters:  dict d_SoilTypes
+* Returns:     int  i_Checked
+*              list l_Mismatches
+*****************************************************************'''
+def Verify(d_SoilTypes = configs.d_SoilTypes):
+  i_Checked = 0
+  l_Mismatches = []
+  for s_Name, f_Wilt, f_Capacity in d_SoilTypes.values():
+    l_Moisture = [0.0, (f_Wilt + f_Capacity) / 2, 100.0]
+    for f_Threshold in (f_Wilt, f_Capacity):
+      l_Moisture += [np.nextafter(f_Threshold, -np.inf), f_Threshold, np.nextafter(f_Threshold, np.inf)]
+    l_Grid = list(itertools.product([0, 1], l_Moisture, [np.nextafter(40, -np.inf), 40.0, 41.0], [0, 1]))
+    a_Grid = np.array(l_Grid)
+    a_Flag = DecideWateringVectorized(a_Grid[:, 0], a_Grid[:, 1], a_Grid[:, 2], a_Grid[:, 3], f_Wilt, f_Capacity)
+    for t_Inputs, i_Flag in zip(l_Grid, a_Flag):
+      i_Scalar = water_lawn.DecideWatering(*t_Inputs, f_Wilt = f_Wilt, f_Capacity = f_Capacity)
+      i_Checked += 1
+      if(i_Scalar != i_Flag):
+        l_Mismatches.append((s_Name, t_Inputs, i_Scalar, int(i_Flag)))
+  return i_Checked, l_Mismatches
+
+'''*****************************************************************
+* Name: RainForecast
+* Description: The rain flag the controller would have seen: 1 when a
+*              rain hour is forecast in the next twelve hours between
+*              i_StartRain and i_EndRain, as in the watering window of
+*              configs.l_RainWindows.
+* Parameters:  array a_Forecast
+*                    Hourly, True where rain is forecast. One column per
+*                    simulated year.
+*              array a_HourOfDay
+*                    Hour of the day of every row.
+* Returns:     array a_Rain
+*                    Hourly rain flag.
+*****************************************************************'''
+def RainForecast(a_Forecast, a_HourOfDay):
+  s_Name, i_HoursAhead, i_FirstHour, i_LastHour = configs.l_RainWindows[0]
+  b_InWindow = (a_HourOfDay >= i_FirstHour) & (a_HourOfDay <= i_LastHour)
+  a_Counted = (a_Forecast & b_InWindow[:, None]).astype(np.int32)
+  # rain hours in [t, t + i_HoursAhead) from a running sum
+  a_Sum = np.vstack([np.zeros((1, a_Counted.shape[1]), np.int32), np.cumsum(a_Counted, axis = 0)])
+  a_End = np.minimum(np.arange(len(a_Counted)) + i_HoursAhead, len(a_Counted))
+  return ((a_Sum[a_End] - a_Sum[:-1]) > 0).astype(np.int8)
+
+'''*****************************************************************
+* Name: SyntheticInputs
+* Description: Makes years of weather and a moisture model of the lawn.
+*              Rain soaks in, evapotranspiration dries the soil on warm
+*              days and slows as it dries, and water above the lawn's
+*              field capacity drains away.
+* Parameters:  int   i_Years
+*                    Years to simulate, side by side.
+*              float f_StepMinutes
+*                    Simulation step.
+*              tuple t_Lawn
+*                    (name, wilt point, field capacity) of the lawn's
+*                    actual soil.
+*              float f_ForecastSkill
+*                    Fraction of rain hours the forecast sees coming.
+*              float f_FalseAlarm
+*                    Fraction of dry hours the forecast calls rain.
+*              int   i_Seed
+* Returns:     dict  d_Inputs
+*****************************************************************'''
+def SyntheticInputs(i_Years = 3, f_StepMinutes = 5, t_Lawn = configs.d_SoilTypes[configs.i_SandType],
+                    f_ForecastSkill = 0.8, f_FalseAlarm = 0.01, i_Seed = 0):
+  o_Random = np.random.default_rng(i_Seed)
+  i_Hours = 8760
+  d_Weather = backtest_hvac.SyntheticWeather(i_Years + 1, i_Seed)
+  a_Temp_F = d_Weather["a_Temp_F"][:i_Hours * i_Years].reshape(i_Years, i_Hours).T
+  a_HourOfDay = np.arange(i_Hours) % 24
+
+  # rain comes in spells: a two state chain per year, about one spell a
+  # week lasting around four hours
+  a_Raining = np.zeros((i_Hours, i_Years), dtype = bool)
+  a_Start, a_Stay = o_Random.random((i_Hours, i_Years)) < 1 / 160.0, o_Random.random((i_Hours, i_Years)) < 0.75
+  for i in range(1, i_Hours):
+    a_Raining[i] = np.where(a_Raining[i - 1], a_Stay[i], a_Start[i])
+  a_Rain_mm = np.where(a_Raining, o_Random.exponential(2.0, (i_Hours, i_Years)), 0.0)
+
+  a_Forecast = (a_Raining & (o_Random.random((i_Hours, i_Years)) < f_ForecastSkill)) | \
+               (~a_Raining & (o_Random.random((i_Hours, i_Years)) < f_FalseAlarm))
+  a_Rain = RainForecast(a_Forecast, a_HourOfDay)
+
+  # evapotranspiration of a lawn in full sun, about 5 mm on a 90 F day
+  b_Day = (a_HourOfDay >= 6) & (a_HourOfDay <= 20)
+  a_ET_mm = np.where(b_Day[:, None], 0.0065 * np.maximum(a_Temp_F - 40, 0), 0.0)
+
+  # from hourly to the simulation step
+  i_PerHour = int(round(60 / f_StepMinutes))
+  f_ToPct = 100.0 / configs.f_RootDepth_mm
+  s_Lawn, f_LawnWilt, f_LawnCapacity = t_Lawn
+  return {"s_Source":         "%d years of synthetic weather, %s lawn" % (i_Years, s_Lawn),
+          "f_Years":          float(i_Years),
+          "f_Step_h":         1.0 / i_PerHour,
+          "a_Temp_F":         np.repeat(a_Temp_F, i_PerHour, axis = 0),
+          "a_Rain":           np.repeat(a_Rain, i_PerHour, axis = 0),
+          "a_Delta":          np.repeat(a_Rain_mm * f_ToPct / i_PerHour, i_PerHour, axis = 0),
+          "a_ET":             np.repeat(a_ET_mm * f_ToPct / i_PerHour, i_PerHour, axis = 0),
+          "f_Drain":          1 - 0.5 ** (1.0 / i_PerHour),  # half the excess drains each hour
+          "f_LawnWilt":       f_LawnWilt,
+          "f_LawnCapacity":   f_LawnCapacity,
+          "a_Moisture0":      np.full(i_Years, (f_LawnWilt + f_LawnCapacity) / 2)}
+
+'''*****************************************************************
+* Name: HistoryInputs
+* Description: Makes the inputs from what main.py recorded. The change
+*              in moisture the real sprinkler didn't cause is replayed
+*              as is, and each simulated sprinkler adds its own water on
+*              top.
+* Parameters:  str   s_Directory
+*              float f_StepMinutes
+*              tuple t_Lawn
+* Returns:     dict  d_Inputs
+*****************************************************************'''
+def HistoryInputs(s_Directory = configs.s_HistoryDirectory, f_StepMinutes = 5,
+                  t_Lawn = configs.d_SoilTypes[configs.i_SandType]):
+  import timeseries
+  o_Store = timeseries.TimeSeriesStore(s_Directory)
+  d_Channels = {}
+  try:
+    for s_Channel in ("water_level_pct", "outdoor_temp_f", "water_flag", "rain_flag"):
+      a_Time, a_Values = o_Store.query(s_Channel, 0.0)
+      d_Channels[s_Channel] = (np.frombuffer(a_Time, dtype = np.float64), np.frombuffer(a_Values, dtype = np.float64))
+  finally:
+    o_Store.close()
+
+  a_MoistureTime, a_Moisture = d_Channels["water_level_pct"]
+  if(len(a_MoistureTime) < 2):
+    return None
+  f_Step_s = 60.0 * f_StepMinutes
+  a_Grid = np.arange(a_MoistureTime[0], a_MoistureTime[-1], f_Step_s)
+
+  # levels are interpolated, flags hold their last value
+  def Resample(s_Channel, b_Flag):
+    a_Time, a_Values = d_Channels[s_Channel]
+    if(len(a_Time) == 0):
+      return np.zeros(len(a_Grid))
+    if(b_Flag):
+      return a_Values[np.maximum(np.searchsorted(a_Time, a_Grid, side = "right") - 1, 0)]
+    return np.interp(a_Grid, a_Time, a_Values)
+
+  a_Level = Resample("water_level_pct", False)
+  a_WaterFlag = Resample("water_flag", True)
+  f_Gain = configs.f_SprinklerRate_mm_h * f_StepMinutes / 60.0 * 100.0 / configs.f_RootDepth_mm
+  s_Lawn, f_LawnWilt, f_LawnCapacity = t_Lawn
+  return {"s_Source":         "%.1f days of recorded history, %s lawn" % (len(a_Grid) * f_Step_s / 86400, s_Lawn),
+          "f_Years":          len(a_Grid) * f_Step_s / (86400 * 365.0),
+          "f_Step_h":         f_StepMinutes / 60.0,
+          "a_Temp_F":         Resample("outdoor_temp_f", False)[:, None],
+          "a_Rain":           Resample("rain_flag", True).astype(np.int8)[:, None],
+          "a_Delta":          (np.append(np.diff(a_Level), 0.0) - a_WaterFlag * f_Gain)[:, None],
+          "a_ET":             np.zeros((len(a_Grid), 1)),
+          "f_Drain":          0.0,
+          "f_LawnWilt":       f_LawnWilt,
+          "f_LawnCapacity":   f_LawnCapacity,
+          "a_Moisture0":      a_Level[:1].copy()}
+
+'''*****************************************************************
+* Name: SetWorkerInputs
+* Description: Keeps the inputs in a worker process, so they are sent
+*              to each worker once rather than with every soil type.
+* Parameters:  dict d_Inputs
+* Returns:     N/A
+*****************************************************************'''
+def SetWorkerInputs(d_Inputs):
+  global d_WorkerInputs
+  d_WorkerInputs = d_Inputs
+
+'''*****************************************************************
+* Name: SimulateSoils
+* Description: Runs the watering decision with the thresholds of some
+*              soil types over every simulated year at once. The
+*              hysteresis has to step through time, but each step covers
+*              all the soil types and years in a few array operations.
+* Parameters:  list  l_Soils
+*                    (soil type, (name, wilt point, field capacity))
+*              dict  d_Inputs
+*                    Inputs, the worker's by default.
+* Returns:     list  l_Results
+*                    One dict per soil type.
+*****************************************************************'''
+def SimulateSoils(l_Soils, d_Inputs = None):
+  if(d_Inputs == None):
+    d_Inputs = d_WorkerInputs
+  f_Step_h = d_Inputs["f_Step_h"]
+  f_Gain = configs.f_SprinklerRate_mm_h * f_Step_h * 100.0 / configs.f_RootDepth_mm
+  f_LawnWilt, f_LawnCapacity, f_Drain = d_Inputs["f_LawnWilt"], d_Inputs["f_LawnCapacity"], d_Inputs["f_Drain"]
+  a_Temp, a_Rain, a_Delta, a_ET = d_Inputs["a_Temp_F"], d_Inputs["a_Rain"], d_Inputs["a_Delta"], d_Inputs["a_ET"]
+
+  # one row per soil type, one column per year
+  a_Wilt     = np.array([[t_Soil[1]] for i_SoilType, t_Soil in l_Soils])
+  a_Capacity = np.array([[t_Soil[2]] for i_SoilType, t_Soil in l_Soils])
+  t_Shape = (len(l_Soils), len(d_Inputs["a_Moisture0"]))
+  a_Moisture = np.broadcast_to(d_Inputs["a_Moisture0"], t_Shape).astype(np.float64)
+  a_Flag = np.zeros(t_Shape, dtype = np.int8)
+  a_OnSteps = np.zeros(t_Shape, dtype = np.int64)
+  a_Cycles = np.zeros(t_Shape, dtype = np.int64)
+  a_WiltSteps = np.zeros(t_Shape, dtype = np.int64)
+  a_Excursions = np.zeros(t_Shape, dtype = np.int64)
+  a_MoistureSum = np.zeros(t_Shape)
+  b_Wilted = a_Moisture < f_LawnWilt
+
+  for i in range(len(a_Temp)):
+    a_Next = DecideWateringVectorized(a_Flag, a_Moisture, a_Temp[i], a_Rain[i], a_Wilt, a_Capacity)
+    a_Cycles += a_Next > a_Flag
+    a_Flag = a_Next
+    a_OnSteps += a_Flag
+
+    # the soil dries more slowly as it dries out, and above field capacity
+    # the excess drains away
+    a_Moisture = a_Moisture + a_Delta[i] + f_Gain * a_Flag - a_ET[i] * np.minimum(a_Moisture / f_LawnCapacity, 1.0)
+    a_Moisture -= f_Drain * np.maximum(a_Moisture - f_LawnCapacity, 0.0)
+    np.clip(a_Moisture, 0.0, 100.0, out = a_Moisture)
+    a_MoistureSum += a_Moisture
+
+    b_Below = a_Moisture < f_LawnWilt
+    a_Excursions += b_Below & ~b_Wilted
+    a_WiltSteps += b_Below
+    b_Wilted = b_Below
+
+  l_Results = []
+  for i, (i_SoilType, (s_Name, f_Wilt, f_Capacity)) in enumerate(l_Soils):
+    l_Results.append({"i_SoilType":        i_SoilType,
+                      "s_Name":            s_Name,
+                      "f_Wilt":            f_Wilt,
+                      "f_Capacity":        f_Capacity,
+                      "f_WaterMinutes":    float(a_OnSteps[i].sum()) * f_Step_h * 60,
+                      "i_Cycles":          int(a_Cycles[i].sum()),
+                      "f_Water_mm":        float(a_OnSteps[i].sum()) * f_Step_h * configs.f_SprinklerRate_mm_h,
+                      "i_WiltExcursions":  int(a_Excursions[i].sum()),
+                      "f_WiltHours":       float(a_WiltSteps[i].sum()) * f_Step_h,
+                      "f_MeanMoisture":    float(a_MoistureSum[i].sum()) / max(1, len(a_Temp) * t_Shape[1])})
+  return l_Results
+
+'''*****************************************************************
+* Name: RunSoilTypes
+* Description: Simulates every soil type, split evenly over a process
+*              pool.
+* Parameters:  dict d_Inputs
+*              dict d_SoilTypes
+*              int  i_Workers
+*                   Processes to use, one per core by default.
+* Returns:     list l_Results
+*                   One dict per soil type, in soil type order.
+*****************************************************************'''
+def RunSoilTypes(d_Inputs, d_SoilTypes = configs.d_SoilTypes, i_Workers = None):
+  if(i_Workers == None):
+    i_Workers = os.cpu_count() or 1
+  l_Soils = sorted(d_SoilTypes.items())
+  l_Chunks = [l_Soils[i::i_Workers] for i in range(min(i_Workers, len(l_Soils)))]
+  if(len(l_Chunks) == 1):
+    return SimulateSoils(l_Soils, d_Inputs)
+  with concurrent.futures.ProcessPoolExecutor(max_workers = len(l_Chunks), initializer = SetWorkerInputs,
+                                              initargs = (d_Inputs,)) as o_Pool:
+    l_Results = []
+    for l_Chunk in o_Pool.map(SimulateSoils, l_Chunks):
+      l_Results.extend(l_Chunk)
+  return sorted(l_Results, key = lambda d_Result: d_Result["i_SoilType"])
+
+def main():
+  o_Parser = argparse.ArgumentParser(description = "Backtest the watering decision for every soil type.")
+  o_Parser.add_argument("--years", type = int, default = 3, help = "years of synthetic weather")
+  o_Parser.add_argument("--seed", type = int, default = 0, help = "seed for the synthetic weather")
+  o_Parser.add_argument("--history", help = "history directory recorded by main.py, instead of synthetic weather")
+  o_Parser.add_argument("--lawn", type = int, default = configs.i_SandType,
+                        help = "soil type the lawn really is, for its drainage and wilting")
+  o_Parser.add_argument("--step", type = float, default = 5, help = "simulation step in minutes")
+  o_Parser.add_argument("--forecast-skill", type = float, default = 0.8, help = "fraction of rain hours forecast")
+  o_Parser.add_argument("--false-alarm", type = float, default = 0.01, help = "fraction of dry hours forecast as rain")
+  o_Parser.add_argument("--workers", type = int, help = "processes to use, one per core by default")
+  o_Args = o_Parser.parse_args()
+
+  i_Checked, l_Mismatches = Verify()
+  if(len(l_Mismatches) > 0):
+    print("MISMATCH with the scalar decision:")
+    for t_Mismatch in l_Mismatches[:10]:
+      print("  %s inputs %s scalar %s vectorized %s" % t_Mismatch)
+    sys.exit(1)
+
+  t_Lawn = configs.d_SoilTypes[o_Args.lawn]
+  if(o_Args.history):
+    d_Inputs = HistoryInputs(o_Args.history, o_Args.step, t_Lawn)
+    if(d_Inputs == None):
+      print("not enough recorded moisture to backtest")
+      sys.exit(1)
+  else:
+    d_Inputs = SyntheticInputs(o_Args.years, o_Args.step, t_Lawn, o_Args.forecast_skill, o_Args.false_alarm, o_Args.seed)
+
+  f_Start = time.perf_counter()
+  l_Results = RunSoilTypes(d_Inputs, i_Workers = o_Args.workers)
+  f_Elapsed_s = time.perf_counter() - f_Start
+
+  f_Years = d_Inputs["f_Years"]
+  print("%s, %d checked against the scalar decision" % (d_Inputs["s_Source"], i_Checked))
+  print("%d soil types in %.1f s; totals per year:" % (len(l_Results), f_Elapsed_s))
+  print("%-3s %-16s %6s %6s %10s %7s %9s %10s %10s %8s" %
+        ("#", "thresholds", "wilt", "cap", "water min", "cycles", "water mm", "wilt runs", "wilt h", "mean %"))
+  for d_Result in l_Results:
+    print("%-3d %-16s %6g %6g %10.0f %7.1f %9.0f %10.1f %10.1f %8.1f" %
+          (d_Result["i_SoilType"], d_Result["s_Name"], d_Result["f_Wilt"], d_Result["f_Capacity"],
+           d_Result["f_WaterMinutes"] / f_Years, d_Result["i_Cycles"] / f_Years, d_Result["f_Water_mm"] / f_Years,
+           d_Result["i_WiltExcursions"] / f_Years, d_Result["f_WiltHours"] / f_Years, d_Result["f_MeanMoisture"]))
+
+if __name__ == "__main__":
+  main()
+
+################################## end file ###################################
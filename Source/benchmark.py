@@ -0,0 +1,489 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: benchmark.py                                                     *
+* Purpose:   Latency, CPU and allocation benchmarks for each stage of the     *
+*            control loop.                                                    *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs
+import drivers
+import forecast_cache
+import forecast_series
+import replay
+import systime
+import temperature
+import water_lawn
+import weather_providers
+
+import argparse
+import contextlib
+import gzip
+import http.server
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+import zlib
+
+'''*****************************************************************
+* Name: OpenMeteoResponse
+* Description: Rewrites a DarkSky response in the Open-Meteo format, so
+*              both providers serve the same forecast.
+* Parameters:  dict d_DarkSky
+*                   DarkSky response.
+* Returns:     dict d_Response
+*****************************************************************'''
+def OpenMeteoResponse(d_DarkSky):
+  d_Codes = {"clear-day": 0, "clear-night": 0, "partly-cloudy-day": 2, "partly-cloudy-night": 2,
+             "cloudy": 3, "fog": 45, "rain": 63, "sleet": 66, "snow": 73}
+  l_Hourly = d_DarkSky["hourly"]["data"]
+  l_Daily  = d_DarkSky["daily"]["data"]
+  return {"latitude": d_DarkSky["latitude"], "longitude": d_DarkSky["longitude"],
+          "timezone": d_DarkSky["timezone"],
+          "hourly": {"time":                      [d_Period["time"] for d_Period in l_Hourly],
+                     "temperature_2m":            [d_Period["temperature"] for d_Period in l_Hourly],
+                     "precipitation_probability": [round(100 * d_Period["precipProbability"]) for d_Period in l_Hourly],
+                     "precipitation":             [d_Period["precipIntensity"] for d_Period in l_Hourly],
+                     "weather_code":              [d_Codes[d_Period["icon"]] for d_Period in l_Hourly],
+                     "is_day":                    [0 if d_Period["icon"].endswith("night") else 1 for d_Period in l_Hourly]},
+          "daily":  {"time":                          [d_Period["time"] for d_Period in l_Daily],
+                     "temperature_2m_max":            [d_Period["temperatureHigh"] for d_Period in l_Daily],
+                     "precipitation_probability_max": [round(100 * d_Period["precipProbability"]) for d_Period in l_Daily],
+                     "precipitation_sum":             [24 * d_Period["precipIntensity"] for d_Period in l_Daily],
+                     "weather_code":                  [d_Codes[d_Period["icon"]] for d_Period in l_Daily]}}
+
+# class to serve synthetic forecasts over HTTP on localhost, standing in for
+# a weather API. like the API it keeps connections alive, honours the
+# exclude parameter and compresses responses for clients that accept it
+class StandInWeatherServer:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Starts the server on a free port in a background thread.
+  * Parameters:  float f_HandshakeDelay_s
+  *                    Delay added to every new connection, standing in
+  *                    for the TCP and TLS handshakes of a real network.
+  *              str   s_Provider
+  *                    Response format, "darksky" or "openmeteo".
+  *              float f_ResponseDelay_s
+  *                    Delay added to every response, standing in for a
+  *                    slow API.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, f_HandshakeDelay_s = 0.0, s_Provider = "darksky", f_ResponseDelay_s = 0.0):
+    self.d_Response  = replay.SyntheticDarkSkyResponse()
+    if(s_Provider == "openmeteo"):
+      self.d_Response = OpenMeteoResponse(self.d_Response)
+    self.d_Bodies    = {}   # (exclude, encoding) -> encoded body
+    self.i_Status    = 200  # set to e.g. 503 to stand in for an outage
+    self.i_Requests    = 0
+    self.i_BytesSent   = 0
+    self.i_Connections = 0
+    o_Server = self
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+      protocol_version = "HTTP/1.1"
+      # headers and body go out in separate writes. with Nagle on, a kept
+      # alive connection would wait out the client's delayed ACK each time
+      disable_nagle_algorithm = True
+
+      def setup(self):
+        http.server.BaseHTTPRequestHandler.setup(self)
+        o_Server.i_Connections += 1
+        time.sleep(f_HandshakeDelay_s)
+
+      def do_GET(self):
+        d_Query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        s_Exclude = d_Query.get("exclude", [""])[0]
+        s_Accept = self.headers.get("Accept-Encoding", "")
+        s_Encoding = "gzip" if "gzip" in s_Accept else ("deflate" if "deflate" in s_Accept else "")
+        b_Body = o_Server.GetBody(s_Exclude, s_Encoding)
+        time.sleep(f_ResponseDelay_s)
+
+        o_Server.i_Requests  += 1
+        o_Server.i_BytesSent += len(b_Body)
+        self.send_response(o_Server.i_Status)
+        self.send_header("Content-Type", "application/json")
+        if(s_Encoding):
+          self.send_header("Content-Encoding", s_Encoding)
+        self.send_header("Content-Length", str(len(b_Body)))
+        self.end_headers()
+        self.wfile.write(b_Body)
+
+      def log_message(self, *args):
+        pass
+
+    self.o_HTTPServer = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    self.o_HTTPServer.daemon_threads = True
+    if(s_Provider == "openmeteo"):
+      self.s_URL = "http://127.0.0.1:%d/v1/forecast" % self.o_HTTPServer.server_address[1]
+    else:
+      self.s_URL = "http://127.0.0.1:%d/forecast/key/%s" % (self.o_HTTPServer.server_address[1],
+                                                           configs.s_GPSLocation_LatLon)
+    threading.Thread(target = self.o_HTTPServer.serve_forever, daemon = True).start()
+
+  '''*****************************************************************
+  * Name: GetBody
+  * Description: Returns the response body for a request, built once per
+  *              combination of excluded blocks and encoding.
+  * Parameters:  str   s_Exclude
+  *                    Comma separated blocks to leave out.
+  *              str   s_Encoding
+  *                    "gzip", "deflate" or "" for none.
+  * Returns:     bytes b_Body
+  *****************************************************************'''
+  def GetBody(self, s_Exclude, s_Encoding):
+    t_Key = (s_Exclude, s_Encoding)
+    if(t_Key not in self.d_Bodies):
+      l_Exclude = s_Exclude.split(",")
+      d_Response = {s_Block: o_Value for s_Block, o_Value in self.d_Response.items() if s_Block not in l_Exclude}
+      b_Body = json.dumps(d_Response).encode("utf-8")
+      if(s_Encoding == "gzip"):
+        b_Body = gzip.compress(b_Body)
+      elif(s_Encoding == "deflate"):
+        b_Body = zlib.compress(b_Body)
+      self.d_Bodies[t_Key] = b_Body
+    return self.d_Bodies[t_Key]
+
+  '''*****************************************************************
+  * Name: close
+  * Description: Stops the server.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def close(self):
+    self.o_HTTPServer.shutdown()
+    self.o_HTTPServer.server_close()
+
+'''*****************************************************************
+* Name: Percentile
+* Description: Nearest-rank percentile of a sorted list.
+* Parameters:  list  l_Sorted
+*                    Sorted samples.
+*              float f_Percent
+*                    Percentile, 0 to 100.
+* Returns:     float f_Value
+*****************************************************************'''
+def Percentile(l_Sorted, f_Percent):
+  i_Rank = max(1, int(round(f_Percent / 100 * len(l_Sorted) + 0.5)))
+  return l_Sorted[min(i_Rank, len(l_Sorted)) - 1]
+
+'''*****************************************************************
+* Name: MeasureStage
+* Description: Runs one stage repeatedly and measures it. Latency and
+*              CPU are measured in one pass and allocations in a second
+*              pass, since tracing allocations slows everything down.
+* Parameters:  func fn_Stage
+*                   Function running one pass of the stage.
+*              int  i_Iterations
+*                   Number of measured passes.
+*              int  i_Warmup
+*                   Number of unmeasured passes first.
+* Returns:     dict d_Results
+*                   Latency percentiles (ms), CPU per pass (ms) and peak
+*                   memory allocated per pass (KiB).
+*****************************************************************'''
+def MeasureStage(fn_Stage, i_Iterations, i_Warmup = 5):
+  for i in range(i_Warmup):
+    fn_Stage()
+
+  l_Latency_ms = []
+  f_CPUStart = time.process_time()
+  for i in range(i_Iterations):
+    f_Start = time.perf_counter()
+    fn_Stage()
+    l_Latency_ms.append(1000 * (time.perf_counter() - f_Start))
+  f_CPU_ms = 1000 * (time.process_time() - f_CPUStart) / i_Iterations
+
+  # peak memory allocated by a single pass, averaged over a few passes
+  i_AllocPasses = min(i_Iterations, 20)
+  tracemalloc.start()
+  f_PeakSum = 0
+  for i in range(i_AllocPasses):
+    i_Before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    fn_Stage()
+    _, i_Peak = tracemalloc.get_traced_memory()
+    f_PeakSum += i_Peak - i_Before
+  tracemalloc.stop()
+
+  l_Latency_ms.sort()
+  return {"i_Iterations": i_Iterations,
+          "f_P50_ms":     Percentile(l_Latency_ms, 50),
+          "f_P95_ms":     Percentile(l_Latency_ms, 95),
+          "f_P99_ms":     Percentile(l_Latency_ms, 99),
+          "f_Max_ms":     l_Latency_ms[-1],
+          "f_CPU_ms":     f_CPU_ms,
+          "f_Alloc_KiB":  f_PeakSum / i_AllocPasses / 1024}
+
+'''*****************************************************************
+* Name: StartVirtualDisplay
+* Description: Starts Xvfb if there is no display, so tkinter can run.
+* Parameters:  N/A
+* Returns:     obj o_Process
+*                  The Xvfb process, or None if a display already exists
+*                  or Xvfb isn't installed.
+*****************************************************************'''
+def StartVirtualDisplay():
+  if(os.environ.get("DISPLAY") or shutil.which("Xvfb") == None):
+    return None
+  o_Process = subprocess.Popen(["Xvfb", ":99", "-screen", "0", "1280x800x24"],
+                               stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+  os.environ["DISPLAY"] = ":99"
+  time.sleep(1)
+  return o_Process
+
+'''*****************************************************************
+* Name: RunBenchmarks
+* Description: Benchmarks every stage of the control loop on simulated
+*              sensors and a local stand-in for the weather API.
+* Parameters:  int  i_Iterations
+*                   Number of measured passes per stage.
+*              list l_ZoneCounts
+*                   Numbers of indoor zones to run the temperature pass
+*                   with.
+*              float f_HandshakeDelay_s
+*                    Delay the stand-in server adds to new connections.
+* Returns:     dict d_Results
+*                   Results keyed by stage name.
+*****************************************************************'''
+def RunBenchmarks(i_Iterations, l_ZoneCounts = (2, 4, 8, 16, 32), f_HandshakeDelay_s = 0.0):
+  drivers.SetDrivers(drivers.SimulatedDHT(), drivers.SimulatedADC())
+  o_Server = StandInWeatherServer(f_HandshakeDelay_s)
+  l_Servers = [o_Server]
+  s_TempDir = tempfile.mkdtemp()
+  d_Results = {}
+
+  # the servers and the temporary directory are cleaned up even if a stage
+  # raises
+  try:
+    # keep the modules' prints out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+      o_Systime     = systime.Systime()
+      o_TempModule  = temperature.TemperatureModule(o_Systime)
+      o_Forecast    = replay.ReplayForecast(os.path.join(s_TempDir, "replay_cache.bin"))
+      o_WaterModule = water_lawn.WaterModule(o_Systime, o_TempModule.o_OutdoorTempSensor,
+                                             o_TempModule.o_Snapshot, o_Forecast)
+
+      def TemperatureStage():
+        o_TempModule.o_Snapshot.Invalidate()
+        o_TempModule.main()
+      d_Results["temperature"] = MeasureStage(TemperatureStage, i_Iterations)
+
+      # the per-zone work of the temperature pass as zones are added: picking
+      # up every sensor's latest reading and making the decisions of every
+      # zone in one batch. every zone samples on its own thread, so no read
+      # waits on a pin. read to publish is how old the oldest reading is once
+      # the decisions are made. reads take 5 ms and are repeated every 20 ms
+      # so the samplers turn over many times within the run
+      f_MinInterval_s, o_DHT = configs.f_DHTMinInterval_s, drivers.GetDHTDriver()
+      configs.f_DHTMinInterval_s = 0.02
+      drivers.SetDrivers(drivers.SimulatedDHT(f_TimeScale = 1.0, f_ReadTime_s = 0.005))
+      for i_Zones in l_ZoneCounts:
+        l_Zones = [("zone%d" % i, 100 + i, configs.f_HeatSetting, configs.f_CoolSetting,
+                    configs.f_ComfortZoneRange) for i in range(i_Zones)]
+        o_ZoneModule = temperature.TemperatureModule(o_Systime, l_Zones)
+        for o_Sensor in o_ZoneModule.l_Sensors:
+          o_Sensor.o_FirstGood.wait(1.0)
+        def ZoneStage():
+          o_ZoneModule.o_Snapshot.Invalidate()
+          if(o_ZoneModule.o_Snapshot.Refresh() == configs.SYSERROR_NO_ERROR):
+            o_ZoneModule.MakeZoneDecisions()
+        d_Stage = MeasureStage(ZoneStage, i_Iterations)
+
+        # the stage runs far faster than the samplers, so read to publish is
+        # measured on passes spread over a few sampling intervals
+        l_Age_ms = []
+        for i in range(i_Iterations):
+          time.sleep(0.003)
+          ZoneStage()
+          f_Now = time.time()
+          l_Age_ms.append(1000 * max((f_Now - o_Sensor.o_LastReading.f_Timestamp
+                                      for o_Sensor in o_ZoneModule.l_Sensors
+                                      if o_Sensor.o_LastReading != None), default = 0.0))
+        l_Age_ms.sort()
+        d_Stage["f_PerZone_us"]       = 1000 * d_Stage["f_P50_ms"] / i_Zones
+        d_Stage["f_ReadToPublish_ms"] = Percentile(l_Age_ms, 50)
+        d_Results["zones_%02d" % i_Zones] = d_Stage
+        o_ZoneModule.close()
+      configs.f_DHTMinInterval_s = f_MinInterval_s
+      drivers.SetDrivers(o_DHT)
+
+      def WaterStage():
+        o_TempModule.o_Snapshot.Invalidate()
+        o_WaterModule.main()
+      d_Results["water"] = MeasureStage(WaterStage, i_Iterations)
+
+      # a cache miss: an API call to the stand-in and parsing the response.
+      # first the way it used to be fetched, a new connection per fetch and
+      # the whole uncompressed response, then with the weather client
+      def MeasureFetch(fn_Fetch):
+        i_Requests, i_Bytes, i_Connections = o_Server.i_Requests, o_Server.i_BytesSent, o_Server.i_Connections
+        d_Stage = MeasureStage(fn_Fetch, i_Iterations)
+        i_Fetches = max(1, o_Server.i_Requests - i_Requests)
+        d_Stage["i_BytesPerFetch"]       = (o_Server.i_BytesSent - i_Bytes) // i_Fetches
+        d_Stage["f_ConnectionsPerFetch"] = (o_Server.i_Connections - i_Connections) / i_Fetches
+        return d_Stage
+
+      def UrllibFetch():
+        with urllib.request.urlopen(o_Server.s_URL) as o_Response:
+          return forecast_series.ParseDarkSky(json.loads(o_Response.read().decode("utf-8")))
+      d_Results["forecast_fetch_urllib"] = MeasureFetch(UrllibFetch)
+
+      o_LiveForecast = water_lawn.Forecast(os.path.join(s_TempDir, "live_cache.bin"))
+      # the quotas are high enough that no budget ever holds a fetch back
+      o_LiveForecast.l_Providers = [("darksky", o_Server.s_URL, 1000000, 1)]
+      d_Results["forecast_fetch"] = MeasureFetch(o_LiveForecast.FetchForecast)
+
+      # the fallback provider, and hedging: a primary that takes 50 ms to
+      # answer against the fallback asked after 10 ms. fetches come back to
+      # back, so most find the primary still busy and go to the fallback first
+      o_FallbackServer = StandInWeatherServer(f_HandshakeDelay_s, "openmeteo")
+      o_SlowServer     = StandInWeatherServer(f_HandshakeDelay_s, f_ResponseDelay_s = 0.05)
+      l_Servers += [o_FallbackServer, o_SlowServer]
+      o_Fallback = weather_providers.WeatherProviders([("openmeteo", o_FallbackServer.s_URL, 1000000, 1)])
+      d_Results["forecast_fetch_openmeteo"] = MeasureStage(o_Fallback.fetch, i_Iterations)
+      o_Hedged = weather_providers.WeatherProviders([("darksky",   o_SlowServer.s_URL,     1000000, 1),
+                                                     ("openmeteo", o_FallbackServer.s_URL, 1000000, 1)], 0.01)
+      d_Results["forecast_fetch_hedged"] = MeasureStage(o_Hedged.fetch, i_Iterations)
+      o_Fallback.close()
+      o_Hedged.close()
+
+      # the whole update on an expired forecast, as the watering decision runs
+      # it without the prefetch task: the fetch, saving the cache to disk and
+      # publishing the new snapshot
+      f_TTL_s = o_LiveForecast.o_Cache.f_TTL_s
+      o_LiveForecast.o_Cache.f_TTL_s = 0.0
+      def UpdateStage():
+        o_LiveForecast.f_LastPrefetchStart = None
+        o_LiveForecast.update(b_Fetch = True)
+      d_Results["forecast_update"] = MeasureFetch(UpdateStage)
+      o_LiveForecast.o_Cache.f_TTL_s = f_TTL_s
+
+      # a cache hit: what the watering decision pays on most cycles
+      o_LiveForecast.update(b_Fetch = True)
+      d_Results["forecast_cached"] = MeasureStage(lambda: o_LiveForecast.update(b_Fetch = True), i_Iterations)
+
+      # the warm start: loading the forecast saved by the fetch above, as it
+      # is saved now and as the JSON it used to be saved as
+      o_JSONCache = forecast_cache.ForecastCache(os.path.join(s_TempDir, "live_cache.json"),
+                                                 fn_Encode = forecast_series.ParsedForecast.ToDict,
+                                                 fn_Decode = forecast_series.ForecastFromDict)
+      o_JSONCache.Refresh(o_LiveForecast.FetchForecast)
+      d_Results["forecast_load_json"] = MeasureStage(o_JSONCache.LoadFromDisk, i_Iterations)
+      d_Results["forecast_load"]      = MeasureStage(o_LiveForecast.o_Cache.LoadFromDisk, i_Iterations)
+
+    # the GUI needs a display, real or virtual
+    o_Xvfb = StartVirtualDisplay()
+    try:
+      import gui
+      configs.s_ImageDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Images") + os.sep
+      with contextlib.redirect_stdout(io.StringIO()):
+        o_GUI = gui.mainGUI()
+        o_TempModule.main()
+        o_WaterModule.main()
+        d_Results["gui"] = MeasureStage(lambda: o_GUI.update(o_TempModule, o_WaterModule), i_Iterations)
+        o_GUI.master.destroy()
+    except Exception as o_Exception:
+      print("skipping the GUI stage: %s" % o_Exception)
+    finally:
+      if(o_Xvfb != None):
+        o_Xvfb.terminate()
+  finally:
+    for o_StandIn in l_Servers:
+      o_StandIn.close()
+    shutil.rmtree(s_TempDir, ignore_errors = True)
+  return d_Results
+
+'''*****************************************************************
+* Name: CompareToBaseline
+* Description: Prints the change of every stage against a baseline and
+*              lists the stages whose p95 latency got worse by more than
+*              the tolerance.
+* Parameters:  dict  d_Results
+*                    Results of this run.
+*              dict  d_Baseline
+*                    Results of the baseline run.
+*              float f_Tolerance
+*                    Allowed relative slowdown, e.g. 0.2 for 20%.
+* Returns:     list  l_Regressions
+*                    Names of the stages that regressed.
+*****************************************************************'''
+def CompareToBaseline(d_Results, d_Baseline, f_Tolerance):
+  l_Regressions = []
+  for s_Stage, d_Stage in d_Results.items():
+    if(s_Stage not in d_Baseline["d_Stages"]):
+      continue
+    f_Old = d_Baseline["d_Stages"][s_Stage]["f_P95_ms"]
+    f_New = d_Stage["f_P95_ms"]
+    f_Change = (f_New - f_Old) / f_Old if f_Old > 0 else 0.0
+    b_Regressed = f_Change > f_Tolerance
+    print("%-24s p95 %9.3f ms -> %9.3f ms (%+.0f%%)%s" % (s_Stage, f_Old, f_New, 100 * f_Change,
+                                                        "  REGRESSION" if b_Regressed else ""))
+    if(b_Regressed):
+      l_Regressions.append(s_Stage)
+  return l_Regressions
+
+def main():
+  o_Parser = argparse.ArgumentParser(description = "Benchmark each stage of the RPI Smart Home control loop.")
+  o_Parser.add_argument("--iterations", type = int, default = 200, help = "measured passes per stage")
+  o_Parser.add_argument("--save", help = "write the results to this JSON baseline file")
+  o_Parser.add_argument("--compare", help = "compare the results against this JSON baseline file")
+  o_Parser.add_argument("--tolerance", type = float, default = 0.2, help = "allowed p95 slowdown before a stage counts as regressed")
+  o_Parser.add_argument("--zones", default = "2,4,8,16,32", help = "comma separated numbers of indoor zones to benchmark")
+  o_Parser.add_argument("--handshake-ms", type = float, default = 0.0,
+                        help = "delay the stand-in weather server adds to every new connection")
+  o_Args = o_Parser.parse_args()
+
+  d_Results = RunBenchmarks(o_Args.iterations, [int(s_Zones) for s_Zones in o_Args.zones.split(",") if s_Zones],
+                            o_Args.handshake_ms / 1000)
+
+  print("%-24s %9s %9s %9s %9s %9s" % ("stage", "p50 ms", "p95 ms", "p99 ms", "cpu ms", "alloc KiB"))
+  for s_Stage, d_Stage in d_Results.items():
+    print("%-24s %9.3f %9.3f %9.3f %9.3f %9.1f" % (s_Stage, d_Stage["f_P50_ms"], d_Stage["f_P95_ms"],
+                                                  d_Stage["f_P99_ms"], d_Stage["f_CPU_ms"], d_Stage["f_Alloc_KiB"]))
+  for s_Stage, d_Stage in d_Results.items():
+    if("f_PerZone_us" in d_Stage):
+      print("%-24s %.1f us per zone, read to publish p50 %.1f ms" % (s_Stage, d_Stage["f_PerZone_us"],
+                                                                    d_Stage["f_ReadToPublish_ms"]))
+  for s_Stage, d_Stage in d_Results.items():
+    if("i_BytesPerFetch" in d_Stage):
+      print("%-24s %d bytes and %.2f connections per fetch" % (s_Stage, d_Stage["i_BytesPerFetch"],
+                                                              d_Stage["f_ConnectionsPerFetch"]))
+
+  if(o_Args.save):
+    d_Baseline = {"s_Python": sys.version.split()[0],
+                  "f_Created": time.time(),
+                  "d_Versions": {o_Module.__name__: o_Module.__version__
+                                 for o_Module in (temperature, water_lawn, configs)},
+                  "d_Stages": d_Results}
+    with open(o_Args.save, "w") as o_File:
+      json.dump(d_Baseline, o_File, indent = 2)
+
+  if(o_Args.compare):
+    with open(o_Args.compare) as o_File:
+      d_Baseline = json.load(o_File)
+    if(len(CompareToBaseline(d_Results, d_Baseline, o_Args.tolerance)) > 0):
+      sys.exit(1)
+
+if __name__ == "__main__":
+  main()
+
+################################## end file ###################################
@@ -20,6 +20,13 @@ __version__ = "2.0.1"
 ############################## Global Switches #################################
 SW_USE_METRIC_UNITS = False
 
+# run without the GUI, e.g. as a systemd service. tkinter and PIL are never 
+# imported. can also be set with python3 main.py --headless
+SW_HEADLESS = False
+
+# "hardware" reads the real sensors, "simulated" replays traces (see drivers.py)
+s_DriverBackend = "hardware"
+
 ################################ Error Codes ###################################
 SYSERROR_NO_ERROR                    = 0
 SYSERROR_TEMP_OUTDOOR_SENSOR_FAILURE = 1
@@ -35,11 +42,38 @@ s_ApiKey             = "dea7ee9f3820aa9e6f8c6f1528ebb0aa" # modify this with you
 s_GPSLocation_LatLon = "42.344137,-83.309652" # modify this with your own GPS coordinates, e.g. "37.5148,15.7891"
 s_FullAPI = s_ApiBase + s_ApiKey +  "/" + s_GPSLocation_LatLon # full API path
 
+f_ApiConnectTimeout_s = 5    # give up on opening a connection to the API after this long
+f_ApiReadTimeout_s    = 15   # give up on a response that stalls for this long
+s_ApiExclude          = "currently,minutely,alerts,flags" # blocks of the response the system never uses
+
+s_OpenMeteoAPI = "https://api.open-meteo.com/v1/forecast" # keyless API the forecast falls back to
+
+# weather providers in order of preference: (provider, URL, requests allowed
+# per quota period, quota period in seconds). the first one is asked first, the
+# next one when it fails, runs out of requests or is slow to answer. providers
+# are "darksky" and "openmeteo" (see weather_providers.py)
+l_WeatherProviders = [("darksky",   s_FullAPI,      1000,  86400),
+                      ("openmeteo", s_OpenMeteoAPI, 10000, 86400)]
+i_ProviderBurst        = 3    # requests a provider may make back to back before its budget spreads them out
+f_ProviderHedgeDelay_s = 3    # also ask the next provider if the first hasn't answered after this long, None to never hedge
+
+f_ForecastCacheTTL_s    = 600   # a cached forecast is served as fresh for this long
+f_ForecastMaxAge_s      = 21600 # while the API is down, the watering decision uses the last forecast for this long
+s_ForecastCacheFile     = "/home/pi/Git/RPISmartHome/Source/forecast_cache.bin" # on-disk copy of the last forecast, loaded at startup
+
 ######################### Temperature sensor information #######################
 
 i_IndoorSensorPin  = 17   # modify this with your own sensor signal pin for the outside
 i_OutdoorSensorPin = 26   # modify this with your own sensor signal pin for indoors
 
+i_DHTMaxRetries    = 15 # attempts per sensor read, same as Adafruit_DHT.read_retry
+f_DHTRetryDelay_s  = 2  # wait between attempts, the DHT11 can't be polled faster
+f_DHTReadTimeout_s = 10 # give up on a sensor read after this long
+f_SensorMaxAge_s   = 4  # a reading younger than this is reused instead of reading again
+f_DHTMinInterval_s = 2  # the sampler thread reads each DHT11 this often, its fastest safe rate
+f_DHTMaxAge_s      = 30 # a sensor fails once its last good reading is older than this
+i_DHTQualityWindow = 10 # recent attempts a sensor's read quality is computed over
+
 i_DoNothingFlag  = 0  # flag state indicating system will not heat or cool
 i_HeatFlag       = 1  # flag state indicating system will heat 
 i_CoolFlag       = 2  # flag state indicating system will cool
@@ -67,6 +101,11 @@ if SW_USE_METRIC_UNITS:
     
 f_HumThreshold_Pct = 50
 
+# indoor zones: (name, GPIO pin, heat setting, cool setting, comfort zone range).
+# every zone gets its own DHT11 and its own on/off decision. the first zone is
+# the one shown on the GUI
+l_Zones = [("indoor", i_IndoorSensorPin, f_HeatSetting, f_CoolSetting, f_ComfortZoneRange)]
+
 ########################### Moisture Sensor Configs ############################
 
 # note: to enable SPI for you:
@@ -81,6 +120,15 @@ i_AdcChannel = 2 # read channel 2 of the ADC
 
 i_WaterSensorScalar = 1024 # ADC outputs (0,1024), will scale to a percentage
 
+# the moisture sensor is oversampled in the background and filtered, so one
+# noisy conversion can't flip the watering decision
+f_WaterSampleRate_Hz = 50   # ADC reads per second
+i_WaterSampleBatch   = 10   # reads taken back to back each time the sampler wakes up
+i_WaterSampleWindow  = 250  # reads the filter runs over (5 seconds at 50 Hz)
+f_WaterTrimFraction  = 0.1  # fraction of the window dropped at each end for the trimmed mean
+f_WaterShortFraction = 0.5  # the sensor counts as shorted once this fraction of the window is shorts
+f_WaterMaxAge_s      = 2    # a filtered value older than this means the sampler has stalled
+
 #turn sprinkler on and off
 i_SprinklerOff = 0
 i_SprinklerOn = 1
@@ -92,55 +140,74 @@ i_EndRain = 17    #based on usual peak hotness of day 5PM
 #percentage of precipitation that counts as going to rain
 f_ExpectRainPercent = 0.65
 
+#windows the rain risk is evaluated over: (name, hours ahead, first hour of
+#day, last hour of day). the first window drives the watering decision
+l_RainWindows = [("watering", 12, i_StartRain, i_EndRain),
+                 ("next_day", 24, 0, 23)]
+
 #1:Sand, 2:Loamy Sand, 3:Sandy Loam, 4:Loam, 5:Silt Loam, 6:Silty Clay Loam, 7:Clay Loam
 #8:Sandy Clay Loam, 9:Sandy Clay, 10:Silty Clay, 11:Clay
 i_SandType = 4
 
-#Sand
-if i_SandType == 1:
-  f_Wilt = 5.5
-  f_Capacity = 10
-#Loamy Sand
-elif i_SandType == 2:
-  f_Wilt = 9.25
-  f_Capacity = 16
-#Sandy Loam
-elif i_SandType == 3:
-  f_Wilt = 12
-  f_Capacity = 21
-#Loam
-elif i_SandType == 4:
-  f_Wilt = 15.75
-  f_Capacity = 27
-#Silt Loam
-elif i_SandType == 5:
-  f_Wilt = 18.75
-  f_Capacity = 30
-#Silty Clay Loam
-elif i_SandType == 6:
-  f_Wilt = 24
-  f_Capacity == 36
-#Clay Loam
-elif i_SandType == 7:
-  f_Wilt = 21.5
-  f_Capacity = 32
-#Sandy Clay Loam
-elif i_SandType == 8:
-  f_Wilt = 20.75
-  f_Capacity = 29
-#Sandy Clay
-elif i_SandType == 9:
-  f_Wilt = 18.25
-  f_Capacity = 28
-#Silty Clay
-elif i_SandType == 10:
-  f_Wilt = 25
-  f_Capacity = 40
-#Clay
-elif i_SandType == 11:
-  f_Wilt = 26.5
-  f_Capacity = 40
-  
+#(name, wilt point, field capacity) of each soil type, in percent volumetric
+#water content. the sprinkler turns on below the wilt point and off above the
+#field capacity
+d_SoilTypes = {1:  ("Sand",            5.5,   10),
+               2:  ("Loamy Sand",      9.25,  16),
+               3:  ("Sandy Loam",      12,    21),
+               4:  ("Loam",            15.75, 27),
+               5:  ("Silt Loam",       18.75, 30),
+               6:  ("Silty Clay Loam", 24,    36),
+               7:  ("Clay Loam",       21.5,  32),
+               8:  ("Sandy Clay Loam", 20.75, 29),
+               9:  ("Sandy Clay",      18.25, 28),
+               10: ("Silty Clay",      25,    40),
+               11: ("Clay",            26.5,  40)}
+s_SoilName, f_Wilt, f_Capacity = d_SoilTypes[i_SandType]
+
+#lawn the irrigation backtester simulates
+f_SprinklerRate_mm_h = 25   # water the sprinkler puts down, about an inch an hour
+f_RootDepth_mm       = 150  # depth of soil the moisture sensor stands for
+
+############################# Sensor History Configs ###########################
+s_HistoryDirectory = "/home/pi/Git/RPISmartHome/Source/history/" # one ring buffer file per channel
+i_HistoryCapacity  = 120960 # samples per channel, one week at the 5 second cycle (~1.9 MB)
+
+############################ Forecast Archive Configs ##########################
+SW_FORECAST_ARCHIVE        = True   # keep every fetched hourly forecast to score its accuracy (see forecast_archive.py)
+s_ForecastArchiveDirectory = "/home/pi/Git/RPISmartHome/Source/forecast_archive/" # one file per month
+i_ForecastArchiveMonths    = 36     # months kept, older files are deleted (up to ~0.4 MB a month, a third of that once compressed)
+f_ForecastScoreWindow_s    = 604800 # forecasts are scored over this much of the sensor history (one week)
+l_ForecastLeads_h          = [1, 6, 12, 24] # forecasts are scored as they stood this many hours ahead
+f_RainHumidity_Pct         = 95     # an hour whose outdoor humidity reaches this counts as rained on
+
+################################# GUI Configs ##################################
+s_ImageDirectory = "/home/pi/Git/RPISmartHome/Source/Images/" # weather icons, named after the API's icon field
+s_DefaultIcon    = "cloudy" # shown before the first forecast and for unknown icons
+i_IconCacheSize  = 12       # decoded icons kept in memory (there are 10 icons)
+
+############################### Metrics Configs ################################
+SW_SERVE_METRICS = True        # serve timings and counters at http://<address>:<port>/metrics
+s_MetricsAddress = "127.0.0.1" # localhost only, use "0.0.0.0" to let other machines scrape it
+i_MetricsPort    = 9105
+
+############################### Fleet Configs ##################################
+SW_FLEET_REPORTING     = False              # push this controller's state to a fleet aggregator (see fleet.py)
+s_FleetAddress         = "127.0.0.1:9106"   # aggregator address, "host:port" or "unix:/path/to/socket"
+s_ControllerName       = ""                 # name reported to the aggregator, the hostname if empty
+f_FleetReportPeriod_s  = 60                 # how often the batch of snapshots is pushed
+f_FleetTimeout_s       = 5                  # give up on a push after this long
+i_FleetMaxPending      = 720                # snapshots kept while the aggregator is away (one hour)
+i_FleetHistoryCapacity = 17280              # snapshots the aggregator keeps per controller (one day)
+i_FleetMaxFrame        = 4194304            # largest message the aggregator accepts, in bytes
+i_FleetMaxMessage      = 33554432           # largest message after decompression, in bytes
+
+############################# Supervisor Configs ###############################
+i_BreakerFailures     = 3     # failures in a row that open a module's circuit breaker
+f_BreakerBackoff_s    = 30    # time the breaker first stays open before a module is retried
+f_BreakerMaxBackoff_s = 1800  # every failed retry doubles the open time, up to this
+f_BreakerJitter       = 0.2   # random spread of the open time, as a fraction
+
 ############################## Timing Configs ##################################
 # note: all times considered to be in military time
 i_NighttimeHour = 21  # when does night start?
@@ -154,4 +221,16 @@ i_NightFlag   = 1  # the current state of the system is night
 
 i_StartSummerMonth = 4  # summer starts in May
 i_EndSummerMonth   = 10 # summer ends in October
+
+# scheduler periods and deadlines for each task of the main loop, in seconds
+f_TempTaskPeriod_s       = 5
+f_TempTaskDeadline_s     = 4
+f_WaterTaskPeriod_s      = 5
+f_WaterTaskDeadline_s    = 4
+f_ForecastTaskPeriod_s   = 60
+f_ForecastTaskDeadline_s = 30
+f_GUITaskPeriod_s        = 5
+f_GUITaskDeadline_s      = 2
+f_StatsReportPeriod_s    = 300 # how often the scheduler statistics are printed
+f_ScoreTaskPeriod_s      = 3600 # how often the archived forecasts are scored, on the network worker
 ################################## end file ####################################
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: drivers.py                                                       *
+* Purpose:   Hardware and simulated drivers for the DHT11 and MCP3008.        *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs    # global configs file
+import csv        # library for reading trace files
+import math       # library for the synthetic daily cycle
+import os         # library for the backend override
+import random     # library for synthetic noise and failures
+import threading  # library for locking the trace position
+import time       # library for sleep operations
+
+# the backend can be overridden from the environment, e.g.
+# RPISMARTHOME_DRIVERS=simulated python3 main.py
+s_BackendVariable = "RPISMARTHOME_DRIVERS"
+
+# class to read a DHT11 through the Adafruit library
+class HardwareDHT:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class HardwareDHT. The Adafruit library
+  *              is only imported when a hardware driver is created.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self):
+    import Adafruit_DHT # library to interface with DHT11 sensor
+    self.o_Library    = Adafruit_DHT
+    self.i_SensorType = Adafruit_DHT.DHT11
+
+  '''*****************************************************************
+  * Name: read
+  * Description: Makes a single read attempt.
+  * Parameters:  int i_GPIOPin
+  *                  GPIO pin the sensor is wired to.
+  * Returns:     float f_Humidity_Pct
+  *              float f_Temperature_C
+  *                    Both None if the read failed.
+  *****************************************************************'''
+  def read(self, i_GPIOPin):
+    return self.o_Library.read(self.i_SensorType, i_GPIOPin)
+
+  '''*****************************************************************
+  * Name: sleep
+  * Description: Waits between read attempts.
+  * Parameters:  float f_Seconds
+  * Returns:     N/A
+  *****************************************************************'''
+  def sleep(self, f_Seconds):
+    time.sleep(f_Seconds)
+
+# class to read the MCP3008 ADC through the Adafruit libraries
+class HardwareADC:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class HardwareADC. Sets up the SPI
+  *              device. The Adafruit libraries are only imported when a
+  *              hardware driver is created.
+  * Parameters:  int i_SPIPort
+  *              int i_SPIDevice
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, i_SPIPort, i_SPIDevice):
+    from Adafruit_GPIO import SPI # library for SPI communication
+    import Adafruit_MCP3008       # library for decoding the output of the ADC
+    self.o_AdcDevice = Adafruit_MCP3008.MCP3008(spi = SPI.SpiDev(i_SPIPort, i_SPIDevice))
+
+  '''*****************************************************************
+  * Name: read_adc_difference
+  * Description: Reads the difference between a pair of ADC channels.
+  * Parameters:  int i_Channel
+  * Returns:     int i_DigitalValue
+  *****************************************************************'''
+  def read_adc_difference(self, i_Channel):
+    return self.o_AdcDevice.read_adc_difference(i_Channel)
+
+# class to step through a recorded or synthetic list of samples, starting
+# over at the end so a short trace can drive a long run
+class Trace:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class Trace
+  * Parameters:  list l_Samples
+  *                   Samples to replay in order.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, l_Samples):
+    if(len(l_Samples) == 0):
+      raise ValueError("a trace needs at least one sample")
+    self.l_Samples = l_Samples
+    self.i_Index   = 0
+    self.o_Lock    = threading.Lock()
+
+  '''*****************************************************************
+  * Name: next
+  * Description: Returns the next sample.
+  * Parameters:  N/A
+  * Returns:     obj o_Sample
+  *****************************************************************'''
+  def next(self):
+    with self.o_Lock:
+      o_Sample = self.l_Samples[self.i_Index]
+      self.i_Index = (self.i_Index + 1) % len(self.l_Samples)
+      return o_Sample
+
+'''*****************************************************************
+* Name: SyntheticDHTSamples
+* Description: Makes a DHT11 trace that follows a daily temperature
+*              cycle, with noise and failed reads.
+* Parameters:  int   i_Count
+*                    Number of samples.
+*              float f_Step_s
+*                    Simulated time between samples.
+*              float f_MeanC
+*                    Mean temperature in Celsius.
+*              float f_SwingC
+*                    Half of the daily temperature range.
+*              float f_FailureRate
+*                    Fraction of reads that return (None, None).
+*              int   i_Seed
+*                    Seed for the random numbers.
+* Returns:     list  l_Samples
+*                    (humidity, temperature C) tuples.
+*****************************************************************'''
+def SyntheticDHTSamples(i_Count, f_Step_s = 5, f_MeanC = 18, f_SwingC = 8,
+                        f_FailureRate = 0.05, i_Seed = 0):
+  o_Random = random.Random(i_Seed)
+  l_Samples = []
+  for i in range(i_Count):
+    if(o_Random.random() < f_FailureRate):
+      l_Samples.append((None, None))
+      continue
+    f_DayFraction = (i * f_Step_s % 86400) / 86400
+    f_Temperature_C = f_MeanC - f_SwingC * math.cos(2 * math.pi * (f_DayFraction - 1 / 12))
+    f_Humidity_Pct  = 60 + 20 * math.cos(2 * math.pi * f_DayFraction)
+    # the DHT11 only reports whole numbers
+    l_Samples.append((float(round(f_Humidity_Pct + o_Random.gauss(0, 2))),
+                      float(round(f_Temperature_C + o_Random.gauss(0, 0.5)))))
+  return l_Samples
+
+'''*****************************************************************
+* Name: SyntheticADCSamples
+* Description: Makes a soil moisture trace that dries out slowly, jumps
+*              back up as if watered, and has noise and shorts.
+* Parameters:  int   i_Count
+*                    Number of samples.
+*              float f_ShortRate
+*                    Fraction of reads that return a short (1024).
+*              int   i_Seed
+*                    Seed for the random numbers.
+* Returns:     list  l_Samples
+*                    ADC values.
+*****************************************************************'''
+def SyntheticADCSamples(i_Count, f_ShortRate = 0.01, i_Seed = 0):
+  o_Random = random.Random(i_Seed)
+  l_Samples = []
+  f_Level = 0.30 * configs.i_WaterSensorScalar
+  for i in range(i_Count):
+    if(o_Random.random() < f_ShortRate):
+      l_Samples.append(configs.i_WaterSensorScalar)
+      continue
+    f_Level -= 0.2
+    if(f_Level < 0.12 * configs.i_WaterSensorScalar):
+      f_Level = 0.30 * configs.i_WaterSensorScalar
+    i_Value = int(f_Level + o_Random.gauss(0, 8))
+    l_Samples.append(min(max(i_Value, 0), configs.i_WaterSensorScalar - 1))
+  return l_Samples
+
+'''*****************************************************************
+* Name: LoadDHTTrace
+* Description: Loads DHT11 traces from a CSV file with the columns
+*              pin,humidity,temperature_c. Empty values are failed reads.
+* Parameters:  str  s_Path
+*                   Path of the CSV file.
+* Returns:     dict d_Traces
+*                   Trace keyed by GPIO pin.
+*****************************************************************'''
+def LoadDHTTrace(s_Path):
+  d_Samples = {}
+  with open(s_Path, newline = "") as o_File:
+    for d_Row in csv.DictReader(o_File):
+      if(d_Row["humidity"] == "" or d_Row["temperature_c"] == ""):
+        t_Sample = (None, None)
+      else:
+        t_Sample = (float(d_Row["humidity"]), float(d_Row["temperature_c"]))
+      d_Samples.setdefault(int(d_Row["pin"]), []).append(t_Sample)
+  return {i_Pin: Trace(l_Samples) for i_Pin, l_Samples in d_Samples.items()}
+
+'''*****************************************************************
+* Name: LoadADCTrace
+* Description: Loads MCP3008 traces from a CSV file with the columns
+*              channel,value.
+* Parameters:  str  s_Path
+*                   Path of the CSV file.
+* Returns:     dict d_Traces
+*                   Trace keyed by ADC channel.
+*****************************************************************'''
+def LoadADCTrace(s_Path):
+  d_Samples = {}
+  with open(s_Path, newline = "") as o_File:
+    for d_Row in csv.DictReader(o_File):
+      d_Samples.setdefault(int(d_Row["channel"]), []).append(int(d_Row["value"]))
+  return {i_Channel: Trace(l_Samples) for i_Channel, l_Samples in d_Samples.items()}
+
+# class that stands in for HardwareDHT by replaying traces
+class SimulatedDHT:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class SimulatedDHT
+  * Parameters:  dict  d_Traces
+  *                    Trace keyed by GPIO pin. Pins without a trace get
+  *                    a synthetic one.
+  *              float f_TimeScale
+  *                    Multiplier on the real read and retry times. 0
+  *                    runs as fast as possible.
+  *              float f_ReadTime_s
+  *                    Real time one read attempt takes.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, d_Traces = None, f_TimeScale = 0.0, f_ReadTime_s = 0.25):
+    self.d_Traces     = dict(d_Traces) if d_Traces != None else {}
+    self.f_TimeScale  = f_TimeScale
+    self.f_ReadTime_s = f_ReadTime_s
+    self.o_Lock       = threading.Lock()
+    self.i_Reads      = 0
+
+  '''*****************************************************************
+  * Name: read
+  * Description: Returns the next sample of the pin's trace.
+  * Parameters:  int i_GPIOPin
+  * Returns:     float f_Humidity_Pct
+  *              float f_Temperature_C
+  *****************************************************************'''
+  def read(self, i_GPIOPin):
+    with self.o_Lock:
+      if(i_GPIOPin not in self.d_Traces):
+        self.d_Traces[i_GPIOPin] = Trace(SyntheticDHTSamples(17280, i_Seed = i_GPIOPin))
+      o_Trace = self.d_Traces[i_GPIOPin]
+      self.i_Reads += 1
+    self.sleep(self.f_ReadTime_s)
+    return o_Trace.next()
+
+  '''*****************************************************************
+  * Name: sleep
+  * Description: Waits between read attempts, scaled by the time scale.
+  * Parameters:  float f_Seconds
+  * Returns:     N/A
+  *****************************************************************'''
+  def sleep(self, f_Seconds):
+    if(self.f_TimeScale > 0):
+      time.sleep(f_Seconds * self.f_TimeScale)
+
+# class that stands in for HardwareADC by replaying traces
+class SimulatedADC:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class SimulatedADC
+  * Parameters:  dict d_Traces
+  *                   Trace keyed by ADC channel. Channels without a
+  *                   trace get a synthetic one.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, d_Traces = None):
+    self.d_Traces = dict(d_Traces) if d_Traces != None else {}
+    self.o_Lock   = threading.Lock()
+    self.i_Reads  = 0
+
+  '''*****************************************************************
+  * Name: read_adc_difference
+  * Description: Returns the next sample of the channel's trace.
+  * Parameters:  int i_Channel
+  * Returns:     int i_DigitalValue
+  *****************************************************************'''
+  def read_adc_difference(self, i_Channel):
+    with self.o_Lock:
+      if(i_Channel not in self.d_Traces):
+        self.d_Traces[i_Channel] = Trace(SyntheticADCSamples(17280, i_Seed = i_Channel))
+      self.i_Reads += 1
+      return self.d_Traces[i_Channel].next()
+
+# drivers handed out to the sensors. created on first use, or set with
+# SetDrivers before the modules are created
+o_DHTDriver = None
+o_ADCDriver = None
+
+'''*****************************************************************
+* Name: IsSimulated
+* Description: Checks which backend is selected.
+* Parameters:  N/A
+* Returns:     bool b_Simulated
+*****************************************************************'''
+def IsSimulated():
+  return os.environ.get(s_BackendVariable, configs.s_DriverBackend) == "simulated"
+
+'''*****************************************************************
+* Name: SetDrivers
+* Description: Replaces the drivers handed to sensors created from now on.
+* Parameters:  obj o_DHT
+*                  DHT11 driver, None keeps the current one.
+*              obj o_ADC
+*                  MCP3008 driver, None keeps the current one.
+* Returns:     N/A
+*****************************************************************'''
+def SetDrivers(o_DHT = None, o_ADC = None):
+  global o_DHTDriver, o_ADCDriver
+  if(o_DHT != None):
+    o_DHTDriver = o_DHT
+  if(o_ADC != None):
+    o_ADCDriver = o_ADC
+
+'''*****************************************************************
+* Name: GetDHTDriver
+* Description: Returns the DHT11 driver of the selected backend.
+* Parameters:  N/A
+* Returns:     obj o_Driver
+*****************************************************************'''
+def GetDHTDriver():
+  global o_DHTDriver
+  if(o_DHTDriver == None):
+    o_DHTDriver = SimulatedDHT() if IsSimulated() else HardwareDHT()
+  return o_DHTDriver
+
+'''*****************************************************************
+* Name: GetADCDriver
+* Description: Returns the MCP3008 driver of the selected backend.
+* Parameters:  N/A
+* Returns:     obj o_Driver
+*****************************************************************'''
+def GetADCDriver():
+  global o_ADCDriver
+  if(o_ADCDriver == None):
+    if(IsSimulated()):
+      o_ADCDriver = SimulatedADC()
+    else:
+      o_ADCDriver = HardwareADC(configs.i_SPIPort, configs.i_SPIDevice)
+  return o_ADCDriver
+
+################################## end file ###################################
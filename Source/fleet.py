@@ -0,0 +1,694 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: fleet.py                                                         *
+* Purpose:   Aggregator that many controllers push their state to, the        *
+*            reporter each controller pushes with, and a load test.           *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs    # global configs file
+import array      # library for the columnar history
+import asyncio    # library for serving many controllers on one thread
+import bisect     # library for time range queries
+import json       # library for the message format
+import math       # library for marking missing values
+import os         # library for pinning the load test aggregator to a core
+import socket     # library for the reporter's connection
+import struct     # library for the frame header
+import threading  # library for locking the reporter's batch
+import time       # library for time capturing
+import zlib       # library for compressing batches
+
+# protocol: every message is a 4 byte big endian length followed by that many
+# bytes of zlib compressed JSON. a controller sends
+#   {"s_Type": "push", "s_Controller": name, "d_Columns": {field: [values]}}
+# with one list per field, and the aggregator answers {"i_Stored": count}.
+# queries are {"s_Type": "query", "s_Query": name, ...} and are answered with
+# {"o_Result": result}. errors are answered with {"s_Error": message}.
+s_FrameHeader = ">I"
+i_FrameHeader = struct.calcsize(s_FrameHeader)
+
+# the fields of a state snapshot. every one is stored as a double, with NaN
+# where a controller had no value
+t_Fields = ("f_Time",
+            "f_OutdoorTemp_F", "f_OutdoorHumidity_Pct",
+            "f_IndoorTemp_F", "f_IndoorHumidity_Pct",
+            "i_HvacStateFlag", "f_SetTemperature", "i_HvacState",
+            "f_WaterLevel_Pct", "i_WaterFlag",
+            "i_TempError", "i_WaterError")
+
+'''*****************************************************************
+* Name: EncodeFrame
+* Description: Packs a message into a frame.
+* Parameters:  dict d_Message
+* Returns:     bytes b_Frame
+*****************************************************************'''
+def EncodeFrame(d_Message):
+  b_Payload = zlib.compress(json.dumps(d_Message, separators = (",", ":")).encode("utf-8"))
+  return struct.pack(s_FrameHeader, len(b_Payload)) + b_Payload
+
+'''*****************************************************************
+* Name: DecodePayload
+* Description: Unpacks the payload of a frame. A payload that would
+*              inflate past i_FleetMaxMessage is rejected rather than
+*              decompressed into memory.
+* Parameters:  bytes b_Payload
+* Returns:     dict  d_Message
+*****************************************************************'''
+def DecodePayload(b_Payload):
+  o_Decompressor = zlib.decompressobj()
+  b_Message = o_Decompressor.decompress(b_Payload, configs.i_FleetMaxMessage)
+  if(len(o_Decompressor.unconsumed_tail) > 0):
+    raise ValueError("message larger than %d bytes" % configs.i_FleetMaxMessage)
+  return json.loads(b_Message.decode("utf-8"))
+
+'''*****************************************************************
+* Name: ParseAddress
+* Description: Parses "host:port" or "unix:/path/to/socket".
+* Parameters:  str   s_Address
+* Returns:     tuple t_Address
+*                    ("unix", path) or ("tcp", host, port)
+*****************************************************************'''
+def ParseAddress(s_Address):
+  if(s_Address.startswith("unix:")):
+    return ("unix", s_Address[len("unix:"):])
+  s_Host, _, s_Port = s_Address.rpartition(":")
+  return ("tcp", s_Host or "127.0.0.1", int(s_Port))
+
+'''*****************************************************************
+* Name: ToFloat
+* Description: Converts a snapshot value to a double, NaN if missing.
+* Parameters:  obj   o_Value
+* Returns:     float f_Value
+*****************************************************************'''
+def ToFloat(o_Value):
+  if(o_Value == None):
+    return math.nan
+  return float(o_Value)
+
+'''*****************************************************************
+* Name: FromFloat
+* Description: Converts a stored double back for a reply, None if NaN.
+* Parameters:  float f_Value
+* Returns:     obj   o_Value
+*****************************************************************'''
+def FromFloat(f_Value):
+  if(math.isnan(f_Value)):
+    return None
+  return f_Value
+
+# class for the history of one controller, one array per field. the arrays
+# are trimmed in chunks, so the oldest quarter goes at once instead of one
+# sample per append
+class ControllerHistory:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class ControllerHistory
+  * Parameters:  int i_Capacity
+  *                  Snapshots kept per controller.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, i_Capacity):
+    self.i_Capacity = i_Capacity
+    self.d_Columns  = {s_Field: array.array("d") for s_Field in t_Fields}
+    self.f_LastSeen = 0.0
+
+  def __len__(self):
+    return len(self.d_Columns["f_Time"])
+
+  '''*****************************************************************
+  * Name: extend
+  * Description: Appends a batch of snapshots.
+  * Parameters:  dict d_Columns
+  *                   List of values keyed by field. Missing fields are
+  *                   stored as NaN.
+  * Returns:     int  i_Stored
+  *                   Number of snapshots appended.
+  *****************************************************************'''
+  def extend(self, d_Columns):
+    i_Count = len(d_Columns.get("f_Time", ()))
+
+    # convert every column before touching the history so a bad value
+    # rejects the whole batch instead of leaving the columns misaligned
+    d_Converted = {}
+    for s_Field in t_Fields:
+      l_Values = d_Columns.get(s_Field)
+      if(l_Values == None or len(l_Values) != i_Count):
+        d_Converted[s_Field] = array.array("d", [math.nan]) * i_Count
+      else:
+        d_Converted[s_Field] = array.array("d", [ToFloat(o_Value) for o_Value in l_Values])
+    for s_Field, a_Values in d_Converted.items():
+      self.d_Columns[s_Field].extend(a_Values)
+
+    i_Excess = len(self) - self.i_Capacity
+    if(i_Excess > self.i_Capacity // 4):
+      for a_Column in self.d_Columns.values():
+        del a_Column[:i_Excess]
+    self.f_LastSeen = time.time()
+    return i_Count
+
+  '''*****************************************************************
+  * Name: latest
+  * Description: Returns the newest snapshot.
+  * Parameters:  N/A
+  * Returns:     dict d_Snapshot
+  *                   Value keyed by field, or None if there is none.
+  *****************************************************************'''
+  def latest(self):
+    if(len(self) == 0):
+      return None
+    return {s_Field: FromFloat(a_Column[-1]) for s_Field, a_Column in self.d_Columns.items()}
+
+  '''*****************************************************************
+  * Name: query
+  * Description: Returns one field between two times. A reporter sends
+  *              its snapshots in order, so the times are ascending.
+  * Parameters:  str   s_Field
+  *              float f_Start
+  *              float f_End
+  * Returns:     list  l_Times
+  *              list  l_Values
+  *****************************************************************'''
+  def query(self, s_Field, f_Start, f_End):
+    a_Time  = self.d_Columns["f_Time"]
+    a_Value = self.d_Columns[s_Field]
+    i_Start = bisect.bisect_left(a_Time, f_Start)
+    i_End   = bisect.bisect_right(a_Time, f_End)
+    return list(a_Time[i_Start:i_End]), [FromFloat(f_Value) for f_Value in a_Value[i_Start:i_End]]
+
+# class for the aggregator service
+class FleetAggregator:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class FleetAggregator
+  * Parameters:  int i_Capacity
+  *                  Snapshots kept per controller.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, i_Capacity = configs.i_FleetHistoryCapacity):
+    self.i_Capacity    = i_Capacity
+    self.d_Controllers = {}
+
+    # statistics
+    self.i_Connections = 0
+    self.i_Batches     = 0
+    self.i_Snapshots   = 0
+    self.i_BytesIn     = 0
+    self.i_Errors      = 0
+
+  '''*****************************************************************
+  * Name: Store
+  * Description: Stores a batch pushed by a controller.
+  * Parameters:  str  s_Controller
+  *              dict d_Columns
+  * Returns:     int  i_Stored
+  *****************************************************************'''
+  def Store(self, s_Controller, d_Columns):
+    o_History = self.d_Controllers.get(s_Controller)
+    if(o_History == None):
+      o_History = ControllerHistory(self.i_Capacity)
+      self.d_Controllers[s_Controller] = o_History
+    i_Stored = o_History.extend(d_Columns)
+    self.i_Batches   += 1
+    self.i_Snapshots += i_Stored
+    return i_Stored
+
+  '''*****************************************************************
+  * Name: Summary
+  * Description: Fleet-wide figures over the newest snapshot of every
+  *              controller seen within a window.
+  * Parameters:  float f_Window_s
+  *                    Controllers silent for longer are counted as
+  *                    offline.
+  * Returns:     dict  d_Summary
+  *****************************************************************'''
+  def Summary(self, f_Window_s = 600):
+    f_Now = time.time()
+    d_Summary = {"i_Controllers": len(self.d_Controllers), "i_Online": 0,
+                 "i_Heating": 0, "i_Cooling": 0, "i_HvacOn": 0, "i_Watering": 0,
+                 "l_WithErrors": [], "l_Offline": []}
+    d_Temps = {"f_OutdoorTemp_F": [], "f_IndoorTemp_F": [], "f_WaterLevel_Pct": []}
+    for s_Controller, o_History in self.d_Controllers.items():
+      d_Latest = o_History.latest()
+      if(d_Latest == None or f_Now - o_History.f_LastSeen > f_Window_s):
+        d_Summary["l_Offline"].append(s_Controller)
+        continue
+      d_Summary["i_Online"] += 1
+      d_Summary["i_Heating"]  += d_Latest["i_HvacStateFlag"] == configs.i_HeatFlag
+      d_Summary["i_Cooling"]  += d_Latest["i_HvacStateFlag"] == configs.i_CoolFlag
+      d_Summary["i_HvacOn"]   += d_Latest["i_HvacState"] == configs.i_HvacOn
+      d_Summary["i_Watering"] += d_Latest["i_WaterFlag"] == 1
+      if(d_Latest["i_TempError"] not in (None, configs.SYSERROR_NO_ERROR)
+        or d_Latest["i_WaterError"] not in (None, configs.SYSERROR_NO_ERROR)):
+        d_Summary["l_WithErrors"].append(s_Controller)
+      for s_Field, l_Values in d_Temps.items():
+        if(d_Latest[s_Field] != None):
+          l_Values.append(d_Latest[s_Field])
+
+    for s_Field, l_Values in d_Temps.items():
+      if(len(l_Values) > 0):
+        d_Summary[s_Field] = {"f_Min": min(l_Values), "f_Max": max(l_Values),
+                              "f_Mean": sum(l_Values) / len(l_Values)}
+    return d_Summary
+
+  '''*****************************************************************
+  * Name: Query
+  * Description: Answers a query message.
+  * Parameters:  dict d_Message
+  *                   "s_Query" is one of latest, summary, series or
+  *                   stats. series also needs s_Controller, s_Field and
+  *                   optionally f_Start and f_End.
+  * Returns:     obj  o_Result
+  *****************************************************************'''
+  def Query(self, d_Message):
+    s_Query = d_Message.get("s_Query")
+    if(s_Query == "latest"):
+      return {s_Controller: o_History.latest() for s_Controller, o_History in self.d_Controllers.items()}
+    if(s_Query == "summary"):
+      return self.Summary(d_Message.get("f_Window_s", 600))
+    if(s_Query == "series"):
+      o_History = self.d_Controllers.get(d_Message.get("s_Controller"))
+      s_Field   = d_Message.get("s_Field")
+      if(o_History == None or s_Field not in t_Fields):
+        raise ValueError("unknown controller or field")
+      l_Times, l_Values = o_History.query(s_Field, d_Message.get("f_Start", 0.0),
+                                          d_Message.get("f_End", math.inf))
+      return {"l_Times": l_Times, "l_Values": l_Values}
+    if(s_Query == "stats"):
+      return {"i_Controllers": len(self.d_Controllers),
+              "i_Connections": self.i_Connections,
+              "i_Batches":     self.i_Batches,
+              "i_Snapshots":   self.i_Snapshots,
+              "i_BytesIn":     self.i_BytesIn,
+              "i_Errors":      self.i_Errors,
+              "f_CPU_s":       time.process_time()}
+    raise ValueError("unknown query %r" % s_Query)
+
+  '''*****************************************************************
+  * Name: HandleMessage
+  * Description: Answers one message.
+  * Parameters:  dict d_Message
+  * Returns:     dict d_Reply
+  *****************************************************************'''
+  def HandleMessage(self, d_Message):
+    try:
+      if(not isinstance(d_Message, dict)):
+        raise ValueError("message is not an object")
+      if(d_Message.get("s_Type") == "push"):
+        if(not isinstance(d_Message["d_Columns"], dict)):
+          raise ValueError("d_Columns is not an object")
+        return {"i_Stored": self.Store(str(d_Message["s_Controller"]), d_Message["d_Columns"])}
+      if(d_Message.get("s_Type") == "query"):
+        return {"o_Result": self.Query(d_Message)}
+      raise ValueError("unknown message type")
+    except (KeyError, TypeError, ValueError) as o_Exception:
+      self.i_Errors += 1
+      return {"s_Error": str(o_Exception)}
+
+  '''*****************************************************************
+  * Name: HandleConnection
+  * Description: Serves one controller until it disconnects.
+  * Parameters:  obj o_Reader
+  *              obj o_Writer
+  * Returns:     N/A
+  *****************************************************************'''
+  async def HandleConnection(self, o_Reader, o_Writer):
+    self.i_Connections += 1
+    try:
+      while True:
+        b_Header = await o_Reader.readexactly(i_FrameHeader)
+        i_Length = struct.unpack(s_FrameHeader, b_Header)[0]
+        if(i_Length > configs.i_FleetMaxFrame):
+          self.i_Errors += 1
+          break
+        b_Payload = await o_Reader.readexactly(i_Length)
+        self.i_BytesIn += i_FrameHeader + i_Length
+        try:
+          d_Message = DecodePayload(b_Payload)
+        except (zlib.error, ValueError):
+          self.i_Errors += 1
+          break
+        o_Writer.write(EncodeFrame(self.HandleMessage(d_Message)))
+        await o_Writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+      pass
+    finally:
+      o_Writer.close()
+
+  '''*****************************************************************
+  * Name: serve
+  * Description: Serves controllers until cancelled.
+  * Parameters:  str s_Address
+  *                  "host:port" or "unix:/path/to/socket".
+  * Returns:     N/A
+  *****************************************************************'''
+  async def serve(self, s_Address = configs.s_FleetAddress):
+    t_Address = ParseAddress(s_Address)
+    if(t_Address[0] == "unix"):
+      o_Server = await asyncio.start_unix_server(self.HandleConnection, t_Address[1])
+    else:
+      o_Server = await asyncio.start_server(self.HandleConnection, t_Address[1], t_Address[2],
+                                            backlog = 1024)
+    async with o_Server:
+      await o_Server.serve_forever()
+
+'''*****************************************************************
+* Name: Connect
+* Description: Opens a blocking connection to the aggregator.
+* Parameters:  str   s_Address
+*              float f_Timeout_s
+* Returns:     obj   o_Socket
+*****************************************************************'''
+def Connect(s_Address, f_Timeout_s):
+  t_Address = ParseAddress(s_Address)
+  if(t_Address[0] == "unix"):
+    o_Socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    o_Socket.settimeout(f_Timeout_s)
+    o_Socket.connect(t_Address[1])
+    return o_Socket
+  return socket.create_connection(t_Address[1:], timeout = f_Timeout_s)
+
+'''*****************************************************************
+* Name: ReceiveExactly
+* Description: Reads an exact number of bytes from a blocking socket.
+* Parameters:  obj   o_Socket
+*              int   i_Count
+* Returns:     bytes b_Data
+*****************************************************************'''
+def ReceiveExactly(o_Socket, i_Count):
+  l_Chunks = []
+  while i_Count > 0:
+    b_Chunk = o_Socket.recv(i_Count)
+    if(b_Chunk == b""):
+      raise ConnectionError("aggregator closed the connection")
+    l_Chunks.append(b_Chunk)
+    i_Count -= len(b_Chunk)
+  return b"".join(l_Chunks)
+
+'''*****************************************************************
+* Name: Request
+* Description: Sends one message over a blocking socket and waits for the
+*              reply.
+* Parameters:  obj  o_Socket
+*              dict d_Message
+* Returns:     dict d_Reply
+*****************************************************************'''
+def Request(o_Socket, d_Message):
+  o_Socket.sendall(EncodeFrame(d_Message))
+  i_Length = struct.unpack(s_FrameHeader, ReceiveExactly(o_Socket, i_FrameHeader))[0]
+  return DecodePayload(ReceiveExactly(o_Socket, i_Length))
+
+# class that collects a controller's snapshots and pushes them to the
+# aggregator in batches. snapshots that can't be sent are kept, up to a limit,
+# and go out with the next batch
+class FleetReporter:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class FleetReporter
+  * Parameters:  str s_Controller
+  *                  Name of this controller.
+  *              str s_Address
+  *                  Address of the aggregator.
+  *              int i_MaxPending
+  *                  Snapshots kept while the aggregator is unreachable.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Controller = None, s_Address = configs.s_FleetAddress,
+               i_MaxPending = configs.i_FleetMaxPending):
+    self.s_Controller = s_Controller or configs.s_ControllerName or socket.gethostname()
+    self.s_Address    = s_Address
+    self.i_MaxPending = i_MaxPending
+    self.o_Socket     = None
+    self.o_Lock       = threading.Lock()
+    self.d_Pending    = {s_Field: [] for s_Field in t_Fields}
+
+    # statistics
+    self.i_Sent    = 0
+    self.i_Dropped = 0
+    self.i_Errors  = 0
+
+  '''*****************************************************************
+  * Name: Record
+  * Description: Adds a snapshot to the next batch.
+  * Parameters:  dict d_Snapshot
+  *                   Value keyed by field. f_Time defaults to now.
+  * Returns:     N/A
+  *****************************************************************'''
+  def Record(self, d_Snapshot):
+    with self.o_Lock:
+      for s_Field, l_Values in self.d_Pending.items():
+        l_Values.append(d_Snapshot.get(s_Field))
+      if(self.d_Pending["f_Time"][-1] == None):
+        self.d_Pending["f_Time"][-1] = time.time()
+
+      # drop the oldest snapshots if the aggregator has been away too long
+      i_Excess = len(self.d_Pending["f_Time"]) - self.i_MaxPending
+      if(i_Excess > 0):
+        for l_Values in self.d_Pending.values():
+          del l_Values[:i_Excess]
+        self.i_Dropped += i_Excess
+
+  '''*****************************************************************
+  * Name: Flush
+  * Description: Pushes every pending snapshot to the aggregator.
+  * Parameters:  N/A
+  * Returns:     int i_Sent
+  *                  Snapshots the aggregator stored, 0 if it failed.
+  *****************************************************************'''
+  def Flush(self):
+    with self.o_Lock:
+      if(len(self.d_Pending["f_Time"]) == 0):
+        return 0
+      d_Batch = {s_Field: list(l_Values) for s_Field, l_Values in self.d_Pending.items()}
+      i_DroppedBefore = self.i_Dropped
+
+    try:
+      if(self.o_Socket == None):
+        self.o_Socket = Connect(self.s_Address, configs.f_FleetTimeout_s)
+      d_Reply = Request(self.o_Socket, {"s_Type": "push", "s_Controller": self.s_Controller,
+                                        "d_Columns": d_Batch})
+    except (OSError, ValueError, zlib.error) as o_Exception:
+      print("Fleet report failed: %s" % o_Exception)
+      self.i_Errors += 1
+      self.close()
+      return 0
+    if("i_Stored" not in d_Reply):
+      print("Fleet report rejected: %s" % d_Reply.get("s_Error"))
+      self.i_Errors += 1
+      return 0
+
+    # only remove what was sent, new snapshots may have come in meanwhile
+    # and Record may have trimmed some of the sent ones off the front
+    i_Sent = len(d_Batch["f_Time"])
+    with self.o_Lock:
+      i_Remove = max(0, i_Sent - (self.i_Dropped - i_DroppedBefore))
+      for l_Values in self.d_Pending.values():
+        del l_Values[:i_Remove]
+    self.i_Sent += i_Sent
+    return i_Sent
+
+  '''*****************************************************************
+  * Name: close
+  * Description: Closes the connection to the aggregator.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def close(self):
+    if(self.o_Socket != None):
+      self.o_Socket.close()
+      self.o_Socket = None
+
+'''*****************************************************************
+* Name: SimulatedSnapshot
+* Description: Makes a plausible snapshot for the load test.
+* Parameters:  obj   o_Random
+*                    random.Random to draw from.
+*              float f_Time
+* Returns:     dict  d_Snapshot
+*****************************************************************'''
+def SimulatedSnapshot(o_Random, f_Time):
+  f_Outdoor = o_Random.uniform(20, 90)
+  return {"f_Time": f_Time,
+          "f_OutdoorTemp_F": round(f_Outdoor, 1),
+          "f_OutdoorHumidity_Pct": float(o_Random.randint(20, 90)),
+          "f_IndoorTemp_F": round(o_Random.uniform(64, 78), 1),
+          "f_IndoorHumidity_Pct": float(o_Random.randint(30, 60)),
+          "i_HvacStateFlag": configs.i_HeatFlag if f_Outdoor < configs.f_HeatThreshold else configs.i_CoolFlag,
+          "f_SetTemperature": configs.f_HeatSetting if f_Outdoor < configs.f_HeatThreshold else configs.f_CoolSetting,
+          "i_HvacState": o_Random.randint(0, 1),
+          "f_WaterLevel_Pct": round(o_Random.uniform(10, 50), 1),
+          "i_WaterFlag": o_Random.randint(0, 1),
+          "i_TempError": configs.SYSERROR_NO_ERROR,
+          "i_WaterError": configs.SYSERROR_NO_ERROR if o_Random.random() > 0.01 else configs.SYSERROR_WL_MOISTURE_SENSOR_FAILURE}
+
+'''*****************************************************************
+* Name: RunAggregatorProcess
+* Description: Runs an aggregator pinned to one CPU core, for the load
+*              test.
+* Parameters:  str s_Address
+* Returns:     N/A
+*****************************************************************'''
+def RunAggregatorProcess(s_Address):
+  if(hasattr(os, "sched_setaffinity")):
+    os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+  try:
+    asyncio.run(FleetAggregator().serve(s_Address))
+  except KeyboardInterrupt:
+    pass
+
+'''*****************************************************************
+* Name: RunLoadTest
+* Description: Starts an aggregator on one core in its own process and
+*              pushes batches from many simulated controllers at once.
+* Parameters:  int   i_Controllers
+*                    Number of simulated controllers.
+*              int   i_Batches
+*                    Batches each controller pushes.
+*              int   i_BatchSize
+*                    Snapshots per batch.
+*              str   s_Address
+*                    Address for the aggregator.
+* Returns:     dict  d_Results
+*****************************************************************'''
+def RunLoadTest(i_Controllers, i_Batches, i_BatchSize, s_Address):
+  import multiprocessing
+  import random
+
+  o_Process = multiprocessing.Process(target = RunAggregatorProcess, args = (s_Address,), daemon = True)
+  o_Process.start()
+
+  async def Open():
+    t_Address = ParseAddress(s_Address)
+    if(t_Address[0] == "unix"):
+      return await asyncio.open_unix_connection(t_Address[1])
+    return await asyncio.open_connection(t_Address[1], t_Address[2])
+
+  async def Exchange(o_Reader, o_Writer, d_Message):
+    o_Writer.write(EncodeFrame(d_Message))
+    await o_Writer.drain()
+    i_Length = struct.unpack(s_FrameHeader, await o_Reader.readexactly(i_FrameHeader))[0]
+    return DecodePayload(await o_Reader.readexactly(i_Length))
+
+  async def Controller(i_Index, l_Latency_s):
+    o_Random = random.Random(i_Index)
+    o_Reader, o_Writer = await Open()
+    f_Time = time.time() - i_Batches * i_BatchSize * configs.f_TempTaskPeriod_s
+    # spread the controllers out like real ones that booted at different times
+    await asyncio.sleep(o_Random.uniform(0, 0.5))
+    for i in range(i_Batches):
+      d_Columns = {s_Field: [] for s_Field in t_Fields}
+      for j in range(i_BatchSize):
+        f_Time += configs.f_TempTaskPeriod_s
+        for s_Field, o_Value in SimulatedSnapshot(o_Random, f_Time).items():
+          d_Columns[s_Field].append(o_Value)
+      f_Start = time.perf_counter()
+      await Exchange(o_Reader, o_Writer, {"s_Type": "push", "s_Controller": "sim-%04d" % i_Index,
+                                          "d_Columns": d_Columns})
+      l_Latency_s.append(time.perf_counter() - f_Start)
+    o_Writer.close()
+
+  async def Run():
+    # wait for the aggregator to come up
+    for i in range(100):
+      try:
+        o_Reader, o_Writer = await Open()
+        break
+      except OSError:
+        await asyncio.sleep(0.05)
+    d_Before = (await Exchange(o_Reader, o_Writer, {"s_Type": "query", "s_Query": "stats"}))["o_Result"]
+
+    l_Latency_s = []
+    f_Start = time.perf_counter()
+    await asyncio.gather(*[Controller(i, l_Latency_s) for i in range(i_Controllers)])
+    f_Elapsed_s = time.perf_counter() - f_Start
+
+    d_After   = (await Exchange(o_Reader, o_Writer, {"s_Type": "query", "s_Query": "stats"}))["o_Result"]
+    f_Query_s = time.perf_counter()
+    d_Summary = (await Exchange(o_Reader, o_Writer, {"s_Type": "query", "s_Query": "summary"}))["o_Result"]
+    f_Query_s = time.perf_counter() - f_Query_s
+    o_Writer.close()
+    return l_Latency_s, f_Elapsed_s, d_Before, d_After, d_Summary, f_Query_s
+
+  try:
+    l_Latency_s, f_Elapsed_s, d_Before, d_After, d_Summary, f_Query_s = asyncio.run(Run())
+  finally:
+    o_Process.terminate()
+    o_Process.join()
+
+  l_Latency_s.sort()
+  i_Snapshots = d_After["i_Snapshots"] - d_Before["i_Snapshots"]
+  f_CPU_s     = d_After["f_CPU_s"] - d_Before["f_CPU_s"]
+  return {"i_Controllers":    i_Controllers,
+          "i_Snapshots":      i_Snapshots,
+          "f_Elapsed_s":      f_Elapsed_s,
+          "f_SnapshotRate":   i_Snapshots / f_Elapsed_s,
+          "f_P50_ms":         1000 * l_Latency_s[len(l_Latency_s) // 2],
+          "f_P99_ms":         1000 * l_Latency_s[min(len(l_Latency_s) - 1, int(0.99 * len(l_Latency_s)))],
+          "f_ServerCPU_s":    f_CPU_s,
+          "f_CPUPerBatch_us": 1e6 * f_CPU_s / max(1, d_After["i_Batches"] - d_Before["i_Batches"]),
+          "f_BytesPerSnapshot": (d_After["i_BytesIn"] - d_Before["i_BytesIn"]) / max(1, i_Snapshots),
+          "f_SummaryQuery_ms": 1000 * f_Query_s,
+          "i_Online":         d_Summary["i_Online"]}
+
+def main():
+  import argparse
+
+  o_Parser = argparse.ArgumentParser(description = "Aggregate the state of many RPI Smart Home controllers.")
+  o_Subparsers = o_Parser.add_subparsers(dest = "s_Command", required = True)
+  o_Serve = o_Subparsers.add_parser("serve", help = "run the aggregator")
+  o_Serve.add_argument("--address", default = configs.s_FleetAddress, help = "host:port or unix:/path")
+  o_Query = o_Subparsers.add_parser("query", help = "ask a running aggregator")
+  o_Query.add_argument("query", choices = ["latest", "summary", "series", "stats"])
+  o_Query.add_argument("--controller", help = "controller for a series query")
+  o_Query.add_argument("--field", help = "field for a series query")
+  o_Query.add_argument("--address", default = configs.s_FleetAddress, help = "host:port or unix:/path")
+  o_Load = o_Subparsers.add_parser("loadtest", help = "push from simulated controllers to an aggregator on one core")
+  o_Load.add_argument("--controllers", type = int, default = 300)
+  o_Load.add_argument("--batches", type = int, default = 20, help = "batches per controller")
+  o_Load.add_argument("--batch-size", type = int, default = 12, help = "snapshots per batch")
+  o_Load.add_argument("--address", default = "127.0.0.1:0", help = "host:port or unix:/path for the test aggregator")
+  o_Args = o_Parser.parse_args()
+
+  if(o_Args.s_Command == "serve"):
+    try:
+      asyncio.run(FleetAggregator().serve(o_Args.address))
+    except KeyboardInterrupt:
+      pass
+
+  elif(o_Args.s_Command == "query"):
+    o_Socket = Connect(o_Args.address, configs.f_FleetTimeout_s)
+    d_Reply = Request(o_Socket, {"s_Type": "query", "s_Query": o_Args.query,
+                                 "s_Controller": o_Args.controller, "s_Field": o_Args.field})
+    o_Socket.close()
+    print(json.dumps(d_Reply, indent = 2))
+
+  else:
+    s_Address = o_Args.address
+    if(s_Address.endswith(":0")):
+      # pick a free port for the test aggregator
+      with socket.socket() as o_Probe:
+        o_Probe.bind(("127.0.0.1", 0))
+        s_Address = "127.0.0.1:%d" % o_Probe.getsockname()[1]
+    d_Results = RunLoadTest(o_Args.controllers, o_Args.batches, o_Args.batch_size, s_Address)
+    print("controllers:        %d (%d online)" % (d_Results["i_Controllers"], d_Results["i_Online"]))
+    print("snapshots:          %d in %.2f s (%.0f/s)" % (d_Results["i_Snapshots"], d_Results["f_Elapsed_s"], d_Results["f_SnapshotRate"]))
+    print("push round trip:    p50 %.2f ms, p99 %.2f ms" % (d_Results["f_P50_ms"], d_Results["f_P99_ms"]))
+    print("aggregator CPU:     %.2f s, %.0f us per batch" % (d_Results["f_ServerCPU_s"], d_Results["f_CPUPerBatch_us"]))
+    print("wire size:          %.1f bytes per snapshot" % d_Results["f_BytesPerSnapshot"])
+    print("summary query:      %.2f ms" % d_Results["f_SummaryQuery_ms"])
+
+if __name__ == "__main__":
+  main()
+
+################################## end file ###################################
@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: forecast_archive.py                                              *
+* Purpose:   Archive of every fetched hourly forecast, storing each hour only *
+*            when its forecast changed, and scoring of the archived forecasts *
+*            against the outdoor sensor history.                              *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs    # global configs file
+import argparse   # library for the command line
+import bisect     # library for finding the forecast standing at a lead time
+import gzip       # library for compressing past months
+import math       # library for NaN checks
+import os         # library for file handling
+import shutil     # library for copying into the compressed file
+import struct     # library for packing the records
+import threading  # library for locking the archive
+import time       # library for time capturing
+
+# file layout: an 8 byte header (magic, version, record size) followed by
+# fixed size records, one per forecast hour that changed:
+#   uint32 fetch time (seconds since the epoch)
+#   uint8  lead, hours from the hour of the fetch to the forecast hour
+#   int16  temperature, tenths of a degree F (i_NoTemperature if missing)
+#   uint8  chance of rain, percent
+#   uint16 rain rate, thousandths of an inch per hour
+#   uint8  icon, index into l_Icons (255 if unknown)
+# the last five fields are the content of the hour; an hour is written again
+# only once its content differs from what was last written for it
+s_HeaderFormat  = "<4sHH"
+s_RecordFormat  = "<IBhBHB"
+s_ContentFormat = "<hBHB"
+i_HeaderSize    = struct.calcsize(s_HeaderFormat)
+i_RecordSize    = struct.calcsize(s_RecordFormat)
+b_Magic         = b"RPFA"
+i_FileVersion   = 1
+i_NoTemperature = -32768
+l_Icons = ["clear-day", "clear-night", "cloudy", "fog", "partly-cloudy-day",
+           "partly-cloudy-night", "rain", "sleet", "snow", "wind"]
+d_IconIndex = {s_Icon: i for i, s_Icon in enumerate(l_Icons)}
+
+'''*****************************************************************
+* Name: PackContent
+* Description: Quantizes one forecast hour to the archive's units. Two
+*              forecasts that round the same are the same content.
+* Parameters:  float f_Temperature
+*              float f_Probability
+*                    Chance of rain, 0 to 1.
+*              float f_Intensity
+*                    Rain rate, inches per hour.
+*              str   s_Icon
+* Returns:     bytes b_Content
+*****************************************************************'''
+def PackContent(f_Temperature, f_Probability, f_Intensity, s_Icon):
+  i_Temperature = i_NoTemperature if math.isnan(f_Temperature) else max(-32767, min(32767, round(10 * f_Temperature)))
+  return struct.pack(s_ContentFormat, i_Temperature, max(0, min(100, round(100 * f_Probability))),
+                     max(0, min(65535, round(1000 * f_Intensity))), d_IconIndex.get(s_Icon, 255))
+
+'''*****************************************************************
+* Name: MonthOf
+* Description: Returns the name of the monthly file a fetch goes in.
+* Parameters:  float f_Time
+* Returns:     str   s_Month
+*                    "YYYY-MM", in UTC.
+*****************************************************************'''
+def MonthOf(f_Time):
+  return time.strftime("%Y-%m", time.gmtime(f_Time))
+
+'''*****************************************************************
+* Name: HourlyObservations
+* Description: Reduces sensor samples to one value per hour.
+* Parameters:  array a_Times
+*              array a_Values
+*              func  fn_Reduce
+*                    Reduces a list of samples, e.g. max.
+* Returns:     dict  d_Hours
+*                    Start of the hour -> reduced value.
+*****************************************************************'''
+def HourlyObservations(a_Times, a_Values, fn_Reduce):
+  d_Samples = {}
+  for f_Time, f_Value in zip(a_Times, a_Values):
+    d_Samples.setdefault(int(f_Time // 3600) * 3600, []).append(f_Value)
+  return {i_Hour: fn_Reduce(l_Values) for i_Hour, l_Values in d_Samples.items()}
+
+# class to append fetched forecasts to monthly files in a directory. the
+# current month is written as it goes; past months are compressed and the
+# oldest are deleted, so the archive stays a few megabytes for good
+class ForecastArchive:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class ForecastArchive. Reads nothing
+  *              until the first forecast is archived.
+  * Parameters:  str s_Directory
+  *                  Directory holding one file per month.
+  *              int i_Months
+  *                  Number of monthly files kept.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Directory = configs.s_ForecastArchiveDirectory,
+               i_Months = configs.i_ForecastArchiveMonths):
+    self.s_Directory = s_Directory
+    self.i_Months    = i_Months
+    self.o_Lock      = threading.Lock()
+    self.o_File      = None
+    self.s_Month     = None
+    self.d_Last      = None  # forecast hour -> content last written for it
+    os.makedirs(s_Directory, exist_ok = True)
+
+    # statistics
+    self.i_Archived = 0   # forecast hours archived
+    self.i_Written  = 0   # of those, the ones whose content changed
+
+  '''*****************************************************************
+  * Name: GetPath
+  * Description: Returns the path of a month's file.
+  * Parameters:  str  s_Month
+  *              bool b_Compressed
+  * Returns:     str  s_Path
+  *****************************************************************'''
+  def GetPath(self, s_Month, b_Compressed = False):
+    return os.path.join(self.s_Directory, s_Month + (".fca.gz" if b_Compressed else ".fca"))
+
+  '''*****************************************************************
+  * Name: GetMonths
+  * Description: Lists the months in the archive.
+  * Parameters:  N/A
+  * Returns:     list l_Months
+  *                   "YYYY-MM" of every file, oldest first.
+  *****************************************************************'''
+  def GetMonths(self):
+    return sorted(set(s_Name.split(".")[0] for s_Name in os.listdir(self.s_Directory)
+                      if s_Name.endswith(".fca") or s_Name.endswith(".fca.gz")))
+
+  '''*****************************************************************
+  * Name: ReadMonth
+  * Description: Reads the records of one month. A record cut short by a
+  *              power loss is dropped.
+  * Parameters:  str  s_Month
+  * Returns:     list l_Records
+  *                   (fetch time, lead, temperature, chance of rain,
+  *                   rain rate, icon) tuples, as stored.
+  *****************************************************************'''
+  def ReadMonth(self, s_Month):
+    try:
+      if(os.path.exists(self.GetPath(s_Month))):
+        with open(self.GetPath(s_Month), "rb") as o_File:
+          b_Data = o_File.read()
+      else:
+        with gzip.open(self.GetPath(s_Month, True), "rb") as o_File:
+          b_Data = o_File.read()
+    except (OSError, EOFError):
+      return []
+    if(len(b_Data) < i_HeaderSize):
+      return []
+    b_FileMagic, i_Version, i_Size = struct.unpack_from(s_HeaderFormat, b_Data)
+    if(b_FileMagic != b_Magic or i_Version != i_FileVersion or i_Size != i_RecordSize):
+      return []
+    i_End = i_HeaderSize + (len(b_Data) - i_HeaderSize) // i_RecordSize * i_RecordSize
+    return list(struct.iter_unpack(s_RecordFormat, memoryview(b_Data)[i_HeaderSize:i_End]))
+
+  '''*****************************************************************
+  * Name: LoadLast
+  * Description: Rebuilds the content last written for each hour still
+  *              ahead, so a restart doesn't write them all again.
+  * Parameters:  float f_Now
+  * Returns:     N/A (modifies class members)
+  *****************************************************************'''
+  def LoadLast(self, f_Now):
+    self.d_Last = {}
+    i_Hour = int(f_Now // 3600) * 3600
+    for s_Month in self.GetMonths()[-2:]:
+      for t_Record in self.ReadMonth(s_Month):
+        i_Target = int(t_Record[0] // 3600) * 3600 + 3600 * t_Record[1]
+        if(i_Target >= i_Hour):
+          self.d_Last[i_Target] = struct.pack(s_ContentFormat, *t_Record[2:])
+
+  '''*****************************************************************
+  * Name: OpenMonth
+  * Description: Opens the file of a month for appending. When the month
+  *              changes the previous file is compressed and months past
+  *              i_Months are deleted.
+  * Parameters:  str s_Month
+  * Returns:     N/A (modifies class members)
+  *****************************************************************'''
+  def OpenMonth(self, s_Month):
+    if(self.o_File != None):
+      self.o_File.close()
+      self.o_File = None
+    for s_Old in self.GetMonths():
+      if(s_Old != s_Month and os.path.exists(self.GetPath(s_Old))):
+        with open(self.GetPath(s_Old), "rb") as o_In, gzip.open(self.GetPath(s_Old, True) + ".tmp", "wb") as o_Out:
+          shutil.copyfileobj(o_In, o_Out)
+        os.replace(self.GetPath(s_Old, True) + ".tmp", self.GetPath(s_Old, True))
+        os.remove(self.GetPath(s_Old))
+    l_Past = [s_Old for s_Old in self.GetMonths() if s_Old != s_Month]
+    for s_Old in l_Past[:max(0, len(l_Past) - self.i_Months + 1)]:
+      os.remove(self.GetPath(s_Old, True))
+
+    # the clock was set back into a month that was already compressed
+    s_Path = self.GetPath(s_Month)
+    if(os.path.exists(self.GetPath(s_Month, True))):
+      with gzip.open(self.GetPath(s_Month, True), "rb") as o_In, open(s_Path + ".tmp", "wb") as o_Out:
+        shutil.copyfileobj(o_In, o_Out)
+      os.replace(s_Path + ".tmp", s_Path)
+      os.remove(self.GetPath(s_Month, True))
+
+    self.o_File = open(s_Path, "ab")
+    i_Size = self.o_File.tell()
+    if(i_Size < i_HeaderSize):
+      self.o_File.truncate(0)
+      self.o_File.write(struct.pack(s_HeaderFormat, b_Magic, i_FileVersion, i_RecordSize))
+    elif((i_Size - i_HeaderSize) % i_RecordSize != 0):
+      # drop a record cut short by a power loss before appending after it
+      self.o_File.truncate(i_Size - (i_Size - i_HeaderSize) % i_RecordSize)
+    self.s_Month = s_Month
+
+  '''*****************************************************************
+  * Name: archive
+  * Description: Archives the hours of a fetched forecast whose content
+  *              changed since they were last archived.
+  * Parameters:  obj   o_Hourly
+  *                    ForecastSeries of the hourly forecast.
+  *              float f_FetchTime
+  *                    Wall clock time it was fetched at.
+  * Returns:     int   i_Written
+  *                    Hours written.
+  *****************************************************************'''
+  def archive(self, o_Hourly, f_FetchTime):
+    with self.o_Lock:
+      if(self.d_Last == None):
+        self.LoadLast(f_FetchTime)
+      if(self.s_Month != MonthOf(f_FetchTime)):
+        self.OpenMonth(MonthOf(f_FetchTime))
+
+      i_FetchHour = int(f_FetchTime // 3600) * 3600
+      l_Records = []
+      for f_Time, s_Icon, f_Temperature, f_Probability, f_Intensity in zip(
+          o_Hourly.a_Time, o_Hourly.l_Icon, o_Hourly.a_Temperature,
+          o_Hourly.a_PrecipProbability, o_Hourly.a_PrecipIntensity):
+        i_Target = int(f_Time // 3600) * 3600
+        i_Lead = (i_Target - i_FetchHour) // 3600
+        if(i_Lead < 0 or i_Lead > 255):
+          continue
+        self.i_Archived += 1
+        b_Content = PackContent(f_Temperature, f_Probability, f_Intensity, s_Icon)
+        if(self.d_Last.get(i_Target) == b_Content):
+          continue
+        self.d_Last[i_Target] = b_Content
+        l_Records.append(struct.pack("<IB", int(f_FetchTime), i_Lead) + b_Content)
+
+      # hours that have passed won't be forecast again
+      for i_Target in [i_Target for i_Target in self.d_Last if i_Target < i_FetchHour]:
+        del self.d_Last[i_Target]
+
+      if(len(l_Records) > 0):
+        self.o_File.write(b"".join(l_Records))
+        self.o_File.flush()
+      self.i_Written += len(l_Records)
+      return len(l_Records)
+
+  '''*****************************************************************
+  * Name: load
+  * Description: Returns the archived forecasts for a range of hours.
+  * Parameters:  float f_Start
+  *                    First forecast hour (inclusive).
+  *              float f_End
+  *                    Last forecast hour (exclusive).
+  * Returns:     dict  d_Forecasts
+  *                    Forecast hour -> (fetch times, forecasts), both
+  *                    ordered by fetch time. Each forecast is a
+  *                    (temperature, chance of rain, rain rate, icon)
+  *                    tuple in the units of ForecastSeries.
+  *****************************************************************'''
+  def load(self, f_Start, f_End):
+    # a forecast hour can be archived up to 255 hours before it, so the
+    # month before the range may hold some of it
+    s_First = MonthOf(f_Start - 256 * 3600)
+    s_Last  = MonthOf(f_End)
+    with self.o_Lock:
+      if(self.o_File != None):
+        self.o_File.flush()
+      l_Months = [s_Month for s_Month in self.GetMonths() if s_First <= s_Month <= s_Last]
+      l_Records = [t_Record for s_Month in l_Months for t_Record in self.ReadMonth(s_Month)]
+
+    d_Forecasts = {}
+    for i_Fetch, i_Lead, i_Temperature, i_Probability, i_Intensity, i_Icon in sorted(l_Records):
+      i_Target = (i_Fetch // 3600) * 3600 + 3600 * i_Lead
+      if(f_Start <= i_Target < f_End):
+        l_Fetches, l_Values = d_Forecasts.setdefault(i_Target, ([], []))
+        l_Fetches.append(i_Fetch)
+        l_Values.append((float("nan") if i_Temperature == i_NoTemperature else i_Temperature / 10,
+                         i_Probability / 100, i_Intensity / 1000,
+                         l_Icons[i_Icon] if i_Icon < len(l_Icons) else configs.s_DefaultIcon))
+    return d_Forecasts
+
+  '''*****************************************************************
+  * Name: score
+  * Description: Joins the archived forecasts with the outdoor sensor
+  *              history, hour by hour. For every lead time the forecast
+  *              scored is the last one fetched at least that many hours
+  *              before the hour. Temperature is scored against the hour's
+  *              mean reading. There is no rain gauge, so an hour counts as
+  *              rained on if its outdoor humidity reached saturation, and
+  *              rain counts as forecast at f_ExpectRainPercent, like the
+  *              watering decision.
+  * Parameters:  obj   o_History
+  *                    TimeSeriesStore recorded by main.py.
+  *              float f_Window_s
+  *                    Length of the window scored, ending at the last
+  *                    full hour.
+  *              list  l_Leads_h
+  *                    Lead times to score, in hours.
+  *              float f_Now
+  *                    Current time, defaults to now.
+  * Returns:     dict  d_Scores
+  *                    Lead time -> dict of the hours scored, the bias and
+  *                    mean absolute error of the temperature, and the
+  *                    rain hits, misses, false alarms and correct
+  *                    negatives.
+  *****************************************************************'''
+  def score(self, o_History, f_Window_s = configs.f_ForecastScoreWindow_s,
+            l_Leads_h = configs.l_ForecastLeads_h, f_Now = None):
+    if(f_Now == None):
+      f_Now = time.time()
+    i_End   = int(f_Now // 3600) * 3600
+    i_Start = i_End - int(f_Window_s // 3600) * 3600
+
+    d_Forecasts = self.load(i_Start, i_End)
+    d_Temperature = HourlyObservations(*o_History.query("outdoor_temp_f", i_Start, i_End),
+                                       lambda l_Values: sum(l_Values) / len(l_Values))
+    d_Humidity = HourlyObservations(*o_History.query("outdoor_humidity_pct", i_Start, i_End), max)
+
+    d_Scores = {}
+    for i_Lead_h in l_Leads_h:
+      i_Count, f_Error, f_AbsError = 0, 0.0, 0.0
+      i_Hits, i_Misses, i_FalseAlarms, i_CorrectNegatives = 0, 0, 0, 0
+      for i_Target, (l_Fetches, l_Values) in d_Forecasts.items():
+        i_Index = bisect.bisect_right(l_Fetches, i_Target - 3600 * i_Lead_h) - 1
+        if(i_Index < 0):
+          continue
+        f_Temperature, f_Probability, f_Intensity, s_Icon = l_Values[i_Index]
+        if(i_Target in d_Temperature and not math.isnan(f_Temperature)):
+          f_Difference = f_Temperature - d_Temperature[i_Target]
+          i_Count    += 1
+          f_Error    += f_Difference
+          f_AbsError += abs(f_Difference)
+        if(i_Target in d_Humidity):
+          b_Forecast = f_Probability >= configs.f_ExpectRainPercent
+          b_Rained   = d_Humidity[i_Target] >= configs.f_RainHumidity_Pct
+          if(b_Forecast and b_Rained):
+            i_Hits += 1
+          elif(b_Rained):
+            i_Misses += 1
+          elif(b_Forecast):
+            i_FalseAlarms += 1
+          else:
+            i_CorrectNegatives += 1
+      d_Scores[i_Lead_h] = {"i_Hours":            i_Count,
+                            "f_Bias_F":           f_Error / i_Count if i_Count > 0 else None,
+                            "f_MAE_F":            f_AbsError / i_Count if i_Count > 0 else None,
+                            "i_Hits":             i_Hits,
+                            "i_Misses":           i_Misses,
+                            "i_FalseAlarms":      i_FalseAlarms,
+                            "i_CorrectNegatives": i_CorrectNegatives}
+    return d_Scores
+
+  '''*****************************************************************
+  * Name: GetSize
+  * Description: Returns the size of the archive on disk.
+  * Parameters:  N/A
+  * Returns:     int i_Bytes
+  *****************************************************************'''
+  def GetSize(self):
+    i_Bytes = 0
+    with self.o_Lock:
+      for s_Name in os.listdir(self.s_Directory):
+        # another process, e.g. the command line tool, may be compressing
+        # or deleting months
+        try:
+          i_Bytes += os.path.getsize(os.path.join(self.s_Directory, s_Name))
+        except FileNotFoundError:
+          pass
+    return i_Bytes
+
+  '''*****************************************************************
+  * Name: GetStats
+  * Description: Returns the archive statistics.
+  * Parameters:  N/A
+  * Returns:     dict d_Stats
+  *****************************************************************'''
+  def GetStats(self):
+    return {"i_Archived": self.i_Archived,
+            "i_Written":  self.i_Written,
+            "i_Bytes":    self.GetSize()}
+
+  '''*****************************************************************
+  * Name: close
+  * Description: Closes the current month's file.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def close(self):
+    with self.o_Lock:
+      if(self.o_File != None):
+        self.o_File.close()
+        self.o_File = None
+        self.s_Month = None
+
+'''*****************************************************************
+* Name: FormatScores
+* Description: Formats the scores as one line per lead time.
+* Parameters:  dict d_Scores
+*                   Scores returned by ForecastArchive.score.
+* Returns:     list l_Lines
+*****************************************************************'''
+def FormatScores(d_Scores):
+  l_Lines = []
+  for i_Lead_h, d_Score in d_Scores.items():
+    i_Rained = d_Score["i_Hits"] + d_Score["i_Misses"]
+    i_Forecast = d_Score["i_Hits"] + d_Score["i_FalseAlarms"]
+    l_Lines.append("%3d h ahead: %4d hours temperature bias %s MAE %s rain hits:%d misses:%d false alarms:%d "
+                   "(hit rate %s, false alarm ratio %s)"
+                   % (i_Lead_h, d_Score["i_Hours"],
+                      "n/a" if d_Score["f_Bias_F"] == None else "%+.1f F" % d_Score["f_Bias_F"],
+                      "n/a" if d_Score["f_MAE_F"] == None else "%.1f F" % d_Score["f_MAE_F"],
+                      d_Score["i_Hits"], d_Score["i_Misses"], d_Score["i_FalseAlarms"],
+                      "n/a" if i_Rained == 0 else "%.0f%%" % (100 * d_Score["i_Hits"] / i_Rained),
+                      "n/a" if i_Forecast == 0 else "%.0f%%" % (100 * d_Score["i_FalseAlarms"] / i_Forecast)))
+  return l_Lines
+
+def main():
+  import timeseries # sensor history, only needed for scoring
+
+  o_Parser = argparse.ArgumentParser(description = "Score the archived forecasts against the sensor history.")
+  o_Parser.add_argument("--archive", default = configs.s_ForecastArchiveDirectory, help = "forecast archive directory")
+  o_Parser.add_argument("--history", default = configs.s_HistoryDirectory, help = "history directory recorded by main.py")
+  o_Parser.add_argument("--days", type = float, default = configs.f_ForecastScoreWindow_s / 86400, help = "days to score")
+  o_Parser.add_argument("--leads", default = ",".join(str(i_Lead_h) for i_Lead_h in configs.l_ForecastLeads_h),
+                        help = "comma separated lead times to score, in hours")
+  o_Args = o_Parser.parse_args()
+
+  o_Archive = ForecastArchive(o_Args.archive)
+  o_History = timeseries.TimeSeriesStore(o_Args.history)
+  d_Scores = o_Archive.score(o_History, o_Args.days * 86400, [int(s_Lead) for s_Lead in o_Args.leads.split(",") if s_Lead])
+  for s_Line in FormatScores(d_Scores):
+    print(s_Line)
+  print("archive: %d months, %.1f KiB" % (len(o_Archive.GetMonths()), o_Archive.GetSize() / 1024))
+  o_History.close()
+
+if __name__ == "__main__":
+  main()
+
+################################## end file ###################################
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: forecast_cache.py                                                *
+* Purpose:   TTL cache for forecast API responses, persisted to disk.         *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs    # global configs file
+import json       # library to handle JSON parsing
+import os         # library for atomic file replacement
+import struct     # library for the binary file header
+import threading  # library for refreshing from the prefetch task
+import time       # library for time capturing
+
+# a binary cache file starts with a magic and the wall clock time the data
+# was fetched at. anything else is read as JSON
+s_BinaryHeader = "<4sd"
+b_BinaryMagic  = b"RPCF"
+
+# class to hold the last forecast returned by the API and its on-disk copy.
+# the forecast prefetch decides from its age when to refresh it
+class ForecastCache:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class ForecastCache. Loads the last
+  *              forecast from disk if one exists.
+  * Parameters:  str   s_CacheFile
+  *                    Path of the on-disk copy of the cache.
+  *              float f_TTL_s
+  *                    Seconds a forecast is considered fresh.
+  *              func  fn_Encode
+  *                    Converts a cached forecast to something JSON can
+  *                    save, or to bytes to save it as a binary file.
+  *                    Defaults to saving it as-is.
+  *              func  fn_Decode
+  *                    Inverse of fn_Encode.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_CacheFile = configs.s_ForecastCacheFile,
+               f_TTL_s = configs.f_ForecastCacheTTL_s,
+               fn_Encode = None, fn_Decode = None):
+    self.s_CacheFile = s_CacheFile
+    self.f_TTL_s     = f_TTL_s
+    self.fn_Encode   = fn_Encode if fn_Encode != None else (lambda o_Data: o_Data)
+    self.fn_Decode   = fn_Decode if fn_Decode != None else (lambda o_Data: o_Data)
+
+    # cached data and the wall clock time it was fetched at. b_FromDisk is
+    # set while the data is the copy loaded at startup, before any refresh
+    self.d_Data      = None
+    self.f_FetchTime = 0.0
+    self.b_FromDisk  = False
+
+    # the lock protects the data from the thread refreshing it
+    self.o_Lock = threading.Lock()
+
+    self.LoadFromDisk()
+
+  '''*****************************************************************
+  * Name: GetAge
+  * Description: Returns the age of the cached forecast.
+  * Parameters:  N/A
+  * Returns:     float f_Age_s
+  *                    Seconds since the cached forecast was fetched, or
+  *                    None if the cache is empty.
+  *****************************************************************'''
+  def GetAge(self):
+    if(self.d_Data == None):
+      return None
+    return max(0.0, time.time() - self.f_FetchTime)
+
+  '''*****************************************************************
+  * Name: GetEntry
+  * Description: Returns the cached forecast without ever fetching.
+  * Parameters:  N/A
+  * Returns:     obj   d_Data
+  *                    Cached forecast, or None if the cache is empty.
+  *              float f_FetchTime
+  *                    Wall clock time it was fetched at.
+  *              bool  b_FromDisk
+  *                    True if it was loaded from disk and not refreshed
+  *                    since.
+  *****************************************************************'''
+  def GetEntry(self):
+    with self.o_Lock:
+      return self.d_Data, self.f_FetchTime, self.b_FromDisk
+
+  '''*****************************************************************
+  * Name: Refresh
+  * Description: Fetches a new forecast and stores it in the cache.
+  * Parameters:  func fn_Fetch
+  *                   Function returning a fresh forecast, or None if the
+  *                   fetch failed.
+  * Returns:     N/A (modifies class members)
+  *****************************************************************'''
+  def Refresh(self, fn_Fetch):
+    try:
+      d_Data = fn_Fetch()
+    except Exception:
+      d_Data = None
+
+    if(d_Data == None):
+      return
+    with self.o_Lock:
+      self.d_Data      = d_Data
+      self.f_FetchTime = time.time()
+      self.b_FromDisk  = False
+
+    self.SaveToDisk()
+
+  '''*****************************************************************
+  * Name: LoadFromDisk
+  * Description: Restores the cache from its on-disk copy, either format.
+  *              A missing or corrupt file leaves the cache empty.
+  * Parameters:  N/A
+  * Returns:     N/A (modifies class members)
+  *****************************************************************'''
+  def LoadFromDisk(self):
+    try:
+      with open(self.s_CacheFile, "rb") as o_File:
+        b_Saved = o_File.read()
+      if(b_Saved[:4] == b_BinaryMagic):
+        b_Magic, self.f_FetchTime = struct.unpack_from(s_BinaryHeader, b_Saved)
+        self.d_Data = self.fn_Decode(b_Saved[struct.calcsize(s_BinaryHeader):])
+      else:
+        d_Saved = json.loads(b_Saved)
+        self.f_FetchTime = float(d_Saved["f_FetchTime"])
+        self.d_Data      = self.fn_Decode(d_Saved["d_Data"])
+      self.b_FromDisk = True
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+      self.d_Data      = None
+      self.f_FetchTime = 0.0
+
+  '''*****************************************************************
+  * Name: SaveToDisk
+  * Description: Writes the cache to disk, as JSON or, if fn_Encode gives
+  *              bytes, as the fetch time followed by those bytes. The
+  *              file is written under a temporary name and renamed so a
+  *              power cut never leaves a half-written cache behind.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def SaveToDisk(self):
+    with self.o_Lock:
+      f_FetchTime = self.f_FetchTime
+      o_Encoded   = self.fn_Encode(self.d_Data)
+    if(isinstance(o_Encoded, bytes)):
+      b_Saved = struct.pack(s_BinaryHeader, b_BinaryMagic, f_FetchTime) + o_Encoded
+    else:
+      b_Saved = json.dumps({"f_FetchTime": f_FetchTime, "d_Data": o_Encoded}).encode("utf-8")
+    s_TempFile = self.s_CacheFile + ".tmp"
+    try:
+      with open(s_TempFile, "wb") as o_File:
+        o_File.write(b_Saved)
+      os.replace(s_TempFile, self.s_CacheFile)
+    except OSError:
+      # losing the disk copy only costs a fetch on the next restart
+      pass
+
+################################## end file ###################################
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: forecast_series.py                                               *
+* Purpose:   Compact column storage for parsed forecasts.                     *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs    # global configs file
+import array      # library for compact arrays of floats
+import itertools  # library for the version counter
+import struct     # library for the binary header
+import sys        # library for interning the icon names
+import time       # library for the local hour of day
+
+# a forecast saved with ParsedForecast.ToBytes starts with this header: magic,
+# format version and the number of hourly and daily periods
+s_BytesHeader  = "<4sHII"
+b_BytesMagic   = b"RPFC"
+i_BytesVersion = 1
+
+# class to hold one block of forecasts (hourly or daily) as columns. only the
+# fields the system uses are kept: one array per field instead of one
+# dictionary per hour.
+class ForecastSeries:
+  __slots__ = ("a_Time", "l_Icon", "a_Temperature", "a_PrecipProbability", "a_PrecipIntensity",
+               "a_HourOfDay")
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class ForecastSeries, creates an empty
+  *              series.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self):
+    self.a_Time              = array.array("d") # start of the period (seconds since the epoch)
+    self.l_Icon              = []               # icon names, interned so repeats share one string
+    self.a_Temperature       = array.array("d") # temperature (daily: the high)
+    self.a_PrecipProbability = array.array("d") # chance of rain, 0 to 1
+    self.a_PrecipIntensity   = array.array("d") # expected rate if it rains, per hour
+    self.a_HourOfDay         = None             # local hour of each period, see GetHourOfDay
+
+  '''*****************************************************************
+  * Name: __len__
+  * Description: Returns the number of periods in the series.
+  * Parameters:  N/A
+  * Returns:     int i_Length
+  *****************************************************************'''
+  def __len__(self):
+    return len(self.a_Time)
+
+  '''*****************************************************************
+  * Name: GetHourOfDay
+  * Description: Returns the local hour of day of every period. A series
+  *              is never changed once published, so this is computed
+  *              once per forecast. The UTC offset only changes with
+  *              daylight saving time, so it is looked up once per day
+  *              rather than once per period.
+  * Parameters:  N/A
+  * Returns:     array a_HourOfDay
+  *****************************************************************'''
+  def GetHourOfDay(self):
+    if(self.a_HourOfDay == None):
+      d_Offsets = {}
+      a_HourOfDay = array.array("b")
+      for f_Time in self.a_Time:
+        i_Day = int(f_Time // 86400)
+        if(i_Day not in d_Offsets):
+          d_Offsets[i_Day] = time.localtime(86400 * i_Day + 43200).tm_gmtoff
+        a_HourOfDay.append(int((f_Time + d_Offsets[i_Day]) // 3600) % 24)
+      self.a_HourOfDay = a_HourOfDay
+    return self.a_HourOfDay
+
+  '''*****************************************************************
+  * Name: ToDict
+  * Description: Converts the series to a dictionary of lists, for saving
+  *              as JSON.
+  * Parameters:  N/A
+  * Returns:     dict d_Series
+  *****************************************************************'''
+  def ToDict(self):
+    return {"time":              self.a_Time.tolist(),
+            "icon":              self.l_Icon,
+            "temperature":       self.a_Temperature.tolist(),
+            "precipProbability": self.a_PrecipProbability.tolist(),
+            "precipIntensity":   self.a_PrecipIntensity.tolist()}
+
+  '''*****************************************************************
+  * Name: ToBytes
+  * Description: Packs the series for ParsedForecast.ToBytes: the four
+  *              columns as little endian doubles, then a table of the
+  *              distinct icons and one byte per period indexing it.
+  * Parameters:  N/A
+  * Returns:     bytes b_Series
+  *****************************************************************'''
+  def ToBytes(self):
+    l_Parts = []
+    for a_Column in (self.a_Time, self.a_Temperature, self.a_PrecipProbability, self.a_PrecipIntensity):
+      if(sys.byteorder == "big"):
+        a_Column = array.array("d", a_Column)
+        a_Column.byteswap()
+      l_Parts.append(a_Column.tobytes())
+    l_Icons = sorted(set(self.l_Icon))
+    d_Index = {s_Icon: i for i, s_Icon in enumerate(l_Icons)}
+    b_Icons = "\n".join(l_Icons).encode("utf-8")
+    l_Parts.append(struct.pack("<I", len(b_Icons)))
+    l_Parts.append(b_Icons)
+    l_Parts.append(bytes(d_Index[s_Icon] for s_Icon in self.l_Icon))
+    return b"".join(l_Parts)
+
+'''*****************************************************************
+* Name: SeriesFromBytes
+* Description: Unpacks a series packed with ForecastSeries.ToBytes.
+* Parameters:  memoryview o_View
+*                         The packed forecast.
+*              int        i_Offset
+*                         Where the series starts.
+*              int        i_Length
+*                         Number of periods in the series.
+* Returns:     obj        o_Series
+*                         ForecastSeries
+*              int        i_Offset
+*                         Where the series ends.
+*****************************************************************'''
+def SeriesFromBytes(o_View, i_Offset, i_Length):
+  o_Series = ForecastSeries()
+  for a_Column in (o_Series.a_Time, o_Series.a_Temperature, o_Series.a_PrecipProbability, o_Series.a_PrecipIntensity):
+    a_Column.frombytes(o_View[i_Offset:i_Offset + 8 * i_Length])
+    if(sys.byteorder == "big"):
+      a_Column.byteswap()
+    i_Offset += 8 * i_Length
+  i_IconBytes, = struct.unpack_from("<I", o_View, i_Offset)
+  i_Offset += 4
+  l_Icons = [sys.intern(s_Icon) for s_Icon in bytes(o_View[i_Offset:i_Offset + i_IconBytes]).decode("utf-8").split("\n")]
+  i_Offset += i_IconBytes
+  o_Series.l_Icon = [l_Icons[i] for i in o_View[i_Offset:i_Offset + i_Length]]
+  return o_Series, i_Offset + i_Length
+
+'''*****************************************************************
+* Name: SeriesFromDict
+* Description: Rebuilds a series saved with ForecastSeries.ToDict.
+* Parameters:  dict d_Series
+*                   Dictionary of lists.
+* Returns:     obj o_Series
+*                  ForecastSeries
+*****************************************************************'''
+def SeriesFromDict(d_Series):
+  o_Series = ForecastSeries()
+  o_Series.a_Time.fromlist([float(f_Value) for f_Value in d_Series["time"]])
+  o_Series.l_Icon = [sys.intern(s_Icon) for s_Icon in d_Series["icon"]]
+  o_Series.a_Temperature.fromlist([float(f_Value) for f_Value in d_Series["temperature"]])
+  o_Series.a_PrecipProbability.fromlist([float(f_Value) for f_Value in d_Series["precipProbability"]])
+  o_Series.a_PrecipIntensity.fromlist([float(f_Value) for f_Value in d_Series["precipIntensity"]])
+  return o_Series
+
+'''*****************************************************************
+* Name: ParseDarkSkyBlock
+* Description: Extracts the used fields of a DarkSky data block
+*              ("hourly" or "daily") into a series. Missing fields
+*              default to no rain, the default icon and NaN.
+* Parameters:  list l_Data
+*                   The block's "data" list.
+*              str  s_TemperatureField
+*                   Field holding the temperature, "temperature" for
+*                   hourly data and "temperatureHigh" for daily data.
+* Returns:     obj o_Series
+*                  ForecastSeries
+*****************************************************************'''
+def ParseDarkSkyBlock(l_Data, s_TemperatureField):
+  o_Series = ForecastSeries()
+  for d_Period in l_Data:
+    o_Series.a_Time.append(d_Period["time"])
+    o_Series.l_Icon.append(sys.intern(d_Period.get("icon", configs.s_DefaultIcon)))
+    o_Series.a_Temperature.append(d_Period.get(s_TemperatureField, float("nan")))
+    o_Series.a_PrecipProbability.append(d_Period.get("precipProbability", 0.0))
+    o_Series.a_PrecipIntensity.append(d_Period.get("precipIntensity", 0.0))
+  return o_Series
+
+# every parsed forecast gets a new version number, so results derived from a
+# forecast can be cached until it is replaced
+o_VersionCounter = itertools.count(1)
+
+# class to hold a full parsed forecast: the hourly and daily series
+class ParsedForecast:
+  __slots__ = ("o_Hourly", "o_Daily", "i_Version")
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class ParsedForecast
+  * Parameters:  obj o_Hourly
+  *                  ForecastSeries of the hourly forecasts.
+  *              obj o_Daily
+  *                  ForecastSeries of the daily forecasts.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, o_Hourly, o_Daily):
+    self.o_Hourly  = o_Hourly
+    self.o_Daily   = o_Daily
+    self.i_Version = next(o_VersionCounter)
+
+  '''*****************************************************************
+  * Name: ToDict
+  * Description: Converts the forecast to a dictionary of lists, for
+  *              saving as JSON.
+  * Parameters:  N/A
+  * Returns:     dict d_Forecast
+  *****************************************************************'''
+  def ToDict(self):
+    return {"hourly": self.o_Hourly.ToDict(), "daily": self.o_Daily.ToDict()}
+
+  '''*****************************************************************
+  * Name: ToBytes
+  * Description: Packs the forecast into a compact binary form that loads
+  *              without parsing any text.
+  * Parameters:  N/A
+  * Returns:     bytes b_Forecast
+  *****************************************************************'''
+  def ToBytes(self):
+    return (struct.pack(s_BytesHeader, b_BytesMagic, i_BytesVersion, len(self.o_Hourly), len(self.o_Daily))
+            + self.o_Hourly.ToBytes() + self.o_Daily.ToBytes())
+
+'''*****************************************************************
+* Name: ForecastFromDict
+* Description: Rebuilds a forecast saved with ParsedForecast.ToDict.
+* Parameters:  dict d_Forecast
+*                   Dictionary of series.
+* Returns:     obj o_Forecast
+*                  ParsedForecast
+*****************************************************************'''
+def ForecastFromDict(d_Forecast):
+  return ParsedForecast(SeriesFromDict(d_Forecast["hourly"]),
+                        SeriesFromDict(d_Forecast["daily"]))
+
+'''*****************************************************************
+* Name: ForecastFromBytes
+* Description: Rebuilds a forecast packed with ParsedForecast.ToBytes.
+* Parameters:  bytes b_Forecast
+*                    The packed forecast.
+* Returns:     obj   o_Forecast
+*                    ParsedForecast
+* Raises:      ValueError if the data isn't a packed forecast.
+*****************************************************************'''
+def ForecastFromBytes(b_Forecast):
+  o_View = memoryview(b_Forecast)
+  try:
+    b_Magic, i_Version, i_Hourly, i_Daily = struct.unpack_from(s_BytesHeader, o_View)
+    if(b_Magic != b_BytesMagic or i_Version != i_BytesVersion):
+      raise ValueError("not a packed forecast")
+    o_Hourly, i_Offset = SeriesFromBytes(o_View, struct.calcsize(s_BytesHeader), i_Hourly)
+    o_Daily, i_Offset  = SeriesFromBytes(o_View, i_Offset, i_Daily)
+  except (struct.error, IndexError, UnicodeDecodeError) as o_Exception:
+    raise ValueError("truncated forecast: %s" % o_Exception)
+  if(i_Offset != len(o_View)):
+    raise ValueError("truncated forecast")
+  return ParsedForecast(o_Hourly, o_Daily)
+
+'''*****************************************************************
+* Name: ParseDarkSky
+* Description: Parses a full DarkSky response. The response itself is
+*              not kept.
+* Parameters:  dict d_Response
+*                   Decoded JSON response of the API.
+* Returns:     obj o_Forecast
+*                  ParsedForecast
+*****************************************************************'''
+def ParseDarkSky(d_Response):
+  return ParsedForecast(ParseDarkSkyBlock(d_Response["hourly"]["data"], "temperature"),
+                        ParseDarkSkyBlock(d_Response["daily"]["data"], "temperatureHigh"))
+
+################################## end file ###################################
@@ -14,14 +14,158 @@ __version__ = "2.0.1"
 
 # file imports
 import configs
+import metrics
 from tkinter import * 
 import time
 import urllib.request
 import datetime
 import json
+import collections
+import bisect
 from PIL import Image, ImageTk
 
 
+# class to decode each weather icon once and keep it in memory. the least 
+# recently used icon is dropped once the cache is full. 
+class IconCache:
+  
+  '''*****************************************************************
+  * Name: __init__                                                                  
+  * Description: Constructor for the icon cache. Must be created after the
+  *              tkinter root window.                     
+  * Parameters:  int i_MaxSize                                              
+  *                  Number of decoded icons to keep.
+  * Returns:     N/A                     
+  *****************************************************************'''
+  def __init__(self, i_MaxSize = configs.i_IconCacheSize):
+    self.i_MaxSize = i_MaxSize
+    self.d_Icons   = collections.OrderedDict()
+    
+    # statistics
+    self.i_Hits      = 0
+    self.i_Misses    = 0
+    self.i_Evictions = 0
+  
+  '''*****************************************************************
+  * Name: get                                                                  
+  * Description: Returns the image for an icon, decoding it on first use.
+  *              Unknown icons fall back to the default icon.                   
+  * Parameters:  str s_Icon
+  *                  Icon name as returned by the API, e.g. "rain".
+  * Returns:     obj o_Image
+  *                  tkinter image for the icon.                     
+  *****************************************************************'''
+  def get(self, s_Icon):
+    if(s_Icon in self.d_Icons):
+      self.i_Hits += 1
+      metrics.o_CacheRequests.inc(("icon", "hit"))
+      self.d_Icons.move_to_end(s_Icon)
+      return self.d_Icons[s_Icon]
+    
+    self.i_Misses += 1
+    metrics.o_CacheRequests.inc(("icon", "miss"))
+    try:
+      o_Image = ImageTk.PhotoImage(Image.open(configs.s_ImageDirectory + s_Icon + ".png"))
+    except OSError:
+      if(s_Icon == configs.s_DefaultIcon):
+        raise
+      return self.get(configs.s_DefaultIcon)
+    
+    # labels showing an evicted icon hold their own reference to it, so 
+    # dropping it here never blanks an icon on screen
+    self.d_Icons[s_Icon] = o_Image
+    while(len(self.d_Icons) > self.i_MaxSize):
+      self.d_Icons.popitem(last = False)
+      self.i_Evictions += 1
+    return o_Image
+
+
+# class to remember what was last drawn in each widget, so a redraw only
+# touches the widgets whose value actually changed
+class RenderTracker:
+  
+  '''*****************************************************************
+  * Name: __init__                                                                  
+  * Description: Constructor for the render tracker.                     
+  * Parameters:  N/A
+  * Returns:     N/A                     
+  *****************************************************************'''
+  def __init__(self):
+    # last rendered value, keyed by the id of the widget or variable and the
+    # name of the option
+    self.d_Rendered = {}
+    
+    # counters for the current frame and totals since startup
+    self.i_Changed       = 0
+    self.i_Skipped       = 0
+    self.i_Frames        = 0
+    self.i_TotalChanged  = 0
+    self.i_TotalSkipped  = 0
+  
+  '''*****************************************************************
+  * Name: StartFrame                                                                  
+  * Description: Resets the per-frame counters.                     
+  * Parameters:  N/A
+  * Returns:     N/A                     
+  *****************************************************************'''
+  def StartFrame(self):
+    self.i_Frames  += 1
+    self.i_Changed  = 0
+    self.i_Skipped  = 0
+  
+  '''*****************************************************************
+  * Name: IsDirty                                                                  
+  * Description: Checks a new value against the last rendered one and 
+  *              records it. Counts the widget as changed or skipped.                     
+  * Parameters:  obj o_Target
+  *                  Widget or variable the value is rendered into.
+  *              str s_Option
+  *                  Name of the rendered option.
+  *              obj o_Value
+  *                  New value.
+  * Returns:     bool b_Dirty
+  *                   True if the widget has to be redrawn.                     
+  *****************************************************************'''
+  def IsDirty(self, o_Target, s_Option, o_Value):
+    t_Key = (id(o_Target), s_Option)
+    if(t_Key in self.d_Rendered and self.d_Rendered[t_Key] == o_Value):
+      self.i_Skipped      += 1
+      self.i_TotalSkipped += 1
+      return False
+    self.d_Rendered[t_Key] = o_Value
+    self.i_Changed      += 1
+    self.i_TotalChanged += 1
+    return True
+  
+  '''*****************************************************************
+  * Name: SetVar                                                                  
+  * Description: Sets a StringVar if its value changed.                     
+  * Parameters:  obj o_Var
+  *                  StringVar to set.
+  *              str s_Value
+  *                  New value.
+  * Returns:     N/A                     
+  *****************************************************************'''
+  def SetVar(self, o_Var, s_Value):
+    if(self.IsDirty(o_Var, "value", s_Value)):
+      o_Var.set(s_Value)
+  
+  '''*****************************************************************
+  * Name: Configure                                                                  
+  * Description: Reconfigures the options of a widget that changed.                     
+  * Parameters:  obj o_Widget
+  *                  Widget to configure.
+  *              dict d_Options
+  *                   Option names and new values, as passed to config().
+  * Returns:     N/A                     
+  *****************************************************************'''
+  def Configure(self, o_Widget, **d_Options):
+    d_Changed = {s_Option: o_Value for s_Option, o_Value in d_Options.items()
+                 if self.IsDirty(o_Widget, s_Option, o_Value)}
+    if(len(d_Changed) > 0):
+      o_Widget.config(**d_Changed)
+
+
 # class to handle a single forecast. Members include temperature, chance of rain,
 # weather condition (icon) and time (can be day or hour)
 class SingleForecast:
@@ -35,9 +179,11 @@ class SingleForecast:
   *                    Y location of the top left corner of the object.
   *              obj   master
   *                    Master tkinter canvas.
+  *              obj   o_IconCache
+  *                    Icon cache shared by all of the forecasts.
   * Returns:     N/A                     
   *****************************************************************'''
-  def __init__(self, master, i_X, i_Y):
+  def __init__(self, master, i_X, i_Y, o_IconCache):
     
     # string var is a type that allows you to update strings on the fly without
     # destroying the label each time
@@ -45,9 +191,11 @@ class SingleForecast:
     self.o_Temp    = StringVar()
     self.o_RainPct = StringVar()
     
-    # default icon is cloudy
-    self.o_Image   = Image.open("/home/pi/Git/RPISmartHome/Source/Images/cloudy.png")
-    self.o_Image   = ImageTk.PhotoImage(self.o_Image)
+    # default icon is cloudy. the label only shows the image while we hold 
+    # a reference to it
+    self.o_IconCache = o_IconCache
+    self.s_Icon      = configs.s_DefaultIcon
+    self.o_Image     = self.o_IconCache.get(self.s_Icon)
     
     # padding on the ends of objects drawn
     self.i_Padx = 10
@@ -94,6 +242,35 @@ class SingleForecast:
     self.o_TempLabel.place(x = self.i_Xin, y = self.i_Yin + 104)
     self.o_RainLabel.place(x = self.i_Xin, y = self.i_Yin + 134)
   
+  '''*****************************************************************
+  * Name: SetIcon                                                                  
+  * Description: Shows a new weather icon, if it differs from the current one.                   
+  * Parameters:  str s_Icon
+  *                  Icon name as returned by the API, e.g. "rain".
+  *              obj o_Tracker
+  *                  Render tracker of the GUI.
+  * Returns:     N/A                     
+  *****************************************************************'''    
+  def SetIcon(self, s_Icon, o_Tracker):
+    if(o_Tracker.IsDirty(self.o_ImageLabel, "icon", s_Icon) and s_Icon != self.s_Icon):
+      self.s_Icon  = s_Icon
+      self.o_Image = self.o_IconCache.get(s_Icon)
+      self.o_ImageLabel.config(image = self.o_Image)
+  
+  '''*****************************************************************
+  * Name: Clear                                                                  
+  * Description: Blanks the forecast, for a slot past the end of the 
+  *              forecast returned by the API.                   
+  * Parameters:  obj o_Tracker
+  *                  Render tracker of the GUI.
+  * Returns:     N/A                     
+  *****************************************************************'''    
+  def Clear(self, o_Tracker):
+    self.SetIcon(configs.s_DefaultIcon, o_Tracker)
+    o_Tracker.SetVar(self.o_Time, "")
+    o_Tracker.SetVar(self.o_Temp, "")
+    o_Tracker.SetVar(self.o_RainPct, "")
+  
 
 # this class handles the forecasts for twelve hours in advance 
 class TwelveHourForecast:
@@ -107,9 +284,11 @@ class TwelveHourForecast:
   *                    Y location of the top left corner of the object.
   *              obj   master
   *                    Master tkinter canvas.
+  *              obj   o_IconCache
+  *                    Icon cache shared by all of the forecasts.
   * Returns:     N/A                     
   *****************************************************************'''
-  def __init__(self, master, i_X, i_Y):
+  def __init__(self, master, i_X, i_Y, o_IconCache):
     
     # overall title label for the group of objects
     self.o_TitleLabel = Label(master, text = "Next Twelve Hours",
@@ -123,35 +302,38 @@ class TwelveHourForecast:
     # create twelve forecast objects at a spacing of 100 pixels
     self.l_Forecasts = []
     for i in range(0,12):
-      self.l_Forecasts.append(SingleForecast(master, i_X + (i * 100), i_Y))
+      self.l_Forecasts.append(SingleForecast(master, i_X + (i * 100), i_Y, o_IconCache))
   
   '''*****************************************************************
   * Name: update                                                                  
-  * Description: Function to update the forecast for the next twelve hours.                   
+  * Description: Function to update the forecast for the next twelve hours.
+  *              Hours that have already passed are skipped, since a
+  *              forecast loaded from disk can be hours old.                   
   * Parameters:  obj o_Forecast
-  *                  Iterable list of forecasts returned by the API.
+  *                  ForecastSeries of the forecasts returned by the API.
+  *              obj o_Tracker
+  *                  Render tracker of the GUI.
   * Returns:     N/A                     
   *****************************************************************'''    
-  def update(self, o_Forecast):
-    self.o_Image = []
-    # loop over all 12 forecasts returned by the API
+  def update(self, o_Forecast, o_Tracker):
+    # start at the current hour, and blank the slots the forecast doesn't reach
+    i_First = bisect.bisect_right(o_Forecast.a_Time, time.time() - 3600)
     for i in range(0,12):
-      # get the forecast for the current hour
-      o_HourlyForecast = o_Forecast[i]
+      i_Hour = i_First + i
+      if(i_Hour >= len(o_Forecast.a_Time)):
+        self.l_Forecasts[i].Clear(o_Tracker)
+        continue
       
       # convert the time from UTC to a string like 12:30, 1:45
-      s_TimeOfForecast = datetime.datetime.fromtimestamp(o_HourlyForecast["time"]).strftime("%I:%M")
+      s_TimeOfForecast = datetime.datetime.fromtimestamp(o_Forecast.a_Time[i_Hour]).strftime("%I:%M")
       
-      # get the image from the library with the icon returned from the API
-      self.o_Image.append("")
-      self.o_Image[i]   = Image.open("/home/pi/Git/RPISmartHome/Source/Images/" + o_HourlyForecast["icon"] + ".png")
-      self.o_Image[i]   = ImageTk.PhotoImage(self.o_Image[i])
+      # show the icon returned from the API
+      self.l_Forecasts[i].SetIcon(o_Forecast.l_Icon[i_Hour], o_Tracker)
       
       # update all of the labels with the new information
-      self.l_Forecasts[i].o_ImageLabel.config(image=self.o_Image[i])
-      self.l_Forecasts[i].o_Time.set(s_TimeOfForecast)
-      self.l_Forecasts[i].o_Temp.set(str(o_HourlyForecast["temperature"]))
-      self.l_Forecasts[i].o_RainPct.set(str(o_HourlyForecast["precipProbability"]))
+      o_Tracker.SetVar(self.l_Forecasts[i].o_Time, s_TimeOfForecast)
+      o_Tracker.SetVar(self.l_Forecasts[i].o_Temp, str(o_Forecast.a_Temperature[i_Hour]))
+      o_Tracker.SetVar(self.l_Forecasts[i].o_RainPct, str(o_Forecast.a_PrecipProbability[i_Hour]))
 
 
 # this class handles the forecasts for the next five days instead of hourly      
@@ -166,9 +348,11 @@ class FiveDayForecast:
   *                    Y location of the top left corner of the object.
   *              obj   master
   *                    Master tkinter canvas.
+  *              obj   o_IconCache
+  *                    Icon cache shared by all of the forecasts.
   * Returns:     N/A                     
   *****************************************************************'''
-  def __init__(self, master, i_X, i_Y):
+  def __init__(self, master, i_X, i_Y, o_IconCache):
     self.l_Forecasts = []
     
     # overall title for this section of the GUI
@@ -182,32 +366,37 @@ class FiveDayForecast:
     
     # create five forecast objects
     for i in range(0,5):
-      self.l_Forecasts.append(SingleForecast(master, i_X + (i*100), i_Y))
+      self.l_Forecasts.append(SingleForecast(master, i_X + (i*100), i_Y, o_IconCache))
       
   '''*****************************************************************
   * Name: update                                                                  
-  * Description: Function to update the forecast for the next five days.                   
+  * Description: Function to update the forecast for the next five days,
+  *              starting with today.                   
   * Parameters:  obj o_Forecast
-  *                  Iterable list of forecasts returned by the API.
+  *                  ForecastSeries of the forecasts returned by the API.
+  *              obj o_Tracker
+  *                  Render tracker of the GUI.
   * Returns:     N/A                     
   *****************************************************************'''      
-  def update(self, o_Forecast):
-    self.o_Image = []
-    # loop over the forecasts
+  def update(self, o_Forecast, o_Tracker):
+    # skip the days that are over, and blank the slots the forecast doesn't reach
+    i_First = bisect.bisect_right(o_Forecast.a_Time, time.time() - 86400)
     for i in range(0,5):
-      o_DailyForecast = o_Forecast[i]
+      i_Day = i_First + i
+      if(i_Day >= len(o_Forecast.a_Time)):
+        self.l_Forecasts[i].Clear(o_Tracker)
+        continue
+      
       # get the day of thee week
-      s_TimeOfForecast = datetime.datetime.fromtimestamp(o_DailyForecast["time"]).strftime("%A")
+      s_TimeOfForecast = datetime.datetime.fromtimestamp(o_Forecast.a_Time[i_Day]).strftime("%A")
       
-      # get the image from the library with the icon returned from the API
-      self.o_Image.append("")
-      self.o_Image[i]   = Image.open("/home/pi/Git/RPISmartHome/Source/Images/" + o_DailyForecast["icon"] + ".png")
-      self.o_Image[i]   = ImageTk.PhotoImage(self.o_Image[i])
+      # show the icon returned from the API
+      self.l_Forecasts[i].SetIcon(o_Forecast.l_Icon[i_Day], o_Tracker)
       
-      # update the labels with the new information
-      self.l_Forecasts[i].o_Time.set(s_TimeOfForecast)
-      self.l_Forecasts[i].o_Temp.set(str(o_DailyForecast["temperatureHigh"]))
-      self.l_Forecasts[i].o_RainPct.set(str(o_DailyForecast["precipProbability"]))
+      # update the labels with the new information (the temperature is the high)
+      o_Tracker.SetVar(self.l_Forecasts[i].o_Time, s_TimeOfForecast)
+      o_Tracker.SetVar(self.l_Forecasts[i].o_Temp, str(o_Forecast.a_Temperature[i_Day]))
+      o_Tracker.SetVar(self.l_Forecasts[i].o_RainPct, str(o_Forecast.a_PrecipProbability[i_Day]))
 
 
 # this class handles the current states of the temperature system      
@@ -338,9 +527,11 @@ class TempSystemStates:
   * Description: Function to update the current states of the temp module.                   
   * Parameters:  obj o_TempModule
   *                  Full temperature module to access its variables.
+  *              obj o_Tracker
+  *                  Render tracker of the GUI.
   * Returns:     N/A                     
   *****************************************************************'''   
-  def update(self, o_TempModule):
+  def update(self, o_TempModule, o_Tracker):
     
     # set the action string based on the state of the module
     if(o_TempModule.i_HvacStateFlag == configs.i_DoNothingFlag):
@@ -352,19 +543,19 @@ class TempSystemStates:
     
     # show Fahrenheit
     if(configs.SW_USE_METRIC_UNITS == False):
-      self.o_OutdoorTemp.set(str(o_TempModule.o_OutdoorTempSensor.f_Temperature_F) + " °F")
-      self.o_IndoorTemp.set(str(o_TempModule.o_IndoorTempSensor.f_Temperature_F) + " °F")
-      self.o_TempSetting.set(s_HvacAction + str(o_TempModule.f_SetTemperature) + " °F")
+      o_Tracker.SetVar(self.o_OutdoorTemp, str(o_TempModule.o_OutdoorTempSensor.f_Temperature_F) + " °F")
+      o_Tracker.SetVar(self.o_IndoorTemp, str(o_TempModule.o_IndoorTempSensor.f_Temperature_F) + " °F")
+      o_Tracker.SetVar(self.o_TempSetting, s_HvacAction + str(o_TempModule.f_SetTemperature) + " °F")
     
     # otherwise, show Celsius
     else:
-      self.o_OutdoorTemp.set(str(o_TempModule.o_OutdoorTempSensor.f_Temperature_C) + " °C")
-      self.o_IndoorTemp.set(str(o_TempModule.o_IndoorTempSensor.f_Temperature_C) + " °C")
-      self.o_TempSetting.set(s_HvacAction + str(o_TempModule.f_SetTemperature) + " °C")
+      o_Tracker.SetVar(self.o_OutdoorTemp, str(o_TempModule.o_OutdoorTempSensor.f_Temperature_C) + " °C")
+      o_Tracker.SetVar(self.o_IndoorTemp, str(o_TempModule.o_IndoorTempSensor.f_Temperature_C) + " °C")
+      o_Tracker.SetVar(self.o_TempSetting, s_HvacAction + str(o_TempModule.f_SetTemperature) + " °C")
     
     # show the humidity  
-    self.o_OutdoorHum.set(str(o_TempModule.o_OutdoorTempSensor.f_Humidity_Pct) + "%")
-    self.o_IndoorHum.set(str(o_TempModule.o_IndoorTempSensor.f_Humidity_Pct) + "%")
+    o_Tracker.SetVar(self.o_OutdoorHum, str(o_TempModule.o_OutdoorTempSensor.f_Humidity_Pct) + "%")
+    o_Tracker.SetVar(self.o_IndoorHum, str(o_TempModule.o_IndoorTempSensor.f_Humidity_Pct) + "%")
     
                                 
 # class to render the current states of the water system  
@@ -450,23 +641,25 @@ class WaterSystemStates:
   * Description: Function to update the current states of the water module.                   
   * Parameters:  obj o_WaterModule
   *                  Full water module to access its variables.
+  *              obj o_Tracker
+  *                  Render tracker of the GUI.
   * Returns:     N/A                     
   *****************************************************************'''   
-  def update(self, o_WaterModule):
+  def update(self, o_WaterModule, o_Tracker):
     # set the water level percentage string
-    self.o_MoistureLvl.set(str(o_WaterModule.o_WaterSensor.f_WaterLevel_Pct) + " %")
+    o_Tracker.SetVar(self.o_MoistureLvl, str(o_WaterModule.o_WaterSensor.f_WaterLevel_Pct) + " %")
     
     # if the water flag is off, the system is OK
     if(o_WaterModule.i_WaterFlag == 0):
-      self.o_NeedsWater.set("OK")
-      self.o_NeedsWaterLabel.config(fg="green")
-      self.o_SprinklerSt.set("OFF")
+      o_Tracker.SetVar(self.o_NeedsWater, "OK")
+      o_Tracker.Configure(self.o_NeedsWaterLabel, fg = "green")
+      o_Tracker.SetVar(self.o_SprinklerSt, "OFF")
       
     # otherwise, the system needs water and the sprinkler should be on
     else:
-      self.o_NeedsWater.set("Needs Water")
-      self.o_NeedsWaterLabel.config(fg="red")
-      self.o_SprinklerSt.set("ON")
+      o_Tracker.SetVar(self.o_NeedsWater, "Needs Water")
+      o_Tracker.Configure(self.o_NeedsWaterLabel, fg = "red")
+      o_Tracker.SetVar(self.o_SprinklerSt, "ON")
 
 
 # main GUI for the system
@@ -490,9 +683,18 @@ class mainGUI:
     self.master.geometry("%dx%d+0+0" % (self.windowW,self.windowH))
     self.master.config(bg="white")
     
+    # every forecast tile draws its icon from one shared cache
+    self.o_IconCache = IconCache()
+    
+    # remembers what each widget shows so unchanged widgets are skipped
+    self.o_Tracker = RenderTracker()
+    
+    # whether the title says the forecast shown is the one saved on disk
+    self.b_StaleTitle = False
+    
     # create the label bins
-    self.o_THF = TwelveHourForecast(self.master, 40, 50)
-    self.o_FDF = FiveDayForecast(self.master, 400, 250)
+    self.o_THF = TwelveHourForecast(self.master, 40, 50, self.o_IconCache)
+    self.o_FDF = FiveDayForecast(self.master, 400, 250, self.o_IconCache)
     self.o_TSS = TempSystemStates(self.master, 175, 425)
     self.o_WSS = WaterSystemStates(self.master, 700,425)
   
@@ -506,11 +708,28 @@ class mainGUI:
   * Returns:     N/A                     
   *****************************************************************'''   
   def update(self, o_TempModule, o_WaterModule):
-    print("update")
-    self.o_WSS.update(o_WaterModule)
-    self.o_TSS.update(o_TempModule)
-    self.o_FDF.update(o_WaterModule.o_Forecast.l_DailyForecasts)
-    self.o_THF.update(o_WaterModule.o_Forecast.l_HourlyForecasts)
-    self.master.update()
+    with metrics.o_StageSeconds.time(("gui_redraw",)):
+      # only widgets whose value changed since the last frame are touched
+      self.o_Tracker.StartFrame()
+      self.o_WSS.update(o_WaterModule, self.o_Tracker)
+      self.o_TSS.update(o_TempModule, self.o_Tracker)
+      # both panels come from one published forecast, never from the network
+      o_Snapshot = o_WaterModule.o_Forecast.GetSnapshot()
+      if(o_Snapshot != None):
+        self.o_FDF.update(o_Snapshot.o_Forecast.o_Daily, self.o_Tracker)
+        self.o_THF.update(o_Snapshot.o_Forecast.o_Hourly, self.o_Tracker)
+        # until the first fetch, say when the forecast shown was fetched
+        if(o_Snapshot.b_Stale != self.b_StaleTitle):
+          self.b_StaleTitle = o_Snapshot.b_Stale
+          if(o_Snapshot.b_Stale):
+            self.master.title("RPi Smart Home - forecast from " +
+                              datetime.datetime.fromtimestamp(o_Snapshot.f_FetchTime).strftime("%m/%d %I:%M") + ", updating")
+          else:
+            self.master.title("RPi Smart Home")
+      metrics.o_GUIUpdates.inc(("changed",), self.o_Tracker.i_Changed)
+      metrics.o_GUIUpdates.inc(("skipped",), self.o_Tracker.i_Skipped)
+      
+      # process events, which redraws whatever the changes above damaged
+      self.master.update()
     
 ################################## end file ###################################
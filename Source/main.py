@@ -10,55 +10,401 @@
 ****************************************************************************'''
 
 # document version
-__version__ = "2.0.1"
+__version__ = "2.1.0"
 
 # imports
+import time
+f_ImportStart = time.perf_counter() # startup timing includes the imports below
+
 import configs
+import forecast_archive
 import temperature
-import gui
+import metrics
 import water_lawn
-import systime 
+import systime
+import scheduler
+import supervisor
+import timeseries
 
+import argparse
+import asyncio
+import concurrent.futures
 import datetime
-import time
+import resource
 
-def main():
-  # first, initialize the modules
-  o_SystimeModule = systime.Systime()
-  o_TemperatureModule = temperature.TemperatureModule(o_SystimeModule)
-  o_WaterLawnModule   = water_lawn.WaterModule(o_SystimeModule, o_TemperatureModule.o_OutdoorTempSensor)
-  o_GUI = gui.mainGUI()
-  
-  # this is the main loop of the program 
-  while True:
-    # first, we run the temperature module
-    i_Error = o_TemperatureModule.main()
+# class to time the phases of startup
+class StartupTimer:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class StartupTimer
+  * Parameters:  float f_Start
+  *                    perf_counter() time startup began at.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, f_Start):
+    self.f_Start  = f_Start
+    self.f_Last   = f_Start
+    self.l_Phases = []
+
+  '''*****************************************************************
+  * Name: mark
+  * Description: Ends the current phase.
+  * Parameters:  str s_Phase
+  *                  Name of the phase that just ended.
+  * Returns:     N/A
+  *****************************************************************'''
+  def mark(self, s_Phase):
+    f_Now = time.perf_counter()
+    self.l_Phases.append((s_Phase, f_Now - self.f_Last))
+    self.f_Last = f_Now
+
+  '''*****************************************************************
+  * Name: report
+  * Description: Prints the time of every phase, the total, and the peak
+  *              memory of the process so far.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def report(self):
+    s_Phases = ", ".join("%s %.3f s" % (s_Phase, f_Time_s) for s_Phase, f_Time_s in self.l_Phases)
+    print("startup: %s, total %.3f s, peak memory %.1f MiB"
+          % (s_Phases, self.f_Last - self.f_Start,
+             resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+# class to hold the modules of the system and the tasks that run them
+class SmartHome:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Initializes the modules and registers their tasks with
+  *              the scheduler.
+  * Parameters:  bool b_Headless
+  *                   Run without the GUI. tkinter and PIL are never
+  *                   imported.
+  *              obj  o_Startup
+  *                   StartupTimer to record the phases in, if any.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, b_Headless = configs.SW_HEADLESS, o_Startup = None):
+    if(o_Startup == None):
+      o_Startup = StartupTimer(time.perf_counter())
     
-    # if the temp module didn't raise an error, run the water lawn module
-    if(i_Error == configs.SYSERROR_NO_ERROR):
-      print("here")
-      i_Error = o_WaterLawnModule.main()
-      
-    # if the water module didn't raise an error, update the GUI
-    if(i_Error == configs.SYSERROR_NO_ERROR):  
-      o_GUI.update(o_TemperatureModule, o_WaterLawnModule)
+    # first, initialize the modules
+    self.o_SystimeModule     = systime.Systime()
+    self.o_TemperatureModule = temperature.TemperatureModule(self.o_SystimeModule)
+    o_Startup.mark("temperature")
+    # the forecast task keeps the forecast fresh, so the watering decision
+    # never calls the API itself
+    self.o_WaterLawnModule   = water_lawn.WaterModule(self.o_SystimeModule, self.o_TemperatureModule.o_OutdoorTempSensor,
+                                                  self.o_TemperatureModule.o_Snapshot, b_FetchForecast = False)
+    o_Startup.mark("water")
     
-    # if a temperature error was raised, re-initialize the module   
-    if(i_Error == configs.SYSERROR_TEMP_INDOOR_SENSOR_FAILRUE
-      or i_Error == configs.SYSERROR_TEMP_OUTDOOR_SENSOR_FAILURE):
-      o_TemperatureModule = temperature.TemperatureModule(o_SystimeModule)
-	  with open("errors.csv", "a") as o_File:
-		o_File.write(datetime.datetime.now.strftime("%m/%d/%Y, %H:%M:%S") + str(i_Error))
+    # the GUI is imported here rather than at the top, since tkinter and PIL
+    # are the slowest imports of the system
+    self.o_GUI = None
+    if(not b_Headless):
+      import gui
+      self.o_GUI = gui.mainGUI()
+      o_Startup.mark("gui")
     
-    # if a water error was raised, re-initialize the module
-    if(i_Error == configs.SYSERROR_WL_API_CALL_FAILURE 
-      or i_Error == configs.SYSERROR_WL_MOISTURE_SENSOR_FAILURE):
-      o_TemperatureModule = temperature.TemperatureModule(o_SystimeModule)
-	  with open("errors.csv", "a") as o_File:
-		o_File.write(datetime.datetime.now.strftime("%m/%d/%Y, %H:%M:%S") + str(i_Error))
-      
-    # 10 minute cycle time
-    time.sleep(5)
+    # history of every sensor reading, kept on disk across restarts
+    self.o_History = timeseries.TimeSeriesStore()
+    o_Startup.mark("history")
+
+    # every fetched forecast, to score it against the history
+    self.o_ForecastArchive = None
+    if(configs.SW_FORECAST_ARCHIVE):
+      self.o_ForecastArchive = forecast_archive.ForecastArchive()
+      self.o_WaterLawnModule.o_Forecast.o_Archive = self.o_ForecastArchive
+    # latest archive statistics and scores, for the statistics report
+    self.d_ArchiveStats = None
+    self.l_ScoreLines   = []
+
+    # stage timings and counters, served at /metrics for Prometheus to scrape
+    self.o_MetricsServer = None
+    if(configs.SW_SERVE_METRICS):
+      try:
+        self.o_MetricsServer = metrics.StartServer()
+      except OSError as o_Exception:
+        print("metrics endpoint not started: %s" % o_Exception)
+      o_Startup.mark("metrics")
+
+    # the last error returned by each module, and whether each has ever
+    # produced data. the GUI is redrawn from the last good data of both
+    self.i_TempError  = None
+    self.i_WaterError = None
+    self.b_TempData   = False
+    self.b_WaterData  = False
+
+    # each module runs behind its own circuit breaker. a module that keeps
+    # failing is restarted on its own and then left alone for a growing
+    # backoff, while the rest keep running on its last good data
+    self.o_Supervisor = supervisor.Supervisor()
+    self.o_Supervisor.AddModule("temperature", (configs.SYSERROR_TEMP_OUTDOOR_SENSOR_FAILURE,
+                                                configs.SYSERROR_TEMP_INDOOR_SENSOR_FAILRUE),
+                                self.o_TemperatureModule.restart)
+    self.o_Supervisor.AddModule("water", (configs.SYSERROR_WL_MOISTURE_SENSOR_FAILURE,),
+                                self.o_WaterLawnModule.o_WaterSensor.restart)
+    self.o_Supervisor.AddModule("forecast", (configs.SYSERROR_WL_API_CALL_FAILURE,))
+
+    # the sensors share one worker so two tasks never drive the GPIO pins at
+    # the same time. the API call gets its own worker so it can't hold them up
+    self.o_HardwareExecutor = concurrent.futures.ThreadPoolExecutor(max_workers = 1)
+    self.o_NetworkExecutor  = concurrent.futures.ThreadPoolExecutor(max_workers = 1)
+
+    # the GUI and the statistics report run on the event loop itself since
+    # tkinter has to be driven from the main thread
+    self.o_Scheduler = scheduler.Scheduler()
+    self.o_Scheduler.AddTask("temperature", self.o_Supervisor.Wrap("temperature", self.RunTemperature),
+                             configs.f_TempTaskPeriod_s, configs.f_TempTaskDeadline_s,
+                             self.o_HardwareExecutor, self.OnTemperatureResult)
+    self.o_Scheduler.AddTask("water", self.o_Supervisor.Wrap("water", self.RunWater),
+                             configs.f_WaterTaskPeriod_s, configs.f_WaterTaskDeadline_s,
+                             self.o_HardwareExecutor, self.OnWaterResult)
+    self.o_Scheduler.AddTask("forecast", self.o_Supervisor.Wrap("forecast", self.RefreshForecast),
+                             configs.f_ForecastTaskPeriod_s, configs.f_ForecastTaskDeadline_s,
+                             self.o_NetworkExecutor)
+    if(self.o_GUI != None):
+      self.o_Scheduler.AddTask("gui", self.RefreshGUI,
+                               configs.f_GUITaskPeriod_s, configs.f_GUITaskDeadline_s)
+    self.o_Scheduler.AddTask("stats", self.ReportStats, configs.f_StatsReportPeriod_s)
+
+    # scoring reads a week of the archive and the history, too slow for the
+    # event loop, so it runs on the network worker alongside the archiving
+    if(self.o_ForecastArchive != None):
+      self.o_Scheduler.AddTask("score", self.ScoreForecasts, configs.f_ScoreTaskPeriod_s,
+                               None, self.o_NetworkExecutor)
+
+    # the fleet reporter pushes a snapshot of every cycle to the aggregator
+    # in batches, over the network worker. it is only imported when enabled
+    self.o_FleetReporter = None
+    if(configs.SW_FLEET_REPORTING):
+      import fleet
+      self.o_FleetReporter = fleet.FleetReporter()
+      self.o_Scheduler.AddTask("fleet", self.o_FleetReporter.Flush, configs.f_FleetReportPeriod_s,
+                               configs.f_FleetTimeout_s, self.o_NetworkExecutor)
+
+  '''*****************************************************************
+  * Name: RunTemperature
+  * Description: Runs one pass of the temperature module and records the
+  *              readings in the history.
+  * Parameters:  N/A
+  * Returns:     int i_Error
+  *                  Error code raised by the module.
+  *****************************************************************'''
+  def RunTemperature(self):
+    i_Error = self.o_TemperatureModule.main()
+    if(i_Error == configs.SYSERROR_NO_ERROR):
+      o_Outdoor = self.o_TemperatureModule.o_OutdoorTempSensor
+      o_Indoor  = self.o_TemperatureModule.o_IndoorTempSensor
+      self.o_History.append("outdoor_temp_f", o_Outdoor.f_Temperature_F)
+      self.o_History.append("outdoor_humidity_pct", o_Outdoor.f_Humidity_Pct)
+      self.o_History.append("indoor_temp_f", o_Indoor.f_Temperature_F)
+      self.o_History.append("indoor_humidity_pct", o_Indoor.f_Humidity_Pct)
+      # the first zone is recorded as indoor above
+      for o_Zone in self.o_TemperatureModule.l_Zones[1:]:
+        self.o_History.append("zone_%s_temp_f" % o_Zone.s_Name, o_Zone.o_Sensor.f_Temperature_F)
+        self.o_History.append("zone_%s_humidity_pct" % o_Zone.s_Name, o_Zone.o_Sensor.f_Humidity_Pct)
+    return i_Error
+
+  '''*****************************************************************
+  * Name: RunWater
+  * Description: Runs one pass of the water lawn module and records the
+  *              moisture level and what it decided in the history.
+  * Parameters:  N/A
+  * Returns:     int i_Error
+  *                  Error code raised by the module.
+  *****************************************************************'''
+  def RunWater(self):
+    i_Error = self.o_WaterLawnModule.main()
+    if(i_Error == configs.SYSERROR_NO_ERROR):
+      self.o_History.append("water_level_pct", self.o_WaterLawnModule.o_WaterSensor.f_WaterLevel_Pct)
+      self.o_History.append("water_flag", self.o_WaterLawnModule.i_WaterFlag)
+      self.o_History.append("rain_flag", self.o_WaterLawnModule.o_Forecast.i_Rain)
+    return i_Error
+
+  '''*****************************************************************
+  * Name: RefreshForecast
+  * Description: Prefetches the forecast on the network worker, so the
+  *              watering decision and the GUI always find a published
+  *              one without waiting on the API.
+  * Parameters:  N/A
+  * Returns:     int i_Error
+  *                  Error code raised by the API call.
+  *****************************************************************'''
+  def RefreshForecast(self):
+    return self.o_WaterLawnModule.o_Forecast.prefetch()
+
+  '''*****************************************************************
+  * Name: ScoreForecasts
+  * Description: Scores the archived forecasts against the history and
+  *              keeps the result for the statistics report.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def ScoreForecasts(self):
+    d_Stats = self.o_ForecastArchive.GetStats()
+    l_Lines = forecast_archive.FormatScores(self.o_ForecastArchive.score(self.o_History))
+    self.d_ArchiveStats, self.l_ScoreLines = d_Stats, l_Lines
+
+  '''*****************************************************************
+  * Name: RefreshGUI
+  * Description: Redraws the GUI once both modules have data. A module
+  *              that is failing keeps showing its last good data.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def RefreshGUI(self):
+    if(self.b_TempData and self.b_WaterData):
+      self.o_GUI.update(self.o_TemperatureModule, self.o_WaterLawnModule)
+    else:
+      # keep the window responsive while there is nothing new to draw
+      self.o_GUI.master.update()
+
+  '''*****************************************************************
+  * Name: OnTemperatureResult
+  * Description: Handles the error code returned by the temperature task.
+  * Parameters:  int i_Error
+  *                  Error code returned by the task, None if the task
+  *                  was skipped or raised.
+  * Returns:     N/A
+  *****************************************************************'''
+  def OnTemperatureResult(self, i_Error):
+    if(i_Error == None):
+      return
+    self.i_TempError = i_Error
+    self.b_TempData  = self.b_TempData or i_Error == configs.SYSERROR_NO_ERROR
+    self.HandleError(i_Error)
+
+  '''*****************************************************************
+  * Name: OnWaterResult
+  * Description: Handles the error code returned by the water task.
+  * Parameters:  int i_Error
+  *                  Error code returned by the task, None if the task
+  *                  was skipped or raised.
+  * Returns:     N/A
+  *****************************************************************'''
+  def OnWaterResult(self, i_Error):
+    if(i_Error != None):
+      self.i_WaterError = i_Error
+      self.b_WaterData  = self.b_WaterData or i_Error == configs.SYSERROR_NO_ERROR
+      self.HandleError(i_Error)
+    if(self.o_FleetReporter != None):
+      self.o_FleetReporter.Record(self.GetFleetSnapshot())
+
+  '''*****************************************************************
+  * Name: GetFleetSnapshot
+  * Description: Collects the state reported to the fleet aggregator.
+  *              Values the modules haven't produced yet are None.
+  * Parameters:  N/A
+  * Returns:     dict d_Snapshot
+  *                   Value keyed by fleet.t_Fields.
+  *****************************************************************'''
+  def GetFleetSnapshot(self):
+    o_Temp    = self.o_TemperatureModule
+    o_Outdoor = o_Temp.o_OutdoorTempSensor
+    o_Indoor  = o_Temp.o_IndoorTempSensor
+    o_Water   = self.o_WaterLawnModule
+    return {"f_Time":                time.time(),
+            "f_OutdoorTemp_F":       getattr(o_Outdoor, "f_Temperature_F", None),
+            "f_OutdoorHumidity_Pct": o_Outdoor.f_Humidity_Pct,
+            "f_IndoorTemp_F":        getattr(o_Indoor, "f_Temperature_F", None),
+            "f_IndoorHumidity_Pct":  o_Indoor.f_Humidity_Pct,
+            "i_HvacStateFlag":       getattr(o_Temp, "i_HvacStateFlag", None),
+            "f_SetTemperature":      getattr(o_Temp, "f_SetTemperature", None),
+            "i_HvacState":           getattr(o_Temp, "i_HvacState", None),
+            "f_WaterLevel_Pct":      getattr(o_Water.o_WaterSensor, "f_WaterLevel_Pct", None),
+            "i_WaterFlag":           o_Water.i_WaterFlag,
+            "i_TempError":           self.i_TempError,
+            "i_WaterError":          self.i_WaterError}
+
+  '''*****************************************************************
+  * Name: HandleError
+  * Description: Logs a module error. Restarting the module is left to
+  *              the supervisor, which only does it once the module's
+  *              circuit breaker opens.
+  * Parameters:  int i_Error
+  *                  Error code returned by a module.
+  * Returns:     N/A
+  *****************************************************************'''
+  def HandleError(self, i_Error):
+    if(i_Error != None and i_Error != configs.SYSERROR_NO_ERROR):
+      metrics.o_Errors.inc((i_Error,))
+      with open("errors.csv", "a") as o_File:
+        o_File.write(datetime.datetime.now().strftime("%m/%d/%Y, %H:%M:%S") + ", " + str(i_Error) + "\n")
+
+  '''*****************************************************************
+  * Name: ReportStats
+  * Description: Prints the latency and jitter measured for each task, the
+  *              state of each circuit breaker and how accurate the
+  *              archived forecasts were when last scored.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def ReportStats(self):
+    for s_Name, d_Stats in self.o_Scheduler.GetStats().items():
+      print("%-12s runs:%d late:%d skipped:%d latency mean/max: %.3f/%.3f s jitter mean/sd/max: %.3f/%.3f/%.3f s"
+            % (s_Name, d_Stats["i_Runs"], d_Stats["i_DeadlineMisses"], d_Stats["i_Skipped"],
+               d_Stats["f_MeanLatency_s"], d_Stats["f_MaxLatency_s"], d_Stats["f_MeanJitter_s"],
+               d_Stats["f_JitterStdDev_s"], d_Stats["f_MaxJitter_s"]))
+    if(self.o_GUI != None):
+      o_Tracker = self.o_GUI.o_Tracker
+      print("%-12s frames:%d widget updates changed:%d skipped:%d"
+            % ("gui", o_Tracker.i_Frames, o_Tracker.i_TotalChanged, o_Tracker.i_TotalSkipped))
+    d_Stats = self.o_WaterLawnModule.o_Forecast.GetStats()
+    print("%-12s prefetches:%d failed:%d latency last/max: %.3f/%.3f s snapshot age: %s%s"
+          % ("forecast", d_Stats["i_Prefetches"], d_Stats["i_PrefetchFailures"], d_Stats["f_LastPrefetch_s"],
+             d_Stats["f_MaxPrefetch_s"], "none" if d_Stats["f_SnapshotAge_s"] == None else "%.0f s" % d_Stats["f_SnapshotAge_s"],
+             " (loaded from disk)" if d_Stats["b_SnapshotStale"] else ""))
+    print("%-12s cache hits:%d misses:%d cache age: %s"
+          % ("forecast", d_Stats["i_CacheHits"], d_Stats["i_CacheMisses"],
+             "none" if d_Stats["f_CacheAge_s"] == None else "%.0f s" % d_Stats["f_CacheAge_s"]))
+    for s_Name, d_Provider in d_Stats["d_Providers"].items():
+      print("%-12s requests:%d failed:%d used:%d hedged:%d over budget:%d latency last: %.3f s"
+            % (s_Name, d_Provider["i_Requests"], d_Provider["i_Failures"], d_Provider["i_Wins"],
+               d_Provider["i_Hedges"], d_Provider["i_OverBudget"], d_Provider["f_LastLatency_s"]))
+    for s_Name, d_Stats in self.o_Supervisor.GetStats().items():
+      print("%-12s breaker:%s failures:%d trips:%d skipped:%d retry in: %.0f s"
+            % (s_Name, d_Stats["s_State"], d_Stats["i_InARow"], d_Stats["i_Trips"],
+               d_Stats["i_Skipped"], d_Stats["f_RetryIn_s"]))
+    d_Stats = self.d_ArchiveStats
+    if(d_Stats != None):
+      print("%-12s hours archived:%d written:%d size: %.1f KiB"
+            % ("archive", d_Stats["i_Archived"], d_Stats["i_Written"], d_Stats["i_Bytes"] / 1024))
+      for s_Line in self.l_ScoreLines:
+        print("%-12s %s" % ("accuracy", s_Line))
+
+def main():
+  o_Startup = StartupTimer(f_ImportStart)
+  o_Startup.mark("imports")
+  
+  o_Parser = argparse.ArgumentParser(description = "RPI Smart Home controller.")
+  o_Parser.add_argument("--headless", action = argparse.BooleanOptionalAction, default = configs.SW_HEADLESS,
+                        help = "run without the GUI, e.g. as a systemd service. --no-headless shows the GUI "
+                               "even if SW_HEADLESS is set")
+  o_Args = o_Parser.parse_args()
+  
+  o_SmartHome = SmartHome(o_Args.headless, o_Startup)
+  o_Startup.report()
+
+  # this is the main loop of the program, each module runs on its own period
+  try:
+    asyncio.run(o_SmartHome.o_Scheduler.run())
+  except KeyboardInterrupt:
+    pass
+  finally:
+    o_SmartHome.o_HardwareExecutor.shutdown(wait = False)
+    o_SmartHome.o_NetworkExecutor.shutdown(wait = False)
+    o_SmartHome.o_History.close()
+    o_SmartHome.o_TemperatureModule.close()
+    o_SmartHome.o_WaterLawnModule.o_Forecast.close()
+    if(o_SmartHome.o_ForecastArchive != None):
+      o_SmartHome.o_ForecastArchive.close()
+    if(o_SmartHome.o_FleetReporter != None):
+      o_SmartHome.o_FleetReporter.close()
+    if(o_SmartHome.o_MetricsServer != None):
+      o_SmartHome.o_MetricsServer.shutdown()
 
 if __name__ == "__main__":
   main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: metrics.py                                                       *
+* Purpose:   Counters and timing histograms, served on a local HTTP           *
+*            endpoint in the Prometheus text format.                          *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs      # global configs file
+import bisect       # library for finding a histogram bucket
+import threading    # library for locking and the server thread
+import time         # library for timing
+
+# buckets (in seconds) for the stage timing histograms. they cover a cached
+# lookup up to a DHT11 read that used every retry
+l_StageBuckets = [0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+'''*****************************************************************
+* Name: FormatLabels
+* Description: Formats label names and values as {name="value",...}.
+* Parameters:  tuple t_Names
+*              tuple t_Values
+* Returns:     str   s_Labels
+*****************************************************************'''
+def FormatLabels(t_Names, t_Values):
+  if(len(t_Names) == 0):
+    return ""
+  l_Pairs = []
+  for s_Name, o_Value in zip(t_Names, t_Values):
+    s_Value = str(o_Value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    l_Pairs.append("%s=\"%s\"" % (s_Name, s_Value))
+  return "{" + ",".join(l_Pairs) + "}"
+
+# class for a counter that only goes up, with one value per label set
+class Counter:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class Counter
+  * Parameters:  str   s_Name
+  *                    Metric name.
+  *              str   s_Help
+  *                    One line description.
+  *              tuple t_LabelNames
+  *                    Names of the labels.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Name, s_Help, t_LabelNames = ()):
+    self.s_Name       = s_Name
+    self.s_Help       = s_Help
+    self.t_LabelNames = t_LabelNames
+    self.d_Values     = {}
+    self.o_Lock       = threading.Lock()
+
+  '''*****************************************************************
+  * Name: inc
+  * Description: Increments the counter of a label set.
+  * Parameters:  tuple t_Labels
+  *                    Label values, in the order of the label names.
+  *              float f_Amount
+  * Returns:     N/A
+  *****************************************************************'''
+  def inc(self, t_Labels = (), f_Amount = 1):
+    with self.o_Lock:
+      self.d_Values[t_Labels] = self.d_Values.get(t_Labels, 0) + f_Amount
+
+  '''*****************************************************************
+  * Name: get
+  * Description: Returns the counter of a label set.
+  * Parameters:  tuple t_Labels
+  * Returns:     float f_Value
+  *****************************************************************'''
+  def get(self, t_Labels = ()):
+    with self.o_Lock:
+      return self.d_Values.get(t_Labels, 0)
+
+  '''*****************************************************************
+  * Name: Render
+  * Description: Returns the counter in the Prometheus text format.
+  * Parameters:  N/A
+  * Returns:     list l_Lines
+  *****************************************************************'''
+  def Render(self):
+    l_Lines = ["# HELP %s %s" % (self.s_Name, self.s_Help), "# TYPE %s counter" % self.s_Name]
+    with self.o_Lock:
+      for t_Labels, f_Value in sorted(self.d_Values.items()):
+        l_Lines.append("%s%s %s" % (self.s_Name, FormatLabels(self.t_LabelNames, t_Labels), repr(f_Value)))
+    return l_Lines
+
+# class for a histogram with fixed buckets, with one set of buckets per
+# label set
+class Histogram:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class Histogram
+  * Parameters:  str   s_Name
+  *                    Metric name.
+  *              str   s_Help
+  *                    One line description.
+  *              tuple t_LabelNames
+  *                    Names of the labels.
+  *              list  l_Buckets
+  *                    Upper bounds of the buckets, ascending.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Name, s_Help, t_LabelNames = (), l_Buckets = l_StageBuckets):
+    self.s_Name       = s_Name
+    self.s_Help       = s_Help
+    self.t_LabelNames = t_LabelNames
+    self.l_Buckets    = list(l_Buckets)
+    self.d_Series     = {}   # label values -> [bucket counts, sum, count]
+    self.o_Lock       = threading.Lock()
+
+  '''*****************************************************************
+  * Name: observe
+  * Description: Records one value.
+  * Parameters:  float f_Value
+  *              tuple t_Labels
+  *                    Label values, in the order of the label names.
+  * Returns:     N/A
+  *****************************************************************'''
+  def observe(self, f_Value, t_Labels = ()):
+    i_Bucket = bisect.bisect_left(self.l_Buckets, f_Value)
+    with self.o_Lock:
+      l_Series = self.d_Series.get(t_Labels)
+      if(l_Series == None):
+        l_Series = [[0] * (len(self.l_Buckets) + 1), 0.0, 0]
+        self.d_Series[t_Labels] = l_Series
+      l_Series[0][i_Bucket] += 1
+      l_Series[1] += f_Value
+      l_Series[2] += 1
+
+  '''*****************************************************************
+  * Name: time
+  * Description: Returns a context manager that observes how long its
+  *              block takes.
+  * Parameters:  tuple t_Labels
+  * Returns:     obj   o_Timer
+  *****************************************************************'''
+  def time(self, t_Labels = ()):
+    return Timer(self, t_Labels)
+
+  '''*****************************************************************
+  * Name: Render
+  * Description: Returns the histogram in the Prometheus text format.
+  * Parameters:  N/A
+  * Returns:     list l_Lines
+  *****************************************************************'''
+  def Render(self):
+    l_Lines = ["# HELP %s %s" % (self.s_Name, self.s_Help), "# TYPE %s histogram" % self.s_Name]
+    t_BucketNames = self.t_LabelNames + ("le",)
+    with self.o_Lock:
+      for t_Labels, (l_Counts, f_Sum, i_Count) in sorted(self.d_Series.items()):
+        i_Cumulative = 0
+        for f_Bound, i_BucketCount in zip(self.l_Buckets + ["+Inf"], l_Counts):
+          i_Cumulative += i_BucketCount
+          l_Lines.append("%s_bucket%s %d" % (self.s_Name, FormatLabels(t_BucketNames, t_Labels + (f_Bound,)), i_Cumulative))
+        s_Labels = FormatLabels(self.t_LabelNames, t_Labels)
+        l_Lines.append("%s_sum%s %s" % (self.s_Name, s_Labels, repr(f_Sum)))
+        l_Lines.append("%s_count%s %d" % (self.s_Name, s_Labels, i_Count))
+    return l_Lines
+
+# class for a value that goes up and down, either set directly or read from
+# a function when the metrics are rendered
+class Gauge:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class Gauge
+  * Parameters:  str   s_Name
+  *                    Metric name.
+  *              str   s_Help
+  *                    One line description.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Name, s_Help):
+    self.s_Name   = s_Name
+    self.s_Help   = s_Help
+    self.f_Value  = 0.0
+    self.fn_Value = None
+
+  '''*****************************************************************
+  * Name: set
+  * Description: Sets the value.
+  * Parameters:  float f_Value
+  * Returns:     N/A
+  *****************************************************************'''
+  def set(self, f_Value):
+    self.f_Value = f_Value
+
+  '''*****************************************************************
+  * Name: set_function
+  * Description: Reads the value from a function from now on, so it is
+  *              current whenever it is scraped.
+  * Parameters:  func fn_Value
+  *                   Returns the value, or None if there is none.
+  * Returns:     N/A
+  *****************************************************************'''
+  def set_function(self, fn_Value):
+    self.fn_Value = fn_Value
+
+  '''*****************************************************************
+  * Name: Render
+  * Description: Returns the gauge in the Prometheus text format.
+  * Parameters:  N/A
+  * Returns:     list l_Lines
+  *****************************************************************'''
+  def Render(self):
+    f_Value = self.fn_Value() if self.fn_Value != None else self.f_Value
+    if(f_Value == None):
+      f_Value = float("nan")
+    return ["# HELP %s %s" % (self.s_Name, self.s_Help), "# TYPE %s gauge" % self.s_Name,
+            "%s %s" % (self.s_Name, repr(float(f_Value)))]
+
+# class to time a block of code into a histogram
+class Timer:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class Timer
+  * Parameters:  obj   o_Histogram
+  *              tuple t_Labels
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, o_Histogram, t_Labels):
+    self.o_Histogram = o_Histogram
+    self.t_Labels    = t_Labels
+
+  def __enter__(self):
+    self.f_Start = time.perf_counter()
+    return self
+
+  def __exit__(self, *args):
+    self.o_Histogram.observe(time.perf_counter() - self.f_Start, self.t_Labels)
+    return False
+
+# the metrics of the system. modules record into these directly
+o_StageSeconds = Histogram("rpismarthome_stage_seconds",
+                           "Time spent in each stage of the control loop.", ("stage",))
+o_SensorRetries = Counter("rpismarthome_sensor_retries_total",
+                          "Failed DHT11 read attempts that were retried.", ("pin",))
+o_Errors = Counter("rpismarthome_errors_total",
+                   "Errors returned by the modules, by SYSERROR code.", ("code",))
+o_CacheRequests = Counter("rpismarthome_cache_requests_total",
+                          "Cache lookups by cache and result.", ("cache", "result"))
+o_BreakerTrips = Counter("rpismarthome_breaker_trips_total",
+                         "Times a module's circuit breaker opened.", ("module",))
+o_ModuleRestarts = Counter("rpismarthome_module_restarts_total",
+                           "Times a module was restarted by the supervisor.", ("module",))
+o_ProviderRequests = Counter("rpismarthome_provider_requests_total",
+                            "Forecast requests by weather provider and result.", ("provider", "result"))
+o_GUIUpdates = Counter("rpismarthome_gui_updates_total",
+                       "Widget updates asked of the GUI, by whether they changed the widget.", ("result",))
+o_ForecastAge = Gauge("rpismarthome_forecast_age_seconds",
+                      "Age of the forecast the watering decision and the GUI read.")
+l_Metrics = [o_StageSeconds, o_SensorRetries, o_Errors, o_CacheRequests, o_BreakerTrips, o_ModuleRestarts,
+             o_ProviderRequests, o_GUIUpdates, o_ForecastAge]
+
+'''*****************************************************************
+* Name: RenderAll
+* Description: Returns every metric in the Prometheus text format.
+* Parameters:  N/A
+* Returns:     str s_Text
+*****************************************************************'''
+def RenderAll():
+  l_Lines = []
+  for o_Metric in l_Metrics:
+    l_Lines.extend(o_Metric.Render())
+  return "\n".join(l_Lines) + "\n"
+
+'''*****************************************************************
+* Name: StartServer
+* Description: Serves /metrics from a background thread. http.server
+*              is only imported here, so recording metrics stays cheap
+*              to import.
+* Parameters:  str s_Address
+*                  Address to listen on, localhost by default.
+*              int i_Port
+*                  Port to listen on.
+* Returns:     obj o_Server
+*                  The HTTP server, shut it down to stop serving.
+*****************************************************************'''
+def StartServer(s_Address = configs.s_MetricsAddress, i_Port = configs.i_MetricsPort):
+  import http.server # library for the metrics endpoint
+
+  class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+      if(self.path.split("?")[0] != "/metrics"):
+        self.send_error(404)
+        return
+      b_Body = RenderAll().encode("utf-8")
+      self.send_response(200)
+      self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+      self.send_header("Content-Length", str(len(b_Body)))
+      self.end_headers()
+      self.wfile.write(b_Body)
+
+    # scrapes shouldn't fill the console
+    def log_message(self, *args):
+      pass
+
+  o_Server = http.server.ThreadingHTTPServer((s_Address, i_Port), MetricsHandler)
+  o_Server.daemon_threads = True
+  threading.Thread(target = o_Server.serve_forever, daemon = True).start()
+  return o_Server
+
+################################## end file ###################################
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: rain_risk.py                                                     *
+* Purpose:   Rain risk figures over the hourly forecast.                      *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs  # global configs file
+import metrics  # timing histograms and counters
+import bisect   # library for finding the hours in a window
+import time     # library for time capturing
+
+# class to hold the rain risk over one window of the forecast
+class RainRisk:
+  __slots__ = ("s_Name", "f_MaxProbability", "f_ExpectedAccumulation",
+               "f_HoursToRain", "i_Rain")
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class RainRisk, for a window with no
+  *              rain in it.
+  * Parameters:  str s_Name
+  *                  Name of the window.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Name):
+    self.s_Name                 = s_Name
+    self.f_MaxProbability       = 0.0  # highest chance of rain in any hour
+    self.f_ExpectedAccumulation = 0.0  # sum of chance * intensity over the hours
+    self.f_HoursToRain          = None # hours from now until the first rainy hour
+    self.i_Rain                 = 0    # 1 if any hour reaches f_ExpectRainPercent
+
+# class to compute the rain risk of every configured window over slices of
+# the hourly columns. results are cached per forecast version and hour, so
+# repeated watering decisions on the same forecast cost a dict lookup.
+class RainRiskEngine:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class RainRiskEngine
+  * Parameters:  list  l_Windows
+  *                    (name, hours ahead, first hour of day, last hour of
+  *                    day) for every window.
+  *              float f_Threshold
+  *                    Chance of rain that counts as rain.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, l_Windows = configs.l_RainWindows,
+               f_Threshold = configs.f_ExpectRainPercent):
+    self.l_Windows   = l_Windows
+    self.f_Threshold = f_Threshold
+
+    # last result and the (version, hour) it was computed for
+    self.t_CacheKey = None
+    self.d_Cached   = None
+
+    # statistics
+    self.i_Hits   = 0
+    self.i_Misses = 0
+
+  '''*****************************************************************
+  * Name: Evaluate
+  * Description: Computes the rain risk of every window, starting from
+  *              the hour that contains f_Now.
+  * Parameters:  obj   o_Forecast
+  *                    ParsedForecast to evaluate.
+  *              float f_Now
+  *                    Current time, defaults to now.
+  * Returns:     dict  d_Risk
+  *                    RainRisk keyed by window name.
+  *****************************************************************'''
+  def Evaluate(self, o_Forecast, f_Now = None):
+    if(f_Now == None):
+      f_Now = time.time()
+
+    # the result only changes when the forecast or the current hour changes
+    t_Key = (o_Forecast.i_Version, int(f_Now // 3600))
+    if(t_Key == self.t_CacheKey):
+      self.i_Hits += 1
+      metrics.o_CacheRequests.inc(("rain_risk", "hit"))
+      return self.d_Cached
+    self.i_Misses += 1
+    metrics.o_CacheRequests.inc(("rain_risk", "miss"))
+
+    # the hour of day comes from the series, computed once per forecast.
+    # every window starts at the hour that contains f_Now
+    o_Hourly = o_Forecast.o_Hourly
+    a_Time, a_Probability = o_Hourly.a_Time, o_Hourly.a_PrecipProbability
+    a_Intensity, a_HourOfDay = o_Hourly.a_PrecipIntensity, o_Hourly.GetHourOfDay()
+    i_Start = bisect.bisect_right(a_Time, f_Now - 3600)
+
+    d_Risk = {}
+    for s_Name, i_HoursAhead, i_FirstHour, i_LastHour in self.l_Windows:
+      o_Risk = RainRisk(s_Name)
+      d_Risk[s_Name] = o_Risk
+      i_End = bisect.bisect_left(a_Time, f_Now + 3600 * i_HoursAhead, i_Start)
+      l_Hours = [i for i in range(i_Start, i_End) if i_FirstHour <= a_HourOfDay[i] <= i_LastHour]
+      if(len(l_Hours) == 0):
+        continue
+      o_Risk.f_MaxProbability       = max(a_Probability[i] for i in l_Hours)
+      o_Risk.f_ExpectedAccumulation = sum(a_Probability[i] * a_Intensity[i] for i in l_Hours)
+      i_Rainy = next((i for i in l_Hours if a_Probability[i] >= self.f_Threshold), None)
+      if(i_Rainy != None):
+        o_Risk.i_Rain        = 1
+        o_Risk.f_HoursToRain = max(0.0, (a_Time[i_Rainy] - f_Now) / 3600)
+
+    self.t_CacheKey = t_Key
+    self.d_Cached   = d_Risk
+    return d_Risk
+
+################################## end file ###################################
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: replay.py                                                        *
+* Purpose:   Runs the temperature and water modules against simulated         *
+*            sensors, faster than real time.                                  *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs
+import drivers
+import forecast_series
+import systime
+import temperature
+import water_lawn
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+'''*****************************************************************
+* Name: SyntheticDarkSkyResponse
+* Description: Makes a forecast in the DarkSky response format,
+*              including the blocks the system doesn't use.
+* Parameters:  float f_Now
+*                    Time the forecast starts at.
+*              float f_RainChance
+*                    Fraction of hours with a high chance of rain.
+*              int   i_Seed
+*                    Seed for the random numbers.
+* Returns:     dict  d_Response
+*****************************************************************'''
+def SyntheticDarkSkyResponse(f_Now = None, f_RainChance = 0.1, i_Seed = 0):
+  if(f_Now == None):
+    f_Now = time.time()
+  o_Random = random.Random(i_Seed)
+  i_Hour = int(f_Now // 3600) * 3600
+  l_Icons = ["clear-day", "partly-cloudy-day", "cloudy", "rain", "clear-night"]
+
+  def Period(i_Time, b_Daily):
+    b_Rain = o_Random.random() < f_RainChance
+    d_Period = {"time": i_Time,
+                "summary": "Synthetic forecast",
+                "icon": "rain" if b_Rain else o_Random.choice(l_Icons),
+                "precipIntensity": round(o_Random.uniform(0.05, 0.3), 4) if b_Rain else 0,
+                "precipProbability": round(o_Random.uniform(0.65, 1.0), 2) if b_Rain else round(o_Random.uniform(0, 0.3), 2),
+                "dewPoint": 40.1, "humidity": 0.6, "pressure": 1015.2,
+                "windSpeed": 5.3, "windGust": 9.8, "windBearing": 220,
+                "cloudCover": 0.4, "uvIndex": 2, "visibility": 10, "ozone": 300.1}
+    if(b_Daily):
+      d_Period["temperatureHigh"] = round(o_Random.uniform(40, 85), 2)
+      d_Period["temperatureLow"]  = d_Period["temperatureHigh"] - 15
+    else:
+      d_Period["temperature"] = round(o_Random.uniform(40, 85), 2)
+      d_Period["apparentTemperature"] = d_Period["temperature"]
+    return d_Period
+
+  return {"latitude": 42.344137, "longitude": -83.309652, "timezone": "America/Detroit",
+          "currently": Period(int(f_Now), False),
+          "minutely": {"summary": "Synthetic", "icon": "cloudy",
+                       "data": [{"time": i_Hour + 60 * i, "precipIntensity": 0,
+                                 "precipProbability": 0} for i in range(61)]},
+          "hourly": {"summary": "Synthetic", "icon": "cloudy",
+                     "data": [Period(i_Hour + 3600 * i, False) for i in range(49)]},
+          "daily": {"summary": "Synthetic", "icon": "cloudy",
+                    "data": [Period(i_Hour + 86400 * i, True) for i in range(8)]},
+          "alerts": [],
+          "flags": {"sources": ["synthetic"], "units": "us"},
+          "offset": -5}
+
+# class that serves a synthetic forecast instead of calling the API
+class ReplayForecast(water_lawn.Forecast):
+
+  '''*****************************************************************
+  * Name: FetchForecast
+  * Description: Returns a synthetic forecast.
+  * Parameters:  N/A
+  * Returns:     obj o_Forecast
+  *                  ParsedForecast
+  *****************************************************************'''
+  def FetchForecast(self):
+    return forecast_series.ParseDarkSky(SyntheticDarkSkyResponse())
+
+'''*****************************************************************
+* Name: RunReplay
+* Description: Runs the temperature and water modules for a number of
+*              cycles on simulated drivers.
+* Parameters:  int  i_Cycles
+*                   Number of cycles to run.
+*              obj  o_DHT
+*                   SimulatedDHT to read the temperature sensors from.
+*              obj  o_ADC
+*                   SimulatedADC to read the moisture sensor from.
+*              bool b_Verbose
+*                   Let the modules print their output.
+* Returns:     dict d_Results
+*                   Cycle counts, timings and error counts.
+*****************************************************************'''
+def RunReplay(i_Cycles, o_DHT, o_ADC, b_Verbose = False):
+  drivers.SetDrivers(o_DHT, o_ADC)
+  with tempfile.TemporaryDirectory() as s_TempDir:
+    s_CacheFile = os.path.join(s_TempDir, "forecast_cache.bin")
+
+    o_Systime     = systime.Systime()
+    o_TempModule  = temperature.TemperatureModule(o_Systime)
+    o_WaterModule = water_lawn.WaterModule(o_Systime, o_TempModule.o_OutdoorTempSensor,
+                                           o_TempModule.o_Snapshot, ReplayForecast(s_CacheFile))
+    # read the sensors once per cycle rather than on their own threads in real
+    # time, so the traces advance with the simulated clock
+    o_TempModule.close()
+    o_WaterModule.o_WaterSensor.stop()
+
+    d_Errors = {}
+    i_WaterToggles = 0
+    f_TempTime_s, f_WaterTime_s, f_MaxCycle_s = 0.0, 0.0, 0.0
+    o_Output = contextlib.nullcontext() if b_Verbose else contextlib.redirect_stdout(io.StringIO())
+    f_Start = time.perf_counter()
+    with o_Output:
+      for i in range(i_Cycles):
+        # every cycle starts with fresh sensor reads, like the 5 second loop
+        o_TempModule.o_Snapshot.Invalidate()
+        i_LastFlag = o_WaterModule.i_WaterFlag
+
+        f_Cycle = time.perf_counter()
+        i_Error = o_TempModule.main()
+        f_Mid = time.perf_counter()
+        if(i_Error == configs.SYSERROR_NO_ERROR):
+          i_Error = o_WaterModule.main()
+        f_End = time.perf_counter()
+
+        f_TempTime_s  += f_Mid - f_Cycle
+        f_WaterTime_s += f_End - f_Mid
+        f_MaxCycle_s   = max(f_MaxCycle_s, f_End - f_Cycle)
+        d_Errors[i_Error] = d_Errors.get(i_Error, 0) + 1
+        if(o_WaterModule.i_WaterFlag != i_LastFlag):
+          i_WaterToggles += 1
+    f_Total_s = time.perf_counter() - f_Start
+
+    return {"i_Cycles":         i_Cycles,
+            "f_Total_s":        f_Total_s,
+            "f_MeanTemp_ms":    1000 * f_TempTime_s / i_Cycles,
+            "f_MeanWater_ms":   1000 * f_WaterTime_s / i_Cycles,
+            "f_MaxCycle_ms":    1000 * f_MaxCycle_s,
+            "f_Speedup":        i_Cycles * configs.f_TempTaskPeriod_s / f_Total_s,
+            "d_Errors":         d_Errors,
+            "i_WaterToggles":   i_WaterToggles,
+            "i_DHTReads":       o_DHT.i_Reads,
+            "i_ADCReads":       o_ADC.i_Reads}
+
+def main():
+  o_Parser = argparse.ArgumentParser(description = "Replay sensor traces through the temperature and water modules.")
+  o_Parser.add_argument("--cycles", type = int, default = 1000, help = "number of 5 second cycles to simulate")
+  o_Parser.add_argument("--dht-trace", help = "CSV with columns pin,humidity,temperature_c")
+  o_Parser.add_argument("--adc-trace", help = "CSV with columns channel,value")
+  o_Parser.add_argument("--failure-rate", type = float, default = 0.05, help = "failed DHT11 reads in synthetic traces")
+  o_Parser.add_argument("--short-rate", type = float, default = 0.01, help = "ADC shorts in synthetic traces")
+  o_Parser.add_argument("--time-scale", type = float, default = 0.0, help = "fraction of real sensor timing to simulate")
+  o_Parser.add_argument("--verbose", action = "store_true", help = "show the modules' output")
+  o_Args = o_Parser.parse_args()
+
+  if(o_Args.dht_trace):
+    d_DHTTraces = drivers.LoadDHTTrace(o_Args.dht_trace)
+  else:
+    d_DHTTraces = {i_Pin: drivers.Trace(drivers.SyntheticDHTSamples(o_Args.cycles, f_FailureRate = o_Args.failure_rate, i_Seed = i_Pin))
+                   for i_Pin in (configs.i_OutdoorSensorPin, configs.i_IndoorSensorPin)}
+  if(o_Args.adc_trace):
+    d_ADCTraces = drivers.LoadADCTrace(o_Args.adc_trace)
+  else:
+    d_ADCTraces = {configs.i_AdcChannel: drivers.Trace(drivers.SyntheticADCSamples(o_Args.cycles, o_Args.short_rate))}
+
+  d_Results = RunReplay(o_Args.cycles,
+                        drivers.SimulatedDHT(d_DHTTraces, o_Args.time_scale),
+                        drivers.SimulatedADC(d_ADCTraces),
+                        o_Args.verbose)
+
+  print("cycles:           %d in %.2f s (%.0fx real time)" % (d_Results["i_Cycles"], d_Results["f_Total_s"], d_Results["f_Speedup"]))
+  print("temperature pass: %.3f ms mean" % d_Results["f_MeanTemp_ms"])
+  print("water pass:       %.3f ms mean" % d_Results["f_MeanWater_ms"])
+  print("slowest cycle:    %.3f ms" % d_Results["f_MaxCycle_ms"])
+  print("sensor reads:     %d DHT11, %d ADC" % (d_Results["i_DHTReads"], d_Results["i_ADCReads"]))
+  print("water toggles:    %d" % d_Results["i_WaterToggles"])
+  for i_Error, i_Count in sorted(d_Results["d_Errors"].items()):
+    print("error code %d:     %d cycles" % (i_Error, i_Count))
+
+if __name__ == "__main__":
+  main()
+
+################################## end file ###################################
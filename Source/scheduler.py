@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: scheduler.py                                                     *
+* Purpose:   Periodic task scheduler for the RPI Smart Home modules.          *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import asyncio  # library for the event loop
+import math     # library for the jitter deviation
+
+# class to describe a single periodic task and track how well it keeps time
+class ScheduledTask:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class ScheduledTask
+  * Parameters:  str   s_Name
+  *                    Name of the task, used in the statistics.
+  *              func  fn_Task
+  *                    Function run once per period. Its return value is
+  *                    handed to fn_OnResult.
+  *              float f_Period_s
+  *                    Time between releases of the task.
+  *              float f_Deadline_s
+  *                    Latency after which a run counts as a deadline miss.
+  *                    Defaults to the period.
+  *              obj   o_Executor
+  *                    Executor to run fn_Task on. None runs it on the
+  *                    event loop itself, which is what tkinter needs.
+  *              func  fn_OnResult
+  *                    Called on the event loop with the task's return
+  *                    value (or None) after every run.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Name, fn_Task, f_Period_s, f_Deadline_s = None,
+               o_Executor = None, fn_OnResult = None):
+    self.s_Name       = s_Name
+    self.fn_Task      = fn_Task
+    self.f_Period_s   = f_Period_s
+    self.f_Deadline_s = f_Deadline_s if f_Deadline_s != None else f_Period_s
+    self.o_Executor   = o_Executor
+    self.fn_OnResult  = fn_OnResult
+
+    # statistics
+    self.i_Runs           = 0
+    self.i_DeadlineMisses = 0
+    self.i_Skipped        = 0   # releases missed because a run overran its period
+    self.i_Exceptions     = 0
+    self.f_LastLatency_s  = 0.0
+    self.f_MaxLatency_s   = 0.0
+    self.f_LatencySum_s   = 0.0
+    self.f_MaxJitter_s    = 0.0
+    self.f_JitterSum_s    = 0.0
+    self.f_JitterSqSum_s  = 0.0
+
+  '''*****************************************************************
+  * Name: RecordRun
+  * Description: Adds one run to the task statistics.
+  * Parameters:  float f_Jitter_s
+  *                    How late the run started relative to its release.
+  *              float f_Latency_s
+  *                    How long the run took.
+  * Returns:     N/A (modifies class members)
+  *****************************************************************'''
+  def RecordRun(self, f_Jitter_s, f_Latency_s):
+    self.i_Runs          += 1
+    self.f_LastLatency_s  = f_Latency_s
+    self.f_MaxLatency_s   = max(self.f_MaxLatency_s, f_Latency_s)
+    self.f_LatencySum_s  += f_Latency_s
+    self.f_MaxJitter_s    = max(self.f_MaxJitter_s, f_Jitter_s)
+    self.f_JitterSum_s   += f_Jitter_s
+    self.f_JitterSqSum_s += f_Jitter_s * f_Jitter_s
+    if(f_Latency_s > self.f_Deadline_s):
+      self.i_DeadlineMisses += 1
+
+  '''*****************************************************************
+  * Name: GetStats
+  * Description: Returns the task statistics.
+  * Parameters:  N/A
+  * Returns:     dict d_Stats
+  *                   Run counts, latency and release jitter in seconds.
+  *****************************************************************'''
+  def GetStats(self):
+    i_Runs = max(self.i_Runs, 1)
+    f_MeanJitter_s = self.f_JitterSum_s / i_Runs
+    f_Variance     = max(0.0, self.f_JitterSqSum_s / i_Runs - f_MeanJitter_s * f_MeanJitter_s)
+    return {"i_Runs":            self.i_Runs,
+            "i_DeadlineMisses":  self.i_DeadlineMisses,
+            "i_Skipped":         self.i_Skipped,
+            "i_Exceptions":      self.i_Exceptions,
+            "f_LastLatency_s":   self.f_LastLatency_s,
+            "f_MeanLatency_s":   self.f_LatencySum_s / i_Runs,
+            "f_MaxLatency_s":    self.f_MaxLatency_s,
+            "f_MeanJitter_s":    f_MeanJitter_s,
+            "f_JitterStdDev_s":  math.sqrt(f_Variance),
+            "f_MaxJitter_s":     self.f_MaxJitter_s}
+
+# class to run a set of periodic tasks on one asyncio event loop. every task
+# has its own release schedule, so a slow task only delays itself.
+class Scheduler:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class Scheduler
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self):
+    self.l_Tasks = []
+
+  '''*****************************************************************
+  * Name: AddTask
+  * Description: Registers a periodic task. Takes the same parameters as
+  *              the ScheduledTask constructor.
+  * Parameters:  see ScheduledTask.__init__
+  * Returns:     obj o_Task
+  *                  The registered task.
+  *****************************************************************'''
+  def AddTask(self, s_Name, fn_Task, f_Period_s, f_Deadline_s = None,
+              o_Executor = None, fn_OnResult = None):
+    o_Task = ScheduledTask(s_Name, fn_Task, f_Period_s, f_Deadline_s,
+                           o_Executor, fn_OnResult)
+    self.l_Tasks.append(o_Task)
+    return o_Task
+
+  '''*****************************************************************
+  * Name: RunTask
+  * Description: Coroutine that releases one task every period until it
+  *              is cancelled. A run that overruns its period skips the
+  *              releases it missed instead of running back to back.
+  * Parameters:  obj o_Task
+  *                  Task to run.
+  * Returns:     N/A
+  *****************************************************************'''
+  async def RunTask(self, o_Task):
+    o_Loop = asyncio.get_running_loop()
+    f_Release = o_Loop.time()
+
+    while True:
+      f_Delay_s = f_Release - o_Loop.time()
+      if(f_Delay_s > 0):
+        await asyncio.sleep(f_Delay_s)
+
+      f_Start = o_Loop.time()
+      try:
+        if(o_Task.o_Executor == None):
+          o_Result = o_Task.fn_Task()
+        else:
+          o_Result = await o_Loop.run_in_executor(o_Task.o_Executor, o_Task.fn_Task)
+      except asyncio.CancelledError:
+        raise
+      except Exception as o_Exception:
+        print("Exception in task %s: %s" % (o_Task.s_Name, o_Exception))
+        o_Task.i_Exceptions += 1
+        o_Result = None
+      f_End = o_Loop.time()
+
+      o_Task.RecordRun(f_Start - f_Release, f_End - f_Start)
+      if(o_Task.fn_OnResult != None):
+        o_Task.fn_OnResult(o_Result)
+
+      # schedule the next release, dropping any that were overrun
+      f_Release += o_Task.f_Period_s
+      if(f_Release < f_End):
+        i_Missed = int((f_End - f_Release) // o_Task.f_Period_s) + 1
+        o_Task.i_Skipped += i_Missed
+        f_Release += i_Missed * o_Task.f_Period_s
+
+  '''*****************************************************************
+  * Name: run
+  * Description: Coroutine that runs every registered task until
+  *              cancelled.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  async def run(self):
+    await asyncio.gather(*[self.RunTask(o_Task) for o_Task in self.l_Tasks])
+
+  '''*****************************************************************
+  * Name: GetStats
+  * Description: Returns the statistics of every task.
+  * Parameters:  N/A
+  * Returns:     dict d_Stats
+  *                   Task statistics keyed by task name.
+  *****************************************************************'''
+  def GetStats(self):
+    return {o_Task.s_Name: o_Task.GetStats() for o_Task in self.l_Tasks}
+
+################################## end file ###################################
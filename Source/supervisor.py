@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: supervisor.py                                                    *
+* Purpose:   Circuit breakers that restart a failing module on its own and    *
+*            back off exponentially while it recovers.                        *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs      # global configs file
+import metrics      # stage timings and counters
+import random       # library for the backoff jitter
+import threading    # library for locking
+import time         # library for the backoff clock
+
+# states of a circuit breaker
+s_Closed   = "closed"     # runs normally
+s_Open     = "open"       # runs are skipped until the backoff expires
+s_HalfOpen = "half_open"  # runs are let through to probe the module
+
+# class to stop calling a module that keeps failing. after i_Failures failures
+# in a row the breaker opens for f_Backoff_s, then lets a probe through. every
+# failed probe doubles the time it stays open, up to f_MaxBackoff_s, and the
+# first success closes it again
+class CircuitBreaker:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class CircuitBreaker
+  * Parameters:  str   s_Name
+  *                    Name of the module, used in the statistics.
+  *              int   i_Failures
+  *                    Failures in a row that open the breaker.
+  *              float f_Backoff_s
+  *                    Time the breaker first stays open.
+  *              float f_MaxBackoff_s
+  *                    Longest time the breaker stays open.
+  *              float f_Jitter
+  *                    Random spread of the open time, as a fraction.
+  *              func  fn_Clock
+  *                    Monotonic clock, in seconds.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Name, i_Failures = configs.i_BreakerFailures,
+               f_Backoff_s = configs.f_BreakerBackoff_s,
+               f_MaxBackoff_s = configs.f_BreakerMaxBackoff_s,
+               f_Jitter = configs.f_BreakerJitter, fn_Clock = time.monotonic):
+    self.s_Name         = s_Name
+    self.i_Failures     = i_Failures
+    self.f_Backoff_s    = f_Backoff_s
+    self.f_MaxBackoff_s = f_MaxBackoff_s
+    self.f_Jitter       = f_Jitter
+    self.fn_Clock       = fn_Clock
+    self.o_Lock         = threading.Lock()
+
+    self.s_State       = s_Closed
+    self.i_InARow      = 0      # failures since the last success
+    self.i_Opens       = 0      # times opened since the last success
+    self.f_OpenUntil   = 0.0
+    self.f_OpenFor_s   = 0.0
+
+    # statistics
+    self.i_Trips   = 0
+    self.i_Skipped = 0
+
+  '''*****************************************************************
+  * Name: allow
+  * Description: Returns whether the module may run now. Once the open
+  *              time has passed the breaker goes half open and lets
+  *              runs through until one succeeds or fails.
+  * Parameters:  N/A
+  * Returns:     bool b_Allowed
+  *****************************************************************'''
+  def allow(self):
+    with self.o_Lock:
+      if(self.s_State == s_Open):
+        if(self.fn_Clock() < self.f_OpenUntil):
+          self.i_Skipped += 1
+          return False
+        self.s_State = s_HalfOpen
+      return True
+
+  '''*****************************************************************
+  * Name: RecordSuccess
+  * Description: Closes the breaker and resets the backoff.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def RecordSuccess(self):
+    with self.o_Lock:
+      self.s_State  = s_Closed
+      self.i_InARow = 0
+      self.i_Opens  = 0
+
+  '''*****************************************************************
+  * Name: RecordFailure
+  * Description: Counts a failure, opening the breaker after too many in
+  *              a row or after a failed probe.
+  * Parameters:  N/A
+  * Returns:     bool b_Opened
+  *                   True if this failure opened the breaker.
+  *****************************************************************'''
+  def RecordFailure(self):
+    with self.o_Lock:
+      self.i_InARow += 1
+      if(self.s_State != s_HalfOpen and self.i_InARow < self.i_Failures):
+        return False
+
+      f_OpenFor_s = min(self.f_MaxBackoff_s, self.f_Backoff_s * 2 ** self.i_Opens)
+      self.f_OpenFor_s = f_OpenFor_s * (1 + random.uniform(-self.f_Jitter, self.f_Jitter))
+      self.f_OpenUntil = self.fn_Clock() + self.f_OpenFor_s
+      self.s_State     = s_Open
+      self.i_Opens    += 1
+      self.i_Trips    += 1
+    metrics.o_BreakerTrips.inc((self.s_Name,))
+    return True
+
+  '''*****************************************************************
+  * Name: GetStats
+  * Description: Returns the state and statistics of the breaker.
+  * Parameters:  N/A
+  * Returns:     dict d_Stats
+  *****************************************************************'''
+  def GetStats(self):
+    with self.o_Lock:
+      return {"s_State":      self.s_State,
+              "i_InARow":     self.i_InARow,
+              "i_Trips":      self.i_Trips,
+              "i_Skipped":    self.i_Skipped,
+              "f_OpenFor_s":  self.f_OpenFor_s,
+              "f_RetryIn_s":  max(0.0, self.f_OpenUntil - self.fn_Clock()) if self.s_State == s_Open else 0.0}
+
+# class to run each module behind its own circuit breaker. a module is judged
+# by the error codes that are its own, so a water pass that fails because the
+# outdoor sensor is down doesn't count against the water module
+class Supervisor:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class Supervisor
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self):
+    self.d_Modules = {}  # name -> (breaker, error codes, restart function)
+
+  '''*****************************************************************
+  * Name: AddModule
+  * Description: Puts a module behind a circuit breaker.
+  * Parameters:  str   s_Name
+  *              tuple t_ErrorCodes
+  *                    Error codes that count as the module failing.
+  *              func  fn_Restart
+  *                    Restarts the module each time its breaker opens.
+  *                    None if there is nothing to restart.
+  * Returns:     obj   o_Breaker
+  *                    The module's CircuitBreaker.
+  *****************************************************************'''
+  def AddModule(self, s_Name, t_ErrorCodes, fn_Restart = None):
+    o_Breaker = CircuitBreaker(s_Name)
+    self.d_Modules[s_Name] = (o_Breaker, t_ErrorCodes, fn_Restart)
+    return o_Breaker
+
+  '''*****************************************************************
+  * Name: Wrap
+  * Description: Returns a task that runs fn_Task behind the module's
+  *              breaker. While the breaker is open the task returns None
+  *              without running, and the module keeps its last good data.
+  * Parameters:  str  s_Name
+  *                   Module the task belongs to.
+  *              func fn_Task
+  *                   Returns an error code.
+  * Returns:     func fn_Supervised
+  *****************************************************************'''
+  def Wrap(self, s_Name, fn_Task):
+    o_Breaker, t_ErrorCodes, fn_Restart = self.d_Modules[s_Name]
+
+    def fn_Supervised():
+      if(not o_Breaker.allow()):
+        return None
+      try:
+        i_Error = fn_Task()
+      except Exception:
+        self.RecordFailure(s_Name)
+        raise
+      if(i_Error in t_ErrorCodes):
+        self.RecordFailure(s_Name)
+      elif(i_Error == configs.SYSERROR_NO_ERROR):
+        o_Breaker.RecordSuccess()
+      return i_Error
+
+    return fn_Supervised
+
+  '''*****************************************************************
+  * Name: RecordFailure
+  * Description: Counts a failure of a module, and restarts the module if
+  *              that opened its breaker.
+  * Parameters:  str s_Name
+  * Returns:     N/A
+  *****************************************************************'''
+  def RecordFailure(self, s_Name):
+    o_Breaker, t_ErrorCodes, fn_Restart = self.d_Modules[s_Name]
+    if(not o_Breaker.RecordFailure()):
+      return
+    d_Stats = o_Breaker.GetStats()
+    print("%s failed %d times in a row, retrying in %.0f s" % (s_Name, d_Stats["i_InARow"], d_Stats["f_OpenFor_s"]))
+    if(fn_Restart != None):
+      metrics.o_ModuleRestarts.inc((s_Name,))
+      try:
+        fn_Restart()
+      except Exception as o_Exception:
+        print("Restarting %s failed: %s" % (s_Name, o_Exception))
+
+  '''*****************************************************************
+  * Name: GetStats
+  * Description: Returns the state of every module's breaker.
+  * Parameters:  N/A
+  * Returns:     dict d_Stats
+  *                   Breaker statistics keyed by module name.
+  *****************************************************************'''
+  def GetStats(self):
+    return {s_Name: t_Module[0].GetStats() for s_Name, t_Module in self.d_Modules.items()}
+
+################################## end file ###################################
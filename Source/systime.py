@@ -16,6 +16,36 @@ __version__ = "1.0.0"
 import configs 
 import datetime
 
+'''*****************************************************************
+* Name: SeasonOf                                                                  
+* Description: Determines the season of a month. When it is not summer,
+*              it is winter.                      
+* Parameters:  int i_Month
+*                  Month, 1 to 12.                    
+* Returns:     int i_Season
+*                  configs.i_SummertimeFlag or configs.i_WintertimeFlag.                    
+*****************************************************************'''
+def SeasonOf(i_Month):
+  if ( i_Month < configs.i_StartSummerMonth or i_Month > configs.i_EndSummerMonth):
+    return configs.i_WintertimeFlag
+  else:
+    return configs.i_SummertimeFlag
+
+'''*****************************************************************
+* Name: TimeFlagOf                                                                  
+* Description: Determines the time of day of an hour. When it is not day,
+*              it is night.                      
+* Parameters:  int i_Hour
+*                  Hour, 0 to 23.                    
+* Returns:     int i_TimeFlag
+*                  configs.i_DaytimeFlag or configs.i_NightFlag.                    
+*****************************************************************'''
+def TimeFlagOf(i_Hour):
+  if(i_Hour > configs.i_NighttimeHour or i_Hour < configs.i_MorningHour):
+    return configs.i_NightFlag
+  else:
+    return configs.i_DaytimeFlag
+
 # class to track the time of day and season
 class Systime:
   '''*****************************************************************
@@ -36,10 +66,7 @@ class Systime:
   *****************************************************************'''
   def DetermineSeason(self):
     self.o_TimeNow = datetime.datetime.now()
-    if ( self.o_TimeNow.month < configs.i_StartSummerMonth or self.o_TimeNow.month > configs.i_EndSummerMonth):
-      self.i_Season = configs.i_WintertimeFlag
-    else:
-      self.i_Season = configs.i_SummertimeFlag
+    self.i_Season = SeasonOf(self.o_TimeNow.month)
 	
   '''*****************************************************************
   * Name: DetermineTime                                                                  
@@ -51,9 +78,6 @@ class Systime:
   def DetermineTime(self):
     self.o_TimeNow = datetime.datetime.now()
     # determine time of day
-    if(self.o_TimeNow.hour > configs.i_NighttimeHour or self.o_TimeNow.hour < configs.i_MorningHour):
-      self.i_TimeFlag = configs.i_NightFlag
-    else:
-      self.i_TimeFlag = configs.i_DaytimeFlag
+    self.i_TimeFlag = TimeFlagOf(self.o_TimeNow.hour)
 
 ################################## end file ###################################
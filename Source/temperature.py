@@ -14,37 +14,434 @@ __version__ = "2.0.0"
 
 # imports
 import configs      # global configs file
-import Adafruit_DHT # library to interface with DHT11 sensor
-import datetime     # library for time capturing
+import drivers      # hardware or simulated DHT11 driver
+import metrics      # timing histograms and counters
 import time 
+import collections        # library for the recent attempts of a sensor
+import threading          # library for the sampler threads and locking the snapshot
 
 
-# this class will read from the temperature sensor and store values read from it
+# this class holds the result of a single sensor read 
+class SensorReading:
+
+  '''*****************************************************************
+  * Name: __init__                                                                  
+  * Description: Constructor for class SensorReading                      
+  * Parameters:  float f_Humidity_Pct
+  *                    Relative humidity, or None if the read failed.
+  *              float f_Temperature_C
+  *                    Temperature in Celsius, or None if the read failed.
+  *              float f_Timestamp
+  *                    Time the read finished (seconds since the epoch).
+  *              int   i_Retries
+  *                    Number of failed attempts before this result.
+  *              float f_Quality
+  *                    Fraction of the sensor's recent attempts that
+  *                    succeeded, 0 to 1.                      
+  * Returns:     N/A                     
+  *****************************************************************'''
+  def __init__(self, f_Humidity_Pct, f_Temperature_C, f_Timestamp, i_Retries, f_Quality = 1.0):
+    self.f_Humidity_Pct  = f_Humidity_Pct
+    self.f_Temperature_C = f_Temperature_C
+    self.f_Timestamp     = f_Timestamp
+    self.i_Retries       = i_Retries
+    self.f_Quality       = f_Quality
+
+# this class will read from the temperature sensor and store values read from it.
+# a sampler thread owns the sensor's pin and reads it at the fastest rate the 
+# DHT11 allows, so callers only ever pick up the last good reading
 class TemperatureSensor:
 	
   '''*****************************************************************
   * Name: __init__                                                                  
   * Description: Constructor for class TemperatureSensor                      
-  * Parameters:  int i_InputGPIOPin                                              
-  *                    GPIO pin on the Pi that the sensor is wired to.                      
+  * Parameters:  int  i_InputGPIOPin                                              
+  *                     GPIO pin on the Pi that the sensor is wired to.
+  *              int  i_FailureCode
+  *                     Error code raised when this sensor can't be read.
+  *              bool b_Background
+  *                     Sample on a background thread. Without it, every
+  *                     read() reads the sensor itself.
+  *              float f_Phase_s
+  *                     Delay before the sampler's first read, so sensors
+  *                     sharing the Pi don't bit-bang at the same moment.                      
   * Returns:     N/A                     
   *****************************************************************'''
-  def __init__(self,i_InputGPIOPin):
-    self.i_SensorType = Adafruit_DHT.DHT11 # type of sensor
+  def __init__(self,i_InputGPIOPin, i_FailureCode = configs.SYSERROR_TEMP_OUTDOOR_SENSOR_FAILURE,
+               b_Background = True, f_Phase_s = 0.0):
+    self.o_Driver     = drivers.GetDHTDriver() # DHT11 driver, real or simulated
     self.i_GPIOPin    = i_InputGPIOPin     # what pin the sensor is connected to
     self.i_ErrorFlag  = configs.SYSERROR_NO_ERROR # shocker! we don't have any errors because we just initialized it
+    self.i_FailureCode = i_FailureCode
+    
+    # nothing has been read yet
+    self.f_Humidity_Pct  = None
+    self.f_Temperature_C = None
+    self.o_LastReading   = None
+    
+    # last good reading published by the sampler, and whether each of the
+    # recent attempts succeeded
+    self.o_GoodReading = None
+    self.o_Attempts    = collections.deque(maxlen = configs.i_DHTQualityWindow)
+    self.o_FirstGood   = threading.Event() # set once the first good reading is published
+    self.f_Phase_s     = f_Phase_s
+    self.b_WarmedUp    = False
+    self.o_Stop        = threading.Event()
+    self.o_Sampler     = None
+    if(b_Background):
+      self.o_Sampler = threading.Thread(target = self.SampleLoop, daemon = True)
+      self.o_Sampler.start()
 	
   '''*****************************************************************
-  * Name: read                                                                  
-  * Description: Function to read from the sensor, and update class members.                      
+  * Name: GetQuality                                                                  
+  * Description: Returns the fraction of recent attempts that succeeded.                      
+  * Parameters:  N/A                     
+  * Returns:     float f_Quality
+  *                    0 to 1, 1 before the first attempt.                 
+  *****************************************************************'''	
+  def GetQuality(self):
+    l_Attempts = list(self.o_Attempts)
+    if(len(l_Attempts) == 0):
+      return 1.0
+    return sum(l_Attempts) / len(l_Attempts)
+	
+  '''*****************************************************************
+  * Name: attempt                                                                  
+  * Description: Makes a single read attempt and records whether it 
+  *              succeeded.                      
+  * Parameters:  N/A                     
+  * Returns:     float f_Humidity_Pct
+  *              float f_Temperature_C
+  *                    Both None if the attempt failed.                 
+  *****************************************************************'''	
+  def attempt(self):
+    with metrics.o_StageSeconds.time(("dht_read",)):
+      f_Humidity_Pct, f_Temperature_C = self.o_Driver.read(self.i_GPIOPin)
+    b_Good = f_Humidity_Pct != None and f_Temperature_C != None
+    self.o_Attempts.append(1 if b_Good else 0)
+    if(not b_Good):
+      metrics.o_SensorRetries.inc((self.i_GPIOPin,))
+    return f_Humidity_Pct, f_Temperature_C
+	
+  '''*****************************************************************
+  * Name: sample                                                                  
+  * Description: Reads the sensor, retrying until a read succeeds, the 
+  *              retries run out or the timeout expires. Only used when
+  *              there is no sampler thread.                      
+  * Parameters:  float f_Timeout_s
+  *                    Time after which no more retries are attempted.                     
+  * Returns:     obj o_Reading
+  *                  SensorReading with the result of the read.                 
+  *****************************************************************'''	
+  def sample(self, f_Timeout_s = configs.f_DHTReadTimeout_s):
+    f_Deadline = time.monotonic() + f_Timeout_s
+    i_Retries = 0
+    while True:
+      f_Humidity_Pct, f_Temperature_C = self.attempt()
+      if(f_Humidity_Pct != None and f_Temperature_C != None):
+        break
+      # give up if another attempt would run past the timeout
+      if(i_Retries + 1 >= configs.i_DHTMaxRetries
+        or time.monotonic() + configs.f_DHTRetryDelay_s > f_Deadline):
+        break
+      i_Retries += 1
+      self.o_Driver.sleep(configs.f_DHTRetryDelay_s)
+    return SensorReading(f_Humidity_Pct, f_Temperature_C, time.time(), i_Retries, self.GetQuality())
+	
+  '''*****************************************************************
+  * Name: SampleLoop                                                                  
+  * Description: Reads the sensor once per f_DHTMinInterval_s until 
+  *              stopped, publishing every good reading. A failed attempt
+  *              is simply retried on the next interval.                      
+  * Parameters:  N/A                     
+  * Returns:     N/A                 
+  *****************************************************************'''	
+  def SampleLoop(self):
+    i_Failures = 0
+    if(self.o_Stop.wait(self.f_Phase_s)):
+      return
+    f_Next = time.monotonic()
+    while not self.o_Stop.is_set():
+      try:
+        f_Humidity_Pct, f_Temperature_C = self.attempt()
+      except Exception as o_Exception:
+        print("Temperature sensor on pin %d failed: %s" % (self.i_GPIOPin, o_Exception))
+        f_Humidity_Pct, f_Temperature_C = None, None
+      
+      if(f_Humidity_Pct != None and f_Temperature_C != None):
+        self.o_GoodReading = SensorReading(f_Humidity_Pct, f_Temperature_C, time.time(),
+                                           i_Failures, self.GetQuality())
+        self.o_FirstGood.set()
+        i_Failures = 0
+      else:
+        i_Failures += 1
+      
+      # the DHT11 returns garbage if it is polled faster than this
+      f_Next = max(f_Next + configs.f_DHTMinInterval_s, time.monotonic())
+      self.o_Stop.wait(f_Next - time.monotonic())
+	
+  '''*****************************************************************
+  * Name: stop                                                                  
+  * Description: Stops the sampler thread. read() reads the sensor 
+  *              itself from then on.                      
+  * Parameters:  N/A                     
+  * Returns:     N/A                 
+  *****************************************************************'''	
+  def stop(self):
+    self.o_Stop.set()
+    if(self.o_Sampler != None):
+      self.o_Sampler.join()
+      self.o_Sampler = None
+	
+  '''*****************************************************************
+  * Name: restart                                                                  
+  * Description: Restarts the sampler with a fresh driver. The last good
+  *              reading is kept, so read() serves it until it ages out.                      
   * Parameters:  N/A                     
+  * Returns:     N/A                 
+  *****************************************************************'''	
+  def restart(self):
+    b_Background = self.o_Sampler != None
+    self.stop()
+    self.o_Driver = drivers.GetDHTDriver()
+    self.o_Attempts.clear()
+    self.o_Stop = threading.Event()
+    if(b_Background):
+      self.o_Sampler = threading.Thread(target = self.SampleLoop, daemon = True)
+      self.o_Sampler.start()
+	
+  '''*****************************************************************
+  * Name: apply                                                                  
+  * Description: Updates the class members from the result of a read.                      
+  * Parameters:  obj o_Reading
+  *                  SensorReading to apply. None marks the sensor as failed.                     
   * Returns:     N/A (modifies class members)                 
   *****************************************************************'''	
-  def read(self):
-    # get new values using the Adafruit library
-    self.f_Humidity_Pct, self.f_Temperature_C = Adafruit_DHT.read_retry(self.i_SensorType, self.i_GPIOPin)
+  def apply(self, o_Reading):
+    self.o_LastReading = o_Reading
+    if(o_Reading == None):
+      self.f_Humidity_Pct, self.f_Temperature_C = None, None
+    else:
+      self.f_Humidity_Pct, self.f_Temperature_C = o_Reading.f_Humidity_Pct, o_Reading.f_Temperature_C
     if(self.f_Temperature_C != None):
       self.f_Temperature_F = (1.8 * self.f_Temperature_C) + 32
+	
+  '''*****************************************************************
+  * Name: read                                                                  
+  * Description: Function to update class members from the sensor. With a
+  *              sampler thread this never touches the pin; the sensor 
+  *              counts as failed once its last good reading is older than
+  *              f_DHTMaxAge_s. Only the very first read waits, for the 
+  *              sampler's first reading.                      
+  * Parameters:  N/A                     
+  * Returns:     N/A (modifies class members)                 
+  *****************************************************************'''	
+  def read(self):
+    if(self.o_Sampler == None):
+      self.apply(self.sample())
+      return
+    
+    if(not self.b_WarmedUp):
+      self.o_FirstGood.wait(configs.f_DHTReadTimeout_s)
+      self.b_WarmedUp = True
+    
+    o_Reading = self.o_GoodReading
+    if(o_Reading == None or time.time() - o_Reading.f_Timestamp > configs.f_DHTMaxAge_s):
+      self.apply(None)
+    else:
+      self.apply(o_Reading)
+
+# this class holds the latest reading of a set of sensors, so every module
+# that needs a sensor within the same cycle shares one read of it
+class SensorSnapshot:
+
+  '''*****************************************************************
+  * Name: __init__                                                                  
+  * Description: Constructor for class SensorSnapshot                      
+  * Parameters:  list  l_Sensors
+  *                    TemperatureSensors covered by the snapshot. Errors
+  *                    are reported in the order of this list.
+  *              float f_MaxAge_s
+  *                    Age after which a reading is read again.                      
+  * Returns:     N/A                     
+  *****************************************************************'''
+  def __init__(self, l_Sensors, f_MaxAge_s = configs.f_SensorMaxAge_s):
+    self.l_Sensors  = l_Sensors
+    self.f_MaxAge_s = f_MaxAge_s
+    self.o_Lock     = threading.Lock()
+    
+    # readings taken before this time are never reused
+    self.f_ValidAfter = 0.0
+  
+  '''*****************************************************************
+  * Name: Invalidate                                                                  
+  * Description: Forces every sensor to be read on the next refresh.                      
+  * Parameters:  N/A                     
+  * Returns:     N/A (modifies class members)                 
+  *****************************************************************'''	
+  def Invalidate(self):
+    self.f_ValidAfter = time.time()
+  
+  '''*****************************************************************
+  * Name: GetAge                                                                  
+  * Description: Returns the age of a sensor's last good reading.                      
+  * Parameters:  obj o_Sensor
+  *                  TemperatureSensor to check.                     
+  * Returns:     float f_Age_s
+  *                    Seconds since the reading, or None if the sensor has
+  *                    no good reading since the last Invalidate.                 
+  *****************************************************************'''	
+  def GetAge(self, o_Sensor):
+    o_Reading = o_Sensor.o_LastReading
+    if(o_Reading == None or o_Reading.f_Temperature_C == None
+      or o_Reading.f_Timestamp < self.f_ValidAfter):
+      return None
+    return max(0.0, time.time() - o_Reading.f_Timestamp)
+  
+  '''*****************************************************************
+  * Name: IsFresh                                                                  
+  * Description: Checks if a sensor's last reading can be reused.                      
+  * Parameters:  obj o_Sensor
+  *                  TemperatureSensor to check.                     
+  * Returns:     bool b_Fresh
+  *                   True if the sensor has a good reading younger than 
+  *                   the max age.                 
+  *****************************************************************'''	
+  def IsFresh(self, o_Sensor):
+    f_Age_s = self.GetAge(o_Sensor)
+    return f_Age_s != None and f_Age_s < self.f_MaxAge_s
+  
+  '''*****************************************************************
+  * Name: Refresh                                                                  
+  * Description: Reads every requested sensor whose reading is too old.
+  *              Sensors with a fresh reading are not touched.                      
+  * Parameters:  list l_Sensors
+  *                   Sensors the caller needs. Defaults to all of them.                     
+  * Returns:     int i_ErrorFlag
+  *                  Error flag raised when a sensor read error occurs.                 
+  *****************************************************************'''	
+  def Refresh(self, l_Sensors = None):
+    if(l_Sensors == None):
+      l_Sensors = self.l_Sensors
+    
+    with self.o_Lock:
+      # only stale sensors are read. with sampler threads a read just picks
+      # up the last good value, so this never waits on a pin
+      l_Reading = [o_Sensor for o_Sensor in l_Sensors if not self.IsFresh(o_Sensor)]
+      metrics.o_CacheRequests.inc(("sensor_snapshot", "hit"), len(l_Sensors) - len(l_Reading))
+      metrics.o_CacheRequests.inc(("sensor_snapshot", "miss"), len(l_Reading))
+      for o_Sensor in l_Reading:
+        o_Sensor.read()
+      
+      # report the first sensor without a good reading
+      for o_Sensor in l_Sensors:
+        if(o_Sensor.f_Temperature_C == None):
+          return o_Sensor.i_FailureCode
+      return configs.SYSERROR_NO_ERROR
+
+'''*****************************************************************
+* Name: DecideHVAC                                                                  
+* Description: The HVAC policy: decides to heat, cool or do nothing from
+*              the outdoor conditions. Pure, so it can be backtested (see
+*              backtest_hvac.py). Temperatures are in the configured units.                      
+* Parameters:  float f_OutdoorTemp
+*              float f_OutdoorHumidity
+*              int   i_Season
+*                    configs.i_SummertimeFlag or configs.i_WintertimeFlag.
+*              int   i_TimeFlag
+*                    configs.i_DaytimeFlag or configs.i_NightFlag.
+*              float f_HeatSetting
+*              float f_CoolSetting
+*              float f_HeatThreshold
+*              float f_CoolThreshold
+*              float f_TemperatureSetback
+*              float f_HumThreshold_Pct
+*                    Policy parameters, the configured ones by default.                     
+* Returns:     int   i_StateFlag
+*                    Flag that indicates whether to heat/cool the system.
+*              float f_Temperature
+*                    Floating point temperature setting.
+*****************************************************************'''
+def DecideHVAC(f_OutdoorTemp, f_OutdoorHumidity, i_Season, i_TimeFlag,
+               f_HeatSetting = configs.f_HeatSetting, f_CoolSetting = configs.f_CoolSetting,
+               f_HeatThreshold = configs.f_HeatThreshold, f_CoolThreshold = configs.f_CoolThreshold,
+               f_TemperatureSetback = configs.f_TemperatureSetback,
+               f_HumThreshold_Pct = configs.f_HumThreshold_Pct):
+  # case 1: external temp less than 65 degrees F (don't care abt. hum.)
+  if(f_OutdoorTemp < f_HeatThreshold):
+    
+    # if its summer, don't do anything
+    if(i_Season == configs.i_SummertimeFlag):
+      return configs.i_DoNothingFlag, f_OutdoorTemp
+    
+    # otherwise, if it is winter
+    else:
+      # if its night, dial down the setting 2 degrees F
+      if (i_TimeFlag == configs.i_NightFlag):
+        f_LocalTempSetting = f_HeatSetting - f_TemperatureSetback
+      # if its day, heat at the normal temperature
+      else:
+        f_LocalTempSetting = f_HeatSetting
+        
+      return configs.i_HeatFlag, f_LocalTempSetting
+    
+  # case 2: "do nothing" state (between 65 and 75)
+  elif(f_OutdoorTemp > f_HeatThreshold and f_OutdoorTemp < f_CoolThreshold):
+      
+    # if low humidity or night, don't do anything
+    if(f_OutdoorHumidity < f_HumThreshold_Pct or i_TimeFlag == configs.i_NightFlag):
+      return configs.i_DoNothingFlag, f_OutdoorTemp
+    
+    # otherwise cool to clear out the humidity
+    else:
+      return configs.i_CoolFlag, (f_OutdoorTemp - f_TemperatureSetback)
+      
+  # case 3: cool state (temperature greater than 75). a temperature of 
+  # exactly f_HeatThreshold also lands here
+  else:
+    f_LocalTempSetting = f_CoolSetting
+  
+    # if its night, increase the set temperature by 2
+    if(i_TimeFlag == configs.i_NightFlag):
+      f_LocalTempSetting += f_TemperatureSetback
+      
+    # if high humidity, decrease the set temperature by 2
+    if(f_OutdoorHumidity > f_HumThreshold_Pct):
+      f_LocalTempSetting -= f_TemperatureSetback
+    
+    return configs.i_CoolFlag, f_LocalTempSetting
+
+# this class holds one indoor zone: its sensor, its settings and the latest
+# decision made for it
+class Zone:
+
+  '''*****************************************************************
+  * Name: __init__                                                                  
+  * Description: Constructor for class Zone                      
+  * Parameters:  str   s_Name
+  *                    Name of the zone.
+  *              obj   o_Sensor
+  *                    TemperatureSensor in the zone.
+  *              float f_HeatSetting
+  *                    Temperature to heat to.
+  *              float f_CoolSetting
+  *                    Temperature to cool to.
+  *              float f_ComfortZoneRange
+  *                    Distance from the setting the zone may drift before
+  *                    the system turns on.                      
+  * Returns:     N/A                     
+  *****************************************************************'''
+  def __init__(self, s_Name, o_Sensor, f_HeatSetting, f_CoolSetting, f_ComfortZoneRange):
+    self.s_Name             = s_Name
+    self.o_Sensor           = o_Sensor
+    self.f_HeatSetting      = f_HeatSetting
+    self.f_CoolSetting      = f_CoolSetting
+    self.f_ComfortZoneRange = f_ComfortZoneRange
+    
+    # no decision has been made yet
+    self.i_HvacStateFlag  = configs.i_DoNothingFlag
+    self.f_SetTemperature = None
+    self.i_HvacState      = configs.i_HvacOff
 
 # this class is the main loop for the temperature module 
 class TemperatureModule:
@@ -52,14 +449,32 @@ class TemperatureModule:
   '''*****************************************************************
   * Name: init                                                                  
   * Description: Function to initialize the main temperature module.                      
-  * Parameters:  obj o_InputSysTime
-  *                  Systime module to determine season and time of day.                     
+  * Parameters:  obj  o_InputSysTime
+  *                   Systime module to determine season and time of day.
+  *              list l_Zones
+  *                   (name, pin, heat setting, cool setting, comfort zone
+  *                   range) of every indoor zone.                     
   * Returns:     N/A (modifies class members)                 
   *****************************************************************'''		
-  def __init__(self, o_InputSysTime):
-    self.o_OutdoorTempSensor = TemperatureSensor(configs.i_OutdoorSensorPin)
-    self.o_IndoorTempSensor  = TemperatureSensor(configs.i_IndoorSensorPin)
+  def __init__(self, o_InputSysTime, l_Zones = configs.l_Zones):
     self.o_SysTime = o_InputSysTime
+    
+    # every sensor samples on its own thread. their first reads are spread 
+    # over one interval so no two bit-bang their pins at the same time
+    f_Spacing_s = configs.f_DHTMinInterval_s / (len(l_Zones) + 1)
+    self.o_OutdoorTempSensor = TemperatureSensor(configs.i_OutdoorSensorPin, configs.SYSERROR_TEMP_OUTDOOR_SENSOR_FAILURE)
+    self.l_Zones = [Zone(s_Name, TemperatureSensor(i_Pin, configs.SYSERROR_TEMP_INDOOR_SENSOR_FAILRUE,
+                                                   f_Phase_s = (i + 1) * f_Spacing_s),
+                         f_HeatSetting, f_CoolSetting, f_ComfortZoneRange)
+                    for i, (s_Name, i_Pin, f_HeatSetting, f_CoolSetting, f_ComfortZoneRange) in enumerate(l_Zones)]
+    
+    # the first zone stands in for the single indoor sensor of older setups
+    self.o_IndoorTempSensor = self.l_Zones[0].o_Sensor
+    
+    # the snapshot is shared with the water module so the outdoor sensor is 
+    # only read once per cycle. sensors are checked for errors in this order
+    self.l_Sensors  = [self.o_OutdoorTempSensor] + [o_Zone.o_Sensor for o_Zone in self.l_Zones]
+    self.o_Snapshot = SensorSnapshot(self.l_Sensors)
   
   '''*****************************************************************
   * Name: ReadSensors                                                                  
@@ -69,88 +484,56 @@ class TemperatureModule:
   *                  Error flag raised when a sensor read error occurs.                 
   *****************************************************************'''	
   def ReadSensors(self):
-    # read the data from the sensors
-    self.o_OutdoorTempSensor.read()
-    self.o_IndoorTempSensor.read()
-    
-    # check here for errors in sensor communication. sensor will return None if
-    # its connection is disconnected
-    if(self.o_OutdoorTempSensor.f_Temperature_C == None):
-      self.i_ErrorFlag = configs.SYSERROR_TEMP_OUTDOOR_SENSOR_FAILURE
-    elif(self.o_IndoorTempSensor.f_Temperature_C == None):
-      self.i_ErrorFlag = configs.SYSERROR_TEMP_OUTDOOR_SENSOR_FAILURE
-    else:
-      self.i_ErrorFlag = configs.SYSERROR_NO_ERROR
+    self.i_ErrorFlag = self.o_Snapshot.Refresh()
     return self.i_ErrorFlag
+  
+  '''*****************************************************************
+  * Name: close                                                                  
+  * Description: Stops the sensors' sampler threads, so a new module can
+  *              take over the pins.                      
+  * Parameters:  N/A                     
+  * Returns:     N/A                 
+  *****************************************************************'''	
+  def close(self):
+    for o_Sensor in self.l_Sensors:
+      o_Sensor.stop()
+      
+  '''*****************************************************************
+  * Name: restart                                                                  
+  * Description: Restarts the sensors. The zones, their decisions and the
+  *              last good readings are kept.                      
+  * Parameters:  N/A                     
+  * Returns:     N/A                 
+  *****************************************************************'''
+  def restart(self):
+    for o_Sensor in self.l_Sensors:
+      o_Sensor.restart()
+    self.o_Snapshot.Invalidate()
       
   '''*****************************************************************
   * Name: MakeHVACDecision                                                                  
   * Description: Makes a decision to cool or warm the house based on
   *              the external temperature of the system. This function
   *              should only be called for the external temperature sensor.                      
-  * Parameters:  N/A                     
+  * Parameters:  float f_HeatSetting
+  *                    Temperature to heat to, the zone's or the default.
+  *              float f_CoolSetting
+  *                    Temperature to cool to, the zone's or the default.                     
   * Returns:     int   i_StateFlag
   *                    Flag that indicates whether to heat/cool the system.
   *              float f_Temperature
   *                    Floating point temperature setting.
   *****************************************************************'''
-  def MakeHVACDecision(self):
-    # get local copies of variables 
-    o_TimeNow             = datetime.datetime.now()
-    f_LocalHeatThreshold  = configs.f_HeatThreshold
-    f_LocalCoolThreshold  = configs.f_CoolThreshold
-    f_LocalHumThresh_Pct  = configs.f_HumThreshold_Pct
-    f_OutdoorHumidity     = self.o_OutdoorTempSensor.f_Humidity_Pct
-    
+  def MakeHVACDecision(self, f_HeatSetting = configs.f_HeatSetting, f_CoolSetting = configs.f_CoolSetting):
     # convert data if metric units are desired 
     if(configs.SW_USE_METRIC_UNITS):
       f_OutdoorTemp = self.o_OutdoorTempSensor.f_Temperature_C
     else:
       f_OutdoorTemp = self.o_OutdoorTempSensor.f_Temperature_F
-      
-    # case 1: external temp less than 65 degrees F (don't care abt. hum.)
-    if(f_OutdoorTemp < f_LocalHeatThreshold):
-      
-      # if its summer, don't do anything
-      if(self.o_SysTime.i_Season == configs.i_SummertimeFlag):
-        return configs.i_DoNothingFlag, f_OutdoorTemp
-      
-      # otherwise, if it is winter
-      else:
-        # if its night, dial down the setting 2 degrees F
-        if (self.o_SysTime.i_TimeFlag == configs.i_NightFlag):
-          f_LocalTempSetting = configs.f_HeatSetting - configs.f_TemperatureSetback
-        # if its day, heat at the normal temperature
-        else:
-          f_LocalTempSetting = configs.f_HeatSetting
-          
-        return configs.i_HeatFlag, f_LocalTempSetting
-      
-    # case 2: "do nothing" state (between 65 and 75)
-    elif(f_OutdoorTemp > f_LocalHeatThreshold and f_OutdoorTemp < f_LocalCoolThreshold):
-        
-      # if low humidity or night, don't do anything
-      if(f_OutdoorHumidity < f_LocalHumThresh_Pct or self.o_SysTime.i_TimeFlag == configs.i_NightFlag):
-        return configs.i_DoNothingFlag, f_OutdoorTemp
-      
-      # otherwise cool to clear out the humidity
-      else:
-        return configs.i_CoolFlag, (f_OutdoorTemp - configs.f_TemperatureSetback)
-        
-    # case 3: cool state (temperature greater than 75)
-    else:
-      f_LocalTempSetting = configs.f_CoolSetting
     
-      # if its night, increase the set temperature by 2
-      if(self.o_SysTime.i_TimeFlag == configs.i_NightFlag):
-        f_LocalTempSetting += configs.f_TemperatureSetback
-        
-      # if high humidity, decrease the set temperature by 2
-      if(f_OutdoorHumidity > f_LocalHumThresh_Pct):
-        f_LocalTempSetting -= configs.f_TemperatureSetback
-      
-      return configs.i_CoolFlag, f_LocalTempSetting
-      
+    return DecideHVAC(f_OutdoorTemp, self.o_OutdoorTempSensor.f_Humidity_Pct,
+                      self.o_SysTime.i_Season, self.o_SysTime.i_TimeFlag,
+                      f_HeatSetting, f_CoolSetting)
   
   '''*****************************************************************
   * Name: ChangeSystemState                                                                  
@@ -174,6 +557,37 @@ class TemperatureModule:
       i_HvacState = configs.i_HvacOff
     
     return i_HvacState
+  
+  '''*****************************************************************
+  * Name: MakeZoneDecisions                                                                  
+  * Description: Decides the setting and on/off state of every zone in 
+  *              one pass. The outdoor conditions pick heating or cooling
+  *              for the whole house; each zone then applies its own 
+  *              settings and comfort range to its own temperature.                      
+  * Parameters:  N/A                     
+  * Returns:     N/A (modifies the zones)                 
+  *****************************************************************'''	
+  def MakeZoneDecisions(self):
+    # zones with the same settings get the same decision, so each distinct
+    # pair of settings only goes through the decision tree once
+    d_Decisions = {}
+    for o_Zone in self.l_Zones:
+      t_Settings = (o_Zone.f_HeatSetting, o_Zone.f_CoolSetting)
+      if(t_Settings not in d_Decisions):
+        d_Decisions[t_Settings] = self.MakeHVACDecision(*t_Settings)
+      o_Zone.i_HvacStateFlag, o_Zone.f_SetTemperature = d_Decisions[t_Settings]
+      
+      # use metric units if desired
+      if(configs.SW_USE_METRIC_UNITS):
+        f_ZoneTemp = o_Zone.o_Sensor.f_Temperature_C
+      else:
+        f_ZoneTemp = o_Zone.o_Sensor.f_Temperature_F
+      
+      # if the zone is outside of its comfort range, turn it on
+      if(abs(f_ZoneTemp - o_Zone.f_SetTemperature) > o_Zone.f_ComfortZoneRange):
+        o_Zone.i_HvacState = configs.i_HvacOn
+      else:
+        o_Zone.i_HvacState = configs.i_HvacOff
    
   '''*****************************************************************
   * Name: main                                                                  
@@ -195,12 +609,19 @@ class TemperatureModule:
     # if the sensors returned no error, run through our decision trees and
     # print some output 
     if(i_Error == configs.SYSERROR_NO_ERROR):
-      self.i_HvacStateFlag, self.f_SetTemperature = self.MakeHVACDecision()
-      self.i_HvacState = self.ChangeSystemState()
+      with metrics.o_StageSeconds.time(("hvac_decision",)):
+        self.MakeZoneDecisions()
+      # the first zone's decision is the module's, as shown on the GUI
+      o_Primary = self.l_Zones[0]
+      self.i_HvacStateFlag, self.f_SetTemperature = o_Primary.i_HvacStateFlag, o_Primary.f_SetTemperature
+      self.i_HvacState = o_Primary.i_HvacState
       print("Flag:" + str(self.i_HvacStateFlag))
       print("Setting:" + str(self.f_SetTemperature))
       print("State:" + str(self.i_HvacState))
       print("Indoor Temp:" +str(self.o_IndoorTempSensor.f_Temperature_F))
+      for o_Zone in self.l_Zones[1:]:
+        print("Zone %s: Temp:%s Setting:%s State:%d" % (o_Zone.s_Name, o_Zone.o_Sensor.f_Temperature_F,
+                                                         o_Zone.f_SetTemperature, o_Zone.i_HvacState))
       print("Outdoor Temp:" +str(self.o_OutdoorTempSensor.f_Temperature_F))
       print("Outdoor Humid:" +str(self.o_OutdoorTempSensor.f_Humidity_Pct))
       print("===================================End Temp Module")
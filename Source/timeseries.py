@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: timeseries.py                                                    *
+* Purpose:   Fixed-size on-disk history of sensor readings.                   *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs  # global configs file
+import array    # library for compact arrays of floats
+import math     # library for the aggregate statistics
+import mmap     # library for memory-mapped files
+import os       # library for file handling
+import struct   # library for packing the file header
+import threading # library for sharing the store between workers
+import time     # library for time capturing
+
+# file layout: a 32 byte header followed by the timestamps of every slot and
+# then the values of every slot, all as little endian doubles. the header
+# holds the total number of appends ever made, so the newest sample is at
+# slot (i_Head - 1) % i_Capacity.
+s_HeaderFormat = "<4sIIIQ8x"
+i_HeaderSize   = struct.calcsize(s_HeaderFormat)
+b_Magic        = b"RPTS"
+i_FileVersion  = 1
+
+# class for a single channel: a ring buffer of (timestamp, value) samples
+# backed by a memory-mapped file, so the history survives restarts
+class RingBuffer:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class RingBuffer. Opens the file, or
+  *              creates it if it is missing or was made with a different
+  *              capacity.
+  * Parameters:  str s_Path
+  *                  Path of the backing file.
+  *              int i_Capacity
+  *                  Number of samples kept before the oldest is overwritten.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Path, i_Capacity):
+    self.s_Path     = s_Path
+    self.i_Capacity = i_Capacity
+    i_FileSize = i_HeaderSize + 16 * i_Capacity
+
+    # reuse the file only if its header matches what we expect
+    b_Valid = False
+    if(os.path.exists(s_Path) and os.path.getsize(s_Path) == i_FileSize):
+      with open(s_Path, "rb") as o_File:
+        t_Header = struct.unpack(s_HeaderFormat, o_File.read(i_HeaderSize))
+      b_Valid = (t_Header[0] == b_Magic and t_Header[1] == i_FileVersion
+                 and t_Header[2] == i_Capacity)
+
+    if(not b_Valid):
+      with open(s_Path, "wb") as o_File:
+        o_File.write(struct.pack(s_HeaderFormat, b_Magic, i_FileVersion, i_Capacity, 0, 0))
+        o_File.truncate(i_FileSize)
+
+    self.o_File = open(s_Path, "r+b")
+    self.o_Map  = mmap.mmap(self.o_File.fileno(), i_FileSize)
+
+    # views of the two columns straight into the mapped file
+    o_View = memoryview(self.o_Map)
+    self.m_Times  = o_View[i_HeaderSize:i_HeaderSize + 8 * i_Capacity].cast("d")
+    self.m_Values = o_View[i_HeaderSize + 8 * i_Capacity:].cast("d")
+    self.i_Head   = struct.unpack(s_HeaderFormat, self.o_Map[:i_HeaderSize])[4]
+
+  '''*****************************************************************
+  * Name: __len__
+  * Description: Returns the number of samples held.
+  * Parameters:  N/A
+  * Returns:     int i_Length
+  *****************************************************************'''
+  def __len__(self):
+    return min(self.i_Head, self.i_Capacity)
+
+  '''*****************************************************************
+  * Name: Slot
+  * Description: Converts a position in time order (0 is the oldest
+  *              sample held) to a slot in the file.
+  * Parameters:  int i_Index
+  *                  Position in time order.
+  * Returns:     int i_Slot
+  *****************************************************************'''
+  def Slot(self, i_Index):
+    return (self.i_Head - len(self) + i_Index) % self.i_Capacity
+
+  '''*****************************************************************
+  * Name: append
+  * Description: Adds a sample, overwriting the oldest one when full.
+  *              Timestamps must not go backwards.
+  * Parameters:  float f_Time
+  *                    Timestamp of the sample (seconds since the epoch).
+  *              float f_Value
+  *                    Value of the sample.
+  * Returns:     N/A
+  *****************************************************************'''
+  def append(self, f_Time, f_Value):
+    if(len(self) > 0 and f_Time < self.m_Times[self.Slot(len(self) - 1)]):
+      raise ValueError("sample at %f is older than the newest sample in %s" % (f_Time, self.s_Path))
+
+    i_Slot = self.i_Head % self.i_Capacity
+    self.m_Times[i_Slot]  = f_Time
+    self.m_Values[i_Slot] = f_Value
+
+    # the head is written last so a crash never exposes a half-written sample
+    self.i_Head += 1
+    struct.pack_into("<Q", self.o_Map, 16, self.i_Head)
+
+  '''*****************************************************************
+  * Name: Bisect
+  * Description: Finds the first sample at or after a time.
+  * Parameters:  float f_Time
+  *                    Time to search for.
+  * Returns:     int i_Index
+  *                  Position in time order, len(self) if every sample is
+  *                  older.
+  *****************************************************************'''
+  def Bisect(self, f_Time):
+    i_Low, i_High = 0, len(self)
+    while(i_Low < i_High):
+      i_Mid = (i_Low + i_High) // 2
+      if(self.m_Times[self.Slot(i_Mid)] < f_Time):
+        i_Low = i_Mid + 1
+      else:
+        i_High = i_Mid
+    return i_Low
+
+  '''*****************************************************************
+  * Name: query
+  * Description: Returns the samples taken in a time range.
+  * Parameters:  float f_Start
+  *                    Start of the range (inclusive).
+  *              float f_End
+  *                    End of the range (exclusive).
+  * Returns:     array a_Times
+  *                    Timestamps of the samples, oldest first.
+  *              array a_Values
+  *                    Values of the samples.
+  *****************************************************************'''
+  def query(self, f_Start, f_End):
+    i_First = self.Bisect(f_Start)
+    i_Last  = self.Bisect(f_End)
+    a_Times, a_Values = array.array("d"), array.array("d")
+    if(i_First >= i_Last):
+      return a_Times, a_Values
+
+    # the range is at most two contiguous runs of slots
+    i_Start = self.Slot(i_First)
+    i_Count = i_Last - i_First
+    i_Run   = min(i_Count, self.i_Capacity - i_Start)
+    for i_From, i_Len in ((i_Start, i_Run), (0, i_Count - i_Run)):
+      if(i_Len > 0):
+        a_Times.frombytes(self.m_Times[i_From:i_From + i_Len].tobytes())
+        a_Values.frombytes(self.m_Values[i_From:i_From + i_Len].tobytes())
+    return a_Times, a_Values
+
+  '''*****************************************************************
+  * Name: latest
+  * Description: Returns the newest sample.
+  * Parameters:  N/A
+  * Returns:     tuple t_Sample
+  *                    (timestamp, value), or None if the buffer is empty.
+  *****************************************************************'''
+  def latest(self):
+    if(len(self) == 0):
+      return None
+    i_Slot = self.Slot(len(self) - 1)
+    return (self.m_Times[i_Slot], self.m_Values[i_Slot])
+
+  '''*****************************************************************
+  * Name: close
+  * Description: Flushes the mapped file to disk and closes it.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def close(self):
+    self.m_Times.release()
+    self.m_Values.release()
+    self.o_Map.flush()
+    self.o_Map.close()
+    self.o_File.close()
+
+# class to hold one ring buffer per named channel in a directory. the sensor
+# tasks append from the hardware worker while scoring queries from the
+# network worker, so every access goes through the store's lock
+class TimeSeriesStore:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class TimeSeriesStore
+  * Parameters:  str s_Directory
+  *                  Directory holding one file per channel.
+  *              int i_Capacity
+  *                  Number of samples kept per channel.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Directory = configs.s_HistoryDirectory,
+               i_Capacity = configs.i_HistoryCapacity):
+    self.s_Directory = s_Directory
+    self.i_Capacity  = i_Capacity
+    self.d_Channels  = {}
+    self.i_Dropped   = 0   # samples skipped because the clock went backwards
+    self.o_Lock      = threading.RLock()
+    os.makedirs(s_Directory, exist_ok = True)
+
+  '''*****************************************************************
+  * Name: GetChannel
+  * Description: Returns the ring buffer of a channel, opening it on first
+  *              use.
+  * Parameters:  str s_Channel
+  *                  Name of the channel, e.g. "outdoor_temp_f".
+  * Returns:     obj o_Buffer
+  *****************************************************************'''
+  def GetChannel(self, s_Channel):
+    with self.o_Lock:
+      if(s_Channel not in self.d_Channels):
+        self.d_Channels[s_Channel] = RingBuffer(os.path.join(self.s_Directory, s_Channel + ".ring"),
+                                                self.i_Capacity)
+      return self.d_Channels[s_Channel]
+
+  '''*****************************************************************
+  * Name: append
+  * Description: Adds a sample to a channel. None values are skipped, and
+  *              so are samples older than the newest one, which happens
+  *              when the clock is set back (the Pi has no RTC).
+  * Parameters:  str   s_Channel
+  *                    Name of the channel.
+  *              float f_Value
+  *                    Value of the sample.
+  *              float f_Time
+  *                    Timestamp of the sample, defaults to now.
+  * Returns:     N/A
+  *****************************************************************'''
+  def append(self, s_Channel, f_Value, f_Time = None):
+    if(f_Value == None):
+      return
+    if(f_Time == None):
+      f_Time = time.time()
+    with self.o_Lock:
+      try:
+        self.GetChannel(s_Channel).append(f_Time, f_Value)
+      except ValueError:
+        self.i_Dropped += 1
+
+  '''*****************************************************************
+  * Name: query
+  * Description: Returns the samples of a channel taken in a time range.
+  * Parameters:  str   s_Channel
+  *                    Name of the channel.
+  *              float f_Start
+  *                    Start of the range (inclusive).
+  *              float f_End
+  *                    End of the range (exclusive), defaults to now.
+  * Returns:     array a_Times
+  *              array a_Values
+  *****************************************************************'''
+  def query(self, s_Channel, f_Start, f_End = None):
+    if(f_End == None):
+      f_End = math.inf
+    with self.o_Lock:
+      return self.GetChannel(s_Channel).query(f_Start, f_End)
+
+  '''*****************************************************************
+  * Name: aggregate
+  * Description: Computes rolling statistics of a channel over the most
+  *              recent window.
+  * Parameters:  str   s_Channel
+  *                    Name of the channel.
+  *              float f_Window_s
+  *                    Length of the window ending now.
+  * Returns:     dict d_Stats
+  *                   Count, min, max, mean and standard deviation of the
+  *                   samples. All but the count are None for an empty
+  *                   window.
+  *****************************************************************'''
+  def aggregate(self, s_Channel, f_Window_s):
+    with self.o_Lock:
+      _, a_Values = self.query(s_Channel, time.time() - f_Window_s)
+    i_Count = len(a_Values)
+    if(i_Count == 0):
+      return {"i_Count": 0, "f_Min": None, "f_Max": None, "f_Mean": None, "f_StdDev": None}
+    f_Mean = math.fsum(a_Values) / i_Count
+    f_Variance = math.fsum((f_Value - f_Mean) ** 2 for f_Value in a_Values) / i_Count
+    return {"i_Count":  i_Count,
+            "f_Min":    min(a_Values),
+            "f_Max":    max(a_Values),
+            "f_Mean":   f_Mean,
+            "f_StdDev": math.sqrt(f_Variance)}
+
+  '''*****************************************************************
+  * Name: close
+  * Description: Flushes and closes every channel.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def close(self):
+    with self.o_Lock:
+      for o_Buffer in self.d_Channels.values():
+        o_Buffer.close()
+      self.d_Channels = {}
+
+################################## end file ###################################
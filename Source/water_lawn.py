@@ -14,101 +14,536 @@ __version__ = "2.0.0"
 
 # imports 
 import configs                # global configs file for the system
-import urllib.request         # library to handle HTTPGet requests
-import json                   # library to handle JSON parsing
-from Adafruit_GPIO import SPI # library for SPI communication
-import Adafruit_MCP3008       # library for decoding the output of the ADC
+import forecast_cache         # TTL cache for API responses
+import forecast_series        # compact storage of the parsed forecast
+import metrics                # timing histograms and counters
+import rain_risk              # rain risk over the hourly forecast
+import temperature            # sensor snapshot shared with the temperature module
+import drivers                # hardware or simulated MCP3008 driver
 import datetime               # library for time capturing
 import time
+import bisect                 # library for keeping the filter window sorted
+import collections            # library for the filter window
+import threading              # library for the background sampler
 
-# class to take in and handle forecast information from the API
+# class to hold one published forecast. a new one is published after every
+# successful fetch and never changed, so readers on other threads always see
+# a whole forecast. the forecast saved on disk is published at startup marked
+# stale, until the first fetch replaces it
+class ForecastSnapshot:
+  __slots__ = ("o_Forecast", "f_FetchTime", "b_Stale")
+
+  '''*****************************************************************
+  * Name: __init__                                                                  
+  * Description: Constructor for class ForecastSnapshot                      
+  * Parameters:  obj   o_Forecast
+  *                    ParsedForecast.
+  *              float f_FetchTime
+  *                    Wall clock time it was fetched at.                    
+  *              bool  b_Stale
+  *                    True if it was loaded from disk rather than fetched
+  *                    by this run.                    
+  * Returns:     N/A                     
+  *****************************************************************'''   
+  def __init__(self, o_Forecast, f_FetchTime, b_Stale = False):
+    self.o_Forecast  = o_Forecast
+    self.f_FetchTime = f_FetchTime
+    self.b_Stale     = b_Stale
+
+  '''*****************************************************************
+  * Name: GetAge                                                                  
+  * Description: Returns the age of the forecast.                      
+  * Parameters:  N/A                    
+  * Returns:     float f_Age_s                     
+  *****************************************************************'''   
+  def GetAge(self):
+    return max(0.0, time.time() - self.f_FetchTime)
+
+# class to take in and handle forecast information from the API. prefetch()
+# fetches and publishes snapshots from a background task; update() only ever
+# reads the latest snapshot
 class Forecast:
   
   '''*****************************************************************
   * Name: __init__                                                                  
-  * Description: Constructor for class Forecast                      
-  * Parameters:  N/A                    
+  * Description: Constructor for class Forecast. Never calls the API;
+  *              the forecast saved on disk is published, marked stale,
+  *              if there is one.                      
+  * Parameters:  str s_CacheFile
+  *                  Path of the on-disk copy of the forecast cache.                    
   * Returns:     N/A                     
   *****************************************************************'''   
-  def __init__(self):
-    # get the API string from the configs file
-    self.s_APILink = configs.s_FullAPI   
-    # make an API request 
-    s_Contents = urllib.request.urlopen(self.s_APILink).read().decode("utf-8") 
-    # dump the return string into a dictionary
-    self.d_ForecastInformation = json.loads(s_Contents)
+  def __init__(self, s_CacheFile = configs.s_ForecastCacheFile):
+    # the weather providers to ask, from the configs file
+    self.l_Providers = configs.l_WeatherProviders
+    # API responses are cached so the main loop doesn't hit the API every cycle
+    self.o_Cache = forecast_cache.ForecastCache(s_CacheFile,
+                                                fn_Encode = forecast_series.ParsedForecast.ToBytes,
+                                                fn_Decode = forecast_series.ForecastFromBytes)
+    # rain risk is only recomputed when the forecast or the hour changes
+    self.o_RainEngine = rain_risk.RainRiskEngine()
+    # the providers keep their connections open between fetches
+    self.o_Providers = None
+    # every fetched forecast is archived here to score it later, if set
+    self.o_Archive = None
+
+    # latest published forecast, and how the prefetches went
+    self.o_Snapshot          = None
+    self.i_Prefetches        = 0
+    self.i_PrefetchFailures  = 0
+    self.f_LastPrefetch_s    = 0.0
+    self.f_MaxPrefetch_s     = 0.0
+    self.f_LastPrefetchStart = None
+    self.i_CacheHits         = 0
+    self.i_CacheMisses       = 0
+    self.Publish()
+    metrics.o_ForecastAge.set_function(self.GetSnapshotAge)
   
   '''*****************************************************************
-  * Name: update                                                                  
-  * Description: Updates the forecast class with a fresh API call.                      
+  * Name: FetchForecast                                                                  
+  * Description: Gets a new forecast from the weather providers, keeping
+  *              only the fields the system uses.                      
+  * Parameters:  N/A                    
+  * Returns:     obj o_Forecast
+  *                  ParsedForecast, or None if the call failed.                     
+  *****************************************************************'''    
+  def FetchForecast(self):
+    # http.client pulls in ssl, so the providers are only created once a 
+    # forecast is actually fetched rather than served from the cache
+    if(self.o_Providers == None or self.o_Providers.l_Config != self.l_Providers):
+      import weather_providers # adapters for each weather API
+      if(self.o_Providers != None):
+        self.o_Providers.close()
+      self.o_Providers = weather_providers.WeatherProviders(self.l_Providers)
+    
+    # make the API requests, every provider's response is parsed into the
+    # same columns
+    with metrics.o_StageSeconds.time(("api_call",)):
+      return self.o_Providers.fetch()
+  
+  '''*****************************************************************
+  * Name: close                                                                  
+  * Description: Closes the connections to the weather providers.                      
+  * Parameters:  N/A                    
+  * Returns:     N/A                     
+  *****************************************************************'''    
+  def close(self):
+    if(self.o_Providers != None):
+      self.o_Providers.close()
+
+  '''*****************************************************************
+  * Name: Publish                                                                  
+  * Description: Publishes the cached forecast as a new snapshot if it is
+  *              not the one already published. It is marked stale if it
+  *              is still the copy loaded from disk, and archived if not.                      
+  * Parameters:  N/A                    
+  * Returns:     N/A (modifies class members)                     
+  *****************************************************************'''    
+  def Publish(self):
+    o_Forecast, f_FetchTime, b_FromDisk = self.o_Cache.GetEntry()
+    o_Snapshot = self.o_Snapshot
+    if(o_Forecast != None and (o_Snapshot == None or o_Snapshot.o_Forecast is not o_Forecast)):
+      self.o_Snapshot = ForecastSnapshot(o_Forecast, f_FetchTime, b_FromDisk)
+      if(self.o_Archive != None and not b_FromDisk):
+        try:
+          self.o_Archive.archive(o_Forecast.o_Hourly, f_FetchTime)
+        except OSError as o_Exception:
+          print("Archiving the forecast failed: %s" % o_Exception)
+
+  '''*****************************************************************
+  * Name: CountCacheLookup                                                                  
+  * Description: Counts a lookup of the cached forecast as a hit if it
+  *              was still fresh, or a miss if it was empty or expired.                      
+  * Parameters:  float f_Age_s
+  *                    Age of the cached forecast, None if there is none.                    
+  * Returns:     bool  b_Hit                     
+  *****************************************************************'''    
+  def CountCacheLookup(self, f_Age_s):
+    if(f_Age_s != None and f_Age_s < self.o_Cache.f_TTL_s):
+      self.i_CacheHits += 1
+      metrics.o_CacheRequests.inc(("forecast", "hit"))
+      return True
+    self.i_CacheMisses += 1
+    metrics.o_CacheRequests.inc(("forecast", "miss"))
+    return False
+
+  '''*****************************************************************
+  * Name: prefetch                                                                  
+  * Description: Fetches a new forecast if the cached one has expired,
+  *              and publishes it. Blocks on the network, so it is meant
+  *              for a background task.                      
+  * Parameters:  N/A                    
+  * Returns:     int i_Error
+  *                  Error flag raised if an expired forecast could not be
+  *                  replaced.                     
+  *****************************************************************'''    
+  def prefetch(self):
+    if(not self.CountCacheLookup(self.o_Cache.GetAge())):
+      self.f_LastPrefetchStart = time.monotonic()
+      f_Start = time.perf_counter()
+      with metrics.o_StageSeconds.time(("forecast_prefetch",)):
+        self.o_Cache.Refresh(self.FetchForecast)
+      self.f_LastPrefetch_s = time.perf_counter() - f_Start
+      self.f_MaxPrefetch_s  = max(self.f_MaxPrefetch_s, self.f_LastPrefetch_s)
+      self.i_Prefetches += 1
+      f_Age_s = self.o_Cache.GetAge()
+      if(f_Age_s == None or f_Age_s >= self.o_Cache.f_TTL_s):
+        self.i_PrefetchFailures += 1
+        self.Publish()
+        return configs.SYSERROR_WL_API_CALL_FAILURE
+    self.Publish()
+    return configs.SYSERROR_NO_ERROR
+
+  '''*****************************************************************
+  * Name: GetSnapshot                                                                  
+  * Description: Returns the latest published forecast, without waiting
+  *              on the network.                      
+  * Parameters:  N/A                    
+  * Returns:     obj o_Snapshot
+  *                  ForecastSnapshot, or None before the first forecast.                     
+  *****************************************************************'''    
+  def GetSnapshot(self):
+    return self.o_Snapshot
+
+  '''*****************************************************************
+  * Name: GetSnapshotAge                                                                  
+  * Description: Returns the age of the latest published forecast.                      
   * Parameters:  N/A                    
+  * Returns:     float f_Age_s
+  *                    None before the first forecast.                     
+  *****************************************************************'''    
+  def GetSnapshotAge(self):
+    o_Snapshot = self.o_Snapshot
+    return o_Snapshot.GetAge() if o_Snapshot != None else None
+
+  '''*****************************************************************
+  * Name: GetStats                                                                  
+  * Description: Returns the prefetch statistics.                      
+  * Parameters:  N/A                    
+  * Returns:     dict d_Stats
+  *                   Prefetch counts, latency, cache hits and misses,
+  *                   the cache and snapshot ages, whether the snapshot
+  *                   is stale, and the statistics of each weather
+  *                   provider.                     
+  *****************************************************************'''    
+  def GetStats(self):
+    return {"i_Prefetches":        self.i_Prefetches,
+            "i_PrefetchFailures":  self.i_PrefetchFailures,
+            "f_LastPrefetch_s":    self.f_LastPrefetch_s,
+            "f_MaxPrefetch_s":     self.f_MaxPrefetch_s,
+            "i_CacheHits":         self.i_CacheHits,
+            "i_CacheMisses":       self.i_CacheMisses,
+            "f_CacheAge_s":        self.o_Cache.GetAge(),
+            "f_SnapshotAge_s":     self.GetSnapshotAge(),
+            "b_SnapshotStale":     self.o_Snapshot != None and self.o_Snapshot.b_Stale,
+            "d_Providers":         self.o_Providers.GetStats() if self.o_Providers != None else {}}
+
+  '''*****************************************************************
+  * Name: update                                                                  
+  * Description: Updates the forecast class from the latest snapshot.                      
+  * Parameters:  bool b_Fetch
+  *                   Prefetch in line if the snapshot has expired, for
+  *                   when no background task does it. At most once per
+  *                   f_ForecastTaskPeriod_s, so a down API isn't called
+  *                   every cycle.                    
   * Returns:     int i_Error
-  *                  Error flag generated by the API call failing.                     
+  *                  Error flag raised if there is no forecast younger
+  *                  than f_ForecastMaxAge_s.                     
   *****************************************************************'''    
-  def update(self):
-    # make an API request 
-    s_Contents = urllib.request.urlopen(self.s_APILink).read().decode("utf-8") 
-    if s_Contents == "":
+  def update(self, b_Fetch = True):
+    # prefetch() counts its own lookup, so only count the snapshot served
+    # here when it isn't called
+    o_Snapshot = self.o_Snapshot
+    if(b_Fetch and (o_Snapshot == None or o_Snapshot.GetAge() >= self.o_Cache.f_TTL_s)
+      and (self.f_LastPrefetchStart == None
+           or time.monotonic() - self.f_LastPrefetchStart >= configs.f_ForecastTaskPeriod_s)):
+      self.prefetch()
+      o_Snapshot = self.o_Snapshot
+    else:
+      self.CountCacheLookup(o_Snapshot.GetAge() if o_Snapshot != None else None)
+
+    if o_Snapshot == None or o_Snapshot.GetAge() >= configs.f_ForecastMaxAge_s:
       return configs.SYSERROR_WL_API_CALL_FAILURE
     else:
-      # dump the return string into a dictionary
-      self.d_ForecastInformation = json.loads(s_Contents)
-      # capture the hourly forecasts for ease of access 
-      self.l_HourlyForecasts = self.d_ForecastInformation["hourly"]["data"]
-      self.l_DailyForecasts  = self.d_ForecastInformation["daily"]["data"]
+      # capture the hourly and daily forecasts for ease of access 
+      self.o_ParsedForecast = o_Snapshot.o_Forecast
+      self.o_Hourly = o_Snapshot.o_Forecast.o_Hourly
+      self.o_Daily  = o_Snapshot.o_Forecast.o_Daily
       self.CheckForRain()
       return configs.SYSERROR_NO_ERROR
   
   '''*****************************************************************
   * Name: CheckForRain                                                                  
-  * Description: Sets a flag if rain is predicted to happen in the next
-  *              twelve hours.                      
+  * Description: Sets a flag if rain is predicted in the watering window
+  *              (the next twelve hours, between i_StartRain and i_EndRain).
+  *              The risk of every window in configs.l_RainWindows is kept
+  *              in d_RainRisk.                      
   * Parameters:  N/A                    
   * Returns:     N/A                     
   *****************************************************************'''   
   def CheckForRain(self):
+    self.d_RainRisk = self.o_RainEngine.Evaluate(self.o_ParsedForecast)
+    self.i_Rain = self.d_RainRisk[configs.l_RainWindows[0][0]].i_Rain
+
+# class to hold one filtered value of the moisture sensor. a new one is
+# published after every batch, so readers never see a half updated value
+class MoistureEstimate:
+  __slots__ = ("f_Level_Pct", "f_Median_Pct", "f_Variance", "i_Samples",
+               "f_ShortFraction", "f_Timestamp")
+
+  '''*****************************************************************
+  * Name: __init__                                                                  
+  * Description: Constructor for class MoistureEstimate                      
+  * Parameters:  float f_Level_Pct
+  *                    Trimmed mean of the window, in percent. None when
+  *                    the window is all shorts, as are the two below.
+  *              float f_Median_Pct
+  *                    Median of the window, in percent.
+  *              float f_Variance
+  *                    Variance of the window, in percent squared.
+  *              int   i_Samples
+  *                    Good reads in the window.
+  *              float f_ShortFraction
+  *                    Fraction of the window that read as a short.
+  *              float f_Timestamp
+  *                    time.time() of the batch the estimate ends with.
+  * Returns:     N/A                     
+  *****************************************************************'''  
+  def __init__(self, f_Level_Pct, f_Median_Pct, f_Variance, i_Samples,
+               f_ShortFraction, f_Timestamp):
+    self.f_Level_Pct     = f_Level_Pct
+    self.f_Median_Pct    = f_Median_Pct
+    self.f_Variance      = f_Variance
+    self.i_Samples       = i_Samples
+    self.f_ShortFraction = f_ShortFraction
+    self.f_Timestamp     = f_Timestamp
+
+# class to oversample the ADC and filter the reads over a sliding window.
+# the window is kept both in arrival order (to know what to drop) and sorted
+# (for the median and trimmed mean), with running sums for the variance
+class MoistureFilter:
+
+  '''*****************************************************************
+  * Name: __init__                                                                  
+  * Description: Constructor for class MoistureFilter                      
+  * Parameters:  int   i_Window
+  *                    Number of reads the filter runs over.
+  *              float f_TrimFraction
+  *                    Fraction dropped at each end for the trimmed mean.
+  * Returns:     N/A                     
+  *****************************************************************'''  
+  def __init__(self, i_Window = configs.i_WaterSampleWindow,
+               f_TrimFraction = configs.f_WaterTrimFraction):
+    self.i_Window       = i_Window
+    self.f_TrimFraction = f_TrimFraction
+    self.o_Window       = collections.deque() # raw reads, None for a short
+    self.l_Sorted       = []                  # good reads, sorted
+    self.i_Shorts       = 0
+    self.f_Sum          = 0.0
+    self.f_SumSquares   = 0.0
+  
+  '''*****************************************************************
+  * Name: push                                                                  
+  * Description: Adds one read to the window, dropping the oldest read
+  *              once the window is full.
+  * Parameters:  int i_DigitalValue
+  *                  Raw ADC value.
+  * Returns:     N/A                     
+  *****************************************************************'''  
+  def push(self, i_DigitalValue):
+    # a short is detected if we get max current across the sensor probes
+    if(i_DigitalValue == configs.i_WaterSensorScalar):
+      self.o_Window.append(None)
+      self.i_Shorts += 1
+    else:
+      f_Value = 100 * (i_DigitalValue / configs.i_WaterSensorScalar)
+      self.o_Window.append(f_Value)
+      bisect.insort(self.l_Sorted, f_Value)
+      self.f_Sum        += f_Value
+      self.f_SumSquares += f_Value * f_Value
     
-    self.i_Rain = 1
-    for each_forecast in self.l_HourlyForecasts:
-      if(each_forecast["precipProbability"] > 0.40):
-        self.i_Rain = 1
-        return
-    self.i_Rain = 0
+    if(len(self.o_Window) > self.i_Window):
+      f_Oldest = self.o_Window.popleft()
+      if(f_Oldest == None):
+        self.i_Shorts -= 1
+      else:
+        del self.l_Sorted[bisect.bisect_left(self.l_Sorted, f_Oldest)]
+        self.f_Sum        -= f_Oldest
+        self.f_SumSquares -= f_Oldest * f_Oldest
+  
+  '''*****************************************************************
+  * Name: estimate                                                                  
+  * Description: Computes the filtered value of the window.
+  * Parameters:  N/A                    
+  * Returns:     obj o_Estimate
+  *                  MoistureEstimate, or None if the window is empty.                    
+  *****************************************************************'''  
+  def estimate(self):
+    if(len(self.o_Window) == 0):
+      return None
+    f_ShortFraction = self.i_Shorts / len(self.o_Window)
+    i_Samples = len(self.l_Sorted)
+    if(i_Samples == 0):
+      return MoistureEstimate(None, None, None, 0, f_ShortFraction, time.time())
+    
+    i_Trim = int(i_Samples * self.f_TrimFraction)
+    l_Kept = self.l_Sorted[i_Trim:i_Samples - i_Trim]
+    i_Middle = i_Samples // 2
+    if(i_Samples % 2 == 1):
+      f_Median = self.l_Sorted[i_Middle]
+    else:
+      f_Median = (self.l_Sorted[i_Middle - 1] + self.l_Sorted[i_Middle]) / 2
+    f_Mean = self.f_Sum / i_Samples
+    # the running sums drift a little below zero when the window is flat
+    f_Variance = max(0.0, self.f_SumSquares / i_Samples - f_Mean * f_Mean)
+    
+    return MoistureEstimate(sum(l_Kept) / len(l_Kept), f_Median, f_Variance, i_Samples,
+                            f_ShortFraction, time.time())
 
 # class to handle the water sensor component    
 class WaterSensor:
     
   '''*****************************************************************
   * Name: __init__                                                                  
-  * Description: Constructor for class WaterSensor. Sets up SPI device                      
-  * Parameters:  N/A                    
+  * Description: Constructor for class WaterSensor. Sets up SPI device
+  *              and starts sampling it in the background.                      
+  * Parameters:  bool b_Background
+  *                   Sample on a background thread. Without it, every
+  *                   read() samples one batch itself.                    
   * Returns:     N/A                     
   *****************************************************************'''  
-  def __init__(self):
-    self.o_AdcDevice = Adafruit_MCP3008.MCP3008(spi=SPI.SpiDev(configs.i_SPIDevice, configs.i_SPIPort))
+  def __init__(self, b_Background = True):
+    self.o_AdcDevice = drivers.GetADCDriver()
+    self.o_Filter    = MoistureFilter()
+    self.o_Estimate  = None
+    self.o_Stop      = threading.Event()
+    self.o_Sampler   = None
+    if(b_Background):
+      self.o_Sampler = threading.Thread(target = self.SampleLoop, daemon = True)
+      self.o_Sampler.start()
+  
+  '''*****************************************************************
+  * Name: SampleBatch                                                                  
+  * Description: Reads a batch from the ADC back to back, adds it to the
+  *              filter and publishes the new estimate.
+  * Parameters:  N/A                    
+  * Returns:     N/A (modifies class members)                    
+  *****************************************************************'''  
+  def SampleBatch(self):
+    with metrics.o_StageSeconds.time(("adc_batch",)):
+      l_Batch = [self.o_AdcDevice.read_adc_difference(configs.i_AdcChannel)
+                 for i in range(configs.i_WaterSampleBatch)]
+    for i_DigitalValue in l_Batch:
+      self.o_Filter.push(i_DigitalValue)
+    self.o_Estimate = self.o_Filter.estimate()
+  
+  '''*****************************************************************
+  * Name: SampleLoop                                                                  
+  * Description: Samples a batch at the configured rate until stopped.
+  * Parameters:  N/A                    
+  * Returns:     N/A                    
+  *****************************************************************'''  
+  def SampleLoop(self):
+    f_Period_s = configs.i_WaterSampleBatch / configs.f_WaterSampleRate_Hz
+    f_Next = time.monotonic()
+    while not self.o_Stop.is_set():
+      try:
+        self.SampleBatch()
+      except Exception as o_Exception:
+        # keep sampling, a stale estimate is reported by read()
+        print("Water sensor sampling failed: %s" % o_Exception)
+      f_Next = max(f_Next + f_Period_s, time.monotonic())
+      self.o_Stop.wait(f_Next - time.monotonic())
+  
+  '''*****************************************************************
+  * Name: stop                                                                  
+  * Description: Stops the background sampler. read() samples a batch
+  *              itself from then on.
+  * Parameters:  N/A                    
+  * Returns:     N/A                    
+  *****************************************************************'''  
+  def stop(self):
+    self.o_Stop.set()
+    if(self.o_Sampler != None):
+      self.o_Sampler.join()
+      self.o_Sampler = None
+  
+  '''*****************************************************************
+  * Name: restart                                                                  
+  * Description: Restarts sampling with a fresh ADC driver and an empty
+  *              filter. The last published level is kept.
+  * Parameters:  N/A                    
+  * Returns:     N/A                    
+  *****************************************************************'''  
+  def restart(self):
+    b_Background = self.o_Sampler != None
+    self.stop()
+    self.o_AdcDevice = drivers.GetADCDriver()
+    self.o_Filter    = MoistureFilter()
+    self.o_Stop      = threading.Event()
+    if(b_Background):
+      self.o_Sampler = threading.Thread(target = self.SampleLoop, daemon = True)
+      self.o_Sampler.start()
   
   '''*****************************************************************
   * Name: read                                                                  
-  * Description: Reads data from the ADC SPI bus. If a short is detected,
-  *              it raises an error flag.                       
+  * Description: Updates the moisture level from the latest filtered
+  *              value, without touching the SPI bus. If most of the 
+  *              window is shorts, it raises an error flag.                       
   * Parameters:  N/A                    
   * Returns:     int i_Error
-  *                  Error flag raised if a short is detected.                    
+  *                  Error flag raised if a short is detected or the
+  *                  sampler has stalled.                    
   *****************************************************************'''    
   def read(self):
-      
-    # first get the digital value from the ADC  
-    i_DigitalValue = self.o_AdcDevice.read_adc_difference(configs.i_AdcChannel)
+    if(self.o_Sampler == None):
+      self.SampleBatch()
     
-    # a short is detected if we get max current across the sensor probes
-    if(i_DigitalValue == configs.i_WaterSensorScalar):
+    o_Estimate = self.o_Estimate
+    if(o_Estimate == None or time.time() - o_Estimate.f_Timestamp > configs.f_WaterMaxAge_s):
+      return configs.SYSERROR_WL_MOISTURE_SENSOR_FAILURE
+    
+    # a short is detected if most of the window read max current
+    if(o_Estimate.f_ShortFraction >= configs.f_WaterShortFraction):
       return configs.SYSERROR_WL_MOISTURE_SENSOR_FAILURE
       
-    # otherwise, scale the ADC value into a percentage
+    # otherwise, publish the filtered value
     else:
-      self.f_WaterLevel_Pct = 100 * (i_DigitalValue / configs.i_WaterSensorScalar)
+      self.f_WaterLevel_Pct = o_Estimate.f_Level_Pct
+      self.f_WaterVariance  = o_Estimate.f_Variance
       return configs.SYSERROR_NO_ERROR
 
+'''*****************************************************************
+* Name: DecideWatering
+* Description: One step of the sprinkler's hysteresis: start watering
+*              below the wilt point, stop above the field capacity, and
+*              never water below 40 F or when rain is forecast. Kept free
+*              of sensors so the irrigation backtester can run it offline.
+* Parameters:  int   i_WaterFlag
+*                    1 if the sprinkler is on now.
+*              float f_Moisture_Pct
+*                    Soil moisture.
+*              float f_OutdoorTemp_F
+*              int   i_Rain
+*                    1 if rain is forecast in the watering window.
+*              float f_Wilt
+*              float f_Capacity
+* Returns:     int   i_WaterFlag
+*                    1 if the sprinkler should be on.
+*****************************************************************'''
+def DecideWatering(i_WaterFlag, f_Moisture_Pct, f_OutdoorTemp_F, i_Rain,
+                   f_Wilt = configs.f_Wilt, f_Capacity = configs.f_Capacity):
+  # if the temperature is below 40 F or rain is forecasted, do not water
+  if f_OutdoorTemp_F < 40 or i_Rain == 1:
+    return 0
+  # if we are currently watering and the soil is too wet, stop watering
+  elif i_WaterFlag == 1:
+    return 0 if f_Moisture_Pct > f_Capacity else 1
+  # if we are not currently watering and the soil is dry, start watering
+  elif f_Moisture_Pct < f_Wilt:
+    return 1
+  return i_WaterFlag
+
 # class to act as main loop for the water module      
 class WaterModule:
     
@@ -118,13 +553,29 @@ class WaterModule:
   * Parameters:  obj o_InputSysTime
   *                  Systime object shared between modules.
   *              obj o_OutdoorTemperatureSensor
-  *                  Outdoor temperature sensor from the temperature module.                   
+  *                  Outdoor temperature sensor from the temperature module.
+  *              obj o_SensorSnapshot
+  *                  Sensor snapshot from the temperature module that covers
+  *                  the outdoor sensor.
+  *              obj o_Forecast
+  *                  Forecast to use, a new one by default.                   
+  *              bool b_FetchForecast
+  *                   Let the watering decision fetch an expired forecast.
+  *                   Turn it off when another task keeps the forecast
+  *                   fresh, so a down API isn't called every cycle.
   * Returns:     N/A                     
   *****************************************************************'''  
-  def __init__(self, o_InputSysTime, o_OutdoorTemperatureSensor):
+  def __init__(self, o_InputSysTime, o_OutdoorTemperatureSensor, o_SensorSnapshot = None,
+               o_Forecast = None, b_FetchForecast = True):
     self.o_WaterSensor = WaterSensor()
-    self.o_Forecast = Forecast()
+    self.o_Forecast = o_Forecast if o_Forecast != None else Forecast()
+    self.b_FetchForecast = b_FetchForecast
     self.o_OutdoorTempSensor = o_OutdoorTemperatureSensor
+    # share the temperature module's snapshot when given one, so the outdoor
+    # sensor isn't read twice in the same cycle
+    if(o_SensorSnapshot == None):
+      o_SensorSnapshot = temperature.SensorSnapshot([o_OutdoorTemperatureSensor])
+    self.o_SensorSnapshot = o_SensorSnapshot
     self.o_SysTime = o_InputSysTime
     self.i_WaterFlag = 0
     self.f_SoilMoistureWilt = configs.f_Wilt
@@ -132,8 +583,8 @@ class WaterModule:
   
   '''*****************************************************************
   * Name: ReadSensors                                                                  
-  * Description: Reads fresh data from both the outdoor temp sensor and the
-  *              water sensor.                      
+  * Description: Reads fresh data from the water sensor and makes sure the
+  *              outdoor temp sensor reading is current.                      
   * Parameters:  N/A                    
   * Returns:     int i_Error
   *                  Error code raised by system.                  
@@ -144,15 +595,10 @@ class WaterModule:
     if(i_Error != configs.SYSERROR_NO_ERROR):
       return i_Error
     
-    # read from the outdoor temperature sensor, if an error, return  
-    self.o_OutdoorTempSensor.read()
-    if(self.o_OutdoorTempSensor.f_Temperature_C == None):
-      i_Error = configs.SYSERROR_TEMP_OUTDOOR_SENSOR_FAILURE
-      return i_Error
-
-    # otherwise, return no error
-    else:
-      return i_Error
+    # get the outdoor temperature from the snapshot, which only reads the 
+    # sensor if the temperature module hasn't just done so. if an error, return
+    i_Error = self.o_SensorSnapshot.Refresh([self.o_OutdoorTempSensor])
+    return i_Error
     
   '''*****************************************************************
   * Name: MakeWateringDecision                                                                  
@@ -164,28 +610,16 @@ class WaterModule:
   *****************************************************************'''   
   def MakeWateringDecision(self):
     #get refreshed values
-    i_Error = self.o_Forecast.update()
+    i_Error = self.o_Forecast.update(self.b_FetchForecast)
     
     if(i_Error == configs.SYSERROR_NO_ERROR):
-      # if the temperature is below 40 F or rain is forecasted, do not water 
-      if self.o_OutdoorTempSensor.f_Temperature_F < 40 or self.o_Forecast.i_Rain == 1:
-        self.i_WaterFlag = 0
-      
-      # otherwise if we are currently watering
-      elif self.i_WaterFlag == 1 and datetime.datetime.now() >= self.o_LastWaterTime:
-        
-        # if the soil is too wet, stop watering
-        if self.o_WaterSensor.f_WaterLevel_Pct > self.f_SoilMoistureCapacity:
-          self.i_WaterFlag = 0
-        # otherwise, update the timestamp
-        else:
+      with metrics.o_StageSeconds.time(("watering_decision",)):
+        self.i_WaterFlag = DecideWatering(self.i_WaterFlag, self.o_WaterSensor.f_WaterLevel_Pct,
+                                          self.o_OutdoorTempSensor.f_Temperature_F, self.o_Forecast.i_Rain,
+                                          self.f_SoilMoistureWilt, self.f_SoilMoistureCapacity)
+        # keep the time the sprinkler was last on
+        if(self.i_WaterFlag == 1):
           self.o_LastWaterTime = datetime.datetime.now()
-      # if we are not currently watering
-      elif self.i_WaterFlag == 0:
-        # if the soil is dry, start watering
-        if self.o_WaterSensor.f_WaterLevel_Pct < self.f_SoilMoistureWilt:
-          self.i_WaterFlag = 1
-          self.o_LastWaterTime = datetime.datetime.now()  
       # return with no error
       return configs.SYSERROR_NO_ERROR
     # otherwise, return the error
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: weather_client.py                                                *
+* Purpose:   HTTP client for the weather API that keeps its connection        *
+*            open, enforces timeouts and asks for compressed responses.       *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs        # global configs file
+import gzip           # library for gzip responses
+import http.client    # library for persistent HTTP connections
+import threading      # library for locking the connection
+import time           # library for timing
+import urllib.parse   # library for splitting the API URL
+import zlib           # library for deflate responses
+
+'''*****************************************************************
+* Name: AddQuery
+* Description: Adds a parameter to the query of a URL path.
+* Parameters:  str s_Path
+*                  Path, with or without a query.
+*              str s_Name
+*              str s_Value
+* Returns:     str s_Path
+*****************************************************************'''
+def AddQuery(s_Path, s_Name, s_Value):
+  s_Separator = "&" if "?" in s_Path else "?"
+  return s_Path + s_Separator + urllib.parse.urlencode({s_Name: s_Value}, safe = ",")
+
+'''*****************************************************************
+* Name: Decode
+* Description: Undoes the content encoding of a response body.
+* Parameters:  bytes  b_Body
+*              str    s_Encoding
+*                     Content-Encoding header, "" if there was none.
+* Returns:     bytes  b_Body
+*****************************************************************'''
+def Decode(b_Body, s_Encoding):
+  s_Encoding = s_Encoding.strip().lower()
+  try:
+    if(s_Encoding == "gzip"):
+      return gzip.decompress(b_Body)
+    if(s_Encoding == "deflate"):
+      # servers disagree on whether deflate has the zlib header
+      try:
+        return zlib.decompress(b_Body)
+      except zlib.error:
+        return zlib.decompress(b_Body, -zlib.MAX_WBITS)
+  except (zlib.error, EOFError) as o_Exception:
+    raise OSError("bad %s response: %s" % (s_Encoding, o_Exception))
+  if(s_Encoding not in ("", "identity")):
+    raise OSError("unsupported content encoding %s" % s_Encoding)
+  return b_Body
+
+# class to fetch the forecast over one kept-alive connection. the connection
+# is opened on the first request and reused until the server closes it
+class WeatherClient:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class WeatherClient. Does not connect.
+  * Parameters:  str   s_URL
+  *                    Forecast URL, http or https.
+  *              float f_ConnectTimeout_s
+  *                    Longest wait for the connection to open.
+  *              float f_ReadTimeout_s
+  *                    Longest the response may stall.
+  *              str   s_Exclude
+  *                    Blocks of the response to leave out, "" for none.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_URL = configs.s_FullAPI, f_ConnectTimeout_s = configs.f_ApiConnectTimeout_s,
+               f_ReadTimeout_s = configs.f_ApiReadTimeout_s, s_Exclude = configs.s_ApiExclude):
+    self.s_URL              = s_URL
+    self.f_ConnectTimeout_s = f_ConnectTimeout_s
+    self.f_ReadTimeout_s    = f_ReadTimeout_s
+
+    o_URL = urllib.parse.urlsplit(s_URL)
+    self.b_HTTPS = o_URL.scheme == "https"
+    self.s_Host  = o_URL.hostname
+    self.i_Port  = o_URL.port
+    self.s_Path  = (o_URL.path or "/") + ("?" + o_URL.query if o_URL.query else "")
+    if(s_Exclude):
+      self.s_Path = AddQuery(self.s_Path, "exclude", s_Exclude)
+
+    self.o_Connection = None
+    self.o_Lock       = threading.Lock()
+
+    # statistics
+    self.i_Requests      = 0
+    self.i_Connections   = 0
+    self.i_BytesReceived = 0   # as sent, compressed
+    self.i_BytesDecoded  = 0
+    self.f_LastLatency_s = 0.0
+
+  '''*****************************************************************
+  * Name: Connect
+  * Description: Opens a new connection. The connect timeout only covers
+  *              opening it; reads get the read timeout.
+  * Parameters:  N/A
+  * Returns:     N/A (modifies class members)
+  *****************************************************************'''
+  def Connect(self):
+    if(self.b_HTTPS):
+      o_Connection = http.client.HTTPSConnection(self.s_Host, self.i_Port, timeout = self.f_ConnectTimeout_s)
+    else:
+      o_Connection = http.client.HTTPConnection(self.s_Host, self.i_Port, timeout = self.f_ConnectTimeout_s)
+    o_Connection.connect()
+    o_Connection.sock.settimeout(self.f_ReadTimeout_s)
+    self.o_Connection = o_Connection
+    self.i_Connections += 1
+
+  '''*****************************************************************
+  * Name: Request
+  * Description: Makes one request on the open connection.
+  * Parameters:  N/A
+  * Returns:     bytes b_Body
+  *                    Decoded response body.
+  *****************************************************************'''
+  def Request(self):
+    self.o_Connection.request("GET", self.s_Path, headers = {"Accept-Encoding": "gzip, deflate",
+                                                             "Accept": "application/json"})
+    o_Response = self.o_Connection.getresponse()
+    b_Body = o_Response.read()
+    if(o_Response.will_close):
+      self.close()
+    if(o_Response.status != 200):
+      raise OSError("HTTP %d %s" % (o_Response.status, o_Response.reason))
+    self.i_BytesReceived += len(b_Body)
+    b_Body = Decode(b_Body, o_Response.getheader("Content-Encoding", ""))
+    self.i_BytesDecoded += len(b_Body)
+    return b_Body
+
+  '''*****************************************************************
+  * Name: get
+  * Description: Fetches the forecast. A kept-alive connection the server
+  *              has dropped in the meantime is reopened and the request
+  *              retried once.
+  * Parameters:  N/A
+  * Returns:     bytes b_Body
+  *                    Decoded response body.
+  * Raises:      OSError if the request failed or timed out.
+  *****************************************************************'''
+  def get(self):
+    with self.o_Lock:
+      f_Start = time.perf_counter()
+      self.i_Requests += 1
+      try:
+        b_Reused = self.o_Connection != None
+        if(not b_Reused):
+          self.Connect()
+        try:
+          b_Body = self.Request()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+          if(not b_Reused):
+            raise
+          self.close()
+          self.Connect()
+          b_Body = self.Request()
+      except http.client.HTTPException as o_Exception:
+        self.close()
+        raise OSError("bad response: %r" % o_Exception)
+      except OSError:
+        self.close()
+        raise
+      finally:
+        self.f_LastLatency_s = time.perf_counter() - f_Start
+      return b_Body
+
+  '''*****************************************************************
+  * Name: close
+  * Description: Closes the connection, if open.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def close(self):
+    if(self.o_Connection != None):
+      self.o_Connection.close()
+      self.o_Connection = None
+
+  '''*****************************************************************
+  * Name: GetStats
+  * Description: Returns the client statistics.
+  * Parameters:  N/A
+  * Returns:     dict d_Stats
+  *****************************************************************'''
+  def GetStats(self):
+    return {"i_Requests":      self.i_Requests,
+            "i_Connections":   self.i_Connections,
+            "i_BytesReceived": self.i_BytesReceived,
+            "i_BytesDecoded":  self.i_BytesDecoded,
+            "f_LastLatency_s": self.f_LastLatency_s}
+
+################################## end file ###################################
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''****************************************************************************
+* File Name: weather_providers.py                                             *
+* Purpose:   Adapters that turn the responses of different weather APIs into  *
+*            one parsed forecast, with a request budget per API and hedged    *
+*            requests to the next API when the first is slow.                 *
+* Date:      10/18/2026                                                       *
+* Copyright © 2019 Darren Cicala and Tyler Skene. All rights reserved.        *
+* Powered by the DarkSky API.                                                 *
+****************************************************************************'''
+
+# document version
+__version__ = "1.0.0"
+
+# imports
+import configs             # global configs file
+import forecast_series     # the parsed forecast every provider is turned into
+import metrics             # timing histograms and counters
+import weather_client      # keep-alive HTTP client
+import concurrent.futures  # library for running requests side by side
+import json                # library to handle JSON parsing
+import sys                 # library for interning the icon names
+import threading           # library for locking the budget
+import time                # library for timing
+
+# class to spread the requests to a provider so they stay under its quota. a
+# token bucket: up to i_Burst requests may go out back to back, after that one
+# token comes back every f_Period_s / (i_Quota - i_Burst) seconds. no window of
+# f_Period_s can then hold more than i_Quota requests
+class RequestBudget:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class RequestBudget, starts full.
+  * Parameters:  int   i_Quota
+  *                    Requests the provider allows per period.
+  *              float f_Period_s
+  *                    Length of the quota period.
+  *              int   i_Burst
+  *                    Requests that may go out back to back.
+  *              func  fn_Clock
+  *                    Monotonic clock, in seconds.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, i_Quota, f_Period_s, i_Burst = configs.i_ProviderBurst, fn_Clock = time.monotonic):
+    self.i_Quota    = i_Quota
+    self.f_Period_s = f_Period_s
+    self.i_Burst    = max(1, min(i_Burst, i_Quota // 2))
+    self.f_Rate     = max(1, i_Quota - self.i_Burst) / f_Period_s  # tokens per second
+    self.fn_Clock   = fn_Clock
+    self.o_Lock     = threading.Lock()
+
+    self.f_Tokens     = float(self.i_Burst)
+    self.f_LastRefill = fn_Clock()
+
+    # statistics
+    self.i_Used   = 0
+    self.i_Denied = 0
+
+  '''*****************************************************************
+  * Name: Refill
+  * Description: Adds the tokens earned since the last refill. Must be
+  *              called with the lock held.
+  * Parameters:  N/A
+  * Returns:     N/A (modifies class members)
+  *****************************************************************'''
+  def Refill(self):
+    f_Now = self.fn_Clock()
+    self.f_Tokens     = min(self.i_Burst, self.f_Tokens + (f_Now - self.f_LastRefill) * self.f_Rate)
+    self.f_LastRefill = f_Now
+
+  '''*****************************************************************
+  * Name: take
+  * Description: Spends a token if there is one.
+  * Parameters:  N/A
+  * Returns:     bool b_Allowed
+  *                   True if a request may be made now.
+  *****************************************************************'''
+  def take(self):
+    with self.o_Lock:
+      self.Refill()
+      if(self.f_Tokens < 1):
+        self.i_Denied += 1
+        return False
+      self.f_Tokens -= 1
+      self.i_Used   += 1
+      return True
+
+  '''*****************************************************************
+  * Name: GetWait
+  * Description: Returns how long until the next request is allowed.
+  * Parameters:  N/A
+  * Returns:     float f_Wait_s
+  *                    0 if a request is allowed now.
+  *****************************************************************'''
+  def GetWait(self):
+    with self.o_Lock:
+      self.Refill()
+      return max(0.0, (1 - self.f_Tokens) / self.f_Rate)
+
+'''*****************************************************************
+* Name: OpenMeteoIcon
+* Description: Maps a WMO weather code to the icon DarkSky would have
+*              shown, so the GUI keeps one set of icons.
+* Parameters:  int  i_Code
+*                   WMO weather code, None if missing.
+*              bool b_Day
+*                   Daytime, for the clear and partly cloudy icons.
+* Returns:     str  s_Icon
+*****************************************************************'''
+def OpenMeteoIcon(i_Code, b_Day):
+  if(i_Code == None):
+    return configs.s_DefaultIcon
+  if(i_Code in (0, 1)):
+    return "clear-day" if b_Day else "clear-night"
+  if(i_Code == 2):
+    return "partly-cloudy-day" if b_Day else "partly-cloudy-night"
+  if(i_Code == 3):
+    return "cloudy"
+  if(i_Code in (45, 48)):
+    return "fog"
+  if(i_Code in (56, 57, 66, 67)):
+    return "sleet"
+  if(71 <= i_Code <= 77 or i_Code in (85, 86)):
+    return "snow"
+  if(51 <= i_Code <= 99):
+    return "rain"
+  return configs.s_DefaultIcon
+
+'''*****************************************************************
+* Name: ParseOpenMeteoBlock
+* Description: Extracts an Open-Meteo block ("hourly" or "daily") into a
+*              series in DarkSky's units: the chance of rain as 0 to 1 and
+*              the rain as a rate per hour. Missing values default like
+*              they do for DarkSky.
+* Parameters:  dict  d_Block
+*                    The block, one list per variable.
+*              str   s_TemperatureField
+*                    Variable holding the temperature.
+*              str   s_ProbabilityField
+*                    Variable holding the chance of rain, in percent.
+*              str   s_RainField
+*                    Variable holding the rain over the period.
+*              float f_Hours
+*                    Length of the period, to turn the rain into a rate.
+* Returns:     obj   o_Series
+*                    ForecastSeries
+*****************************************************************'''
+def ParseOpenMeteoBlock(d_Block, s_TemperatureField, s_ProbabilityField, s_RainField, f_Hours):
+  o_Series = forecast_series.ForecastSeries()
+  i_Periods = len(d_Block["time"])
+  l_Missing = [None] * i_Periods
+  l_IsDay = d_Block.get("is_day", [1] * i_Periods)
+  for f_Time, f_Temperature, f_Probability, f_Rain, i_Code, i_IsDay in zip(
+      d_Block["time"], d_Block.get(s_TemperatureField, l_Missing), d_Block.get(s_ProbabilityField, l_Missing),
+      d_Block.get(s_RainField, l_Missing), d_Block.get("weather_code", l_Missing), l_IsDay):
+    o_Series.a_Time.append(f_Time)
+    o_Series.l_Icon.append(sys.intern(OpenMeteoIcon(i_Code, i_IsDay != 0)))
+    o_Series.a_Temperature.append(f_Temperature if f_Temperature != None else float("nan"))
+    o_Series.a_PrecipProbability.append(f_Probability / 100 if f_Probability != None else 0.0)
+    o_Series.a_PrecipIntensity.append(f_Rain / f_Hours if f_Rain != None else 0.0)
+  return o_Series
+
+# class for one weather API. subclasses build the request and parse the
+# response into a ParsedForecast; the base class makes the request and keeps
+# the statistics
+class Provider:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class Provider. Does not connect.
+  * Parameters:  str   s_Name
+  *              str   s_URL
+  *                    Full request URL.
+  *              int   i_Quota
+  *                    Requests the provider allows per period.
+  *              float f_Period_s
+  *                    Length of the quota period.
+  *              str   s_Exclude
+  *                    Blocks of the response to leave out, "" for none.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Name, s_URL, i_Quota, f_Period_s, s_Exclude = ""):
+    self.s_Name   = s_Name
+    self.o_Client = weather_client.WeatherClient(s_URL, s_Exclude = s_Exclude)
+    self.o_Budget = RequestBudget(i_Quota, f_Period_s)
+
+    # statistics
+    self.i_Requests      = 0
+    self.i_Failures      = 0
+    self.i_Wins          = 0   # requests whose forecast was the one used
+    self.i_Hedges        = 0   # requests made because another provider was slow
+    self.f_LastLatency_s = 0.0
+
+  '''*****************************************************************
+  * Name: Parse
+  * Description: Turns a decoded response into a forecast.
+  * Parameters:  dict d_Response
+  * Returns:     obj  o_Forecast
+  *                   ParsedForecast
+  *****************************************************************'''
+  def Parse(self, d_Response):
+    raise NotImplementedError
+
+  '''*****************************************************************
+  * Name: fetch
+  * Description: Requests and parses a forecast. Does not check the
+  *              budget, the caller spends the token.
+  * Parameters:  N/A
+  * Returns:     obj o_Forecast
+  *                  ParsedForecast, or None if the request failed.
+  *****************************************************************'''
+  def fetch(self):
+    f_Start = time.perf_counter()
+    self.i_Requests += 1
+    try:
+      o_Forecast = self.Parse(json.loads(self.o_Client.get().decode("utf-8")))
+    except (OSError, ValueError, KeyError, TypeError):
+      o_Forecast = None
+    self.f_LastLatency_s = time.perf_counter() - f_Start
+    if(o_Forecast == None):
+      self.i_Failures += 1
+      metrics.o_ProviderRequests.inc((self.s_Name, "failed"))
+    else:
+      metrics.o_ProviderRequests.inc((self.s_Name, "ok"))
+    return o_Forecast
+
+  '''*****************************************************************
+  * Name: GetStats
+  * Description: Returns the provider's statistics.
+  * Parameters:  N/A
+  * Returns:     dict d_Stats
+  *****************************************************************'''
+  def GetStats(self):
+    return {"i_Requests":      self.i_Requests,
+            "i_Failures":      self.i_Failures,
+            "i_Wins":          self.i_Wins,
+            "i_Hedges":        self.i_Hedges,
+            "i_OverBudget":    self.o_Budget.i_Denied,
+            "f_LastLatency_s": self.f_LastLatency_s}
+
+# the DarkSky API. its response is the format the system was written for
+class DarkSkyProvider(Provider):
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class DarkSkyProvider
+  * Parameters:  str   s_Name
+  *              str   s_URL
+  *                    Forecast URL, key and location included.
+  *              int   i_Quota
+  *              float f_Period_s
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Name, s_URL, i_Quota, f_Period_s):
+    Provider.__init__(self, s_Name, s_URL, i_Quota, f_Period_s, configs.s_ApiExclude)
+
+  '''*****************************************************************
+  * Name: Parse
+  * Description: Parses a DarkSky response.
+  * Parameters:  dict d_Response
+  * Returns:     obj  o_Forecast
+  *                   ParsedForecast
+  *****************************************************************'''
+  def Parse(self, d_Response):
+    return forecast_series.ParseDarkSky(d_Response)
+
+# the Open-Meteo API. it needs no key and is asked for the same units and
+# spans as DarkSky: fahrenheit, inches, 48 hours from now and 8 days
+class OpenMeteoProvider(Provider):
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class OpenMeteoProvider
+  * Parameters:  str   s_Name
+  *              str   s_URL
+  *                    Forecast endpoint, without a query.
+  *              int   i_Quota
+  *              float f_Period_s
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, s_Name, s_URL, i_Quota, f_Period_s):
+    s_Latitude, s_Longitude = configs.s_GPSLocation_LatLon.split(",")
+    for s_Parameter, s_Value in (("latitude",           s_Latitude.strip()),
+                                 ("longitude",          s_Longitude.strip()),
+                                 ("hourly",             "temperature_2m,precipitation_probability,precipitation,weather_code,is_day"),
+                                 ("daily",              "temperature_2m_max,precipitation_probability_max,precipitation_sum,weather_code"),
+                                 ("temperature_unit",   "fahrenheit"),
+                                 ("precipitation_unit", "inch"),
+                                 ("timeformat",         "unixtime"),
+                                 ("timezone",           "auto"),
+                                 ("forecast_hours",     "49"),
+                                 ("forecast_days",      "8")):
+      s_URL = weather_client.AddQuery(s_URL, s_Parameter, s_Value)
+    Provider.__init__(self, s_Name, s_URL, i_Quota, f_Period_s)
+
+  '''*****************************************************************
+  * Name: Parse
+  * Description: Parses an Open-Meteo response. Rain is given per hour and
+  *              per day, so the daily amount is spread over 24 hours.
+  * Parameters:  dict d_Response
+  * Returns:     obj  o_Forecast
+  *                   ParsedForecast
+  *****************************************************************'''
+  def Parse(self, d_Response):
+    return forecast_series.ParsedForecast(
+      ParseOpenMeteoBlock(d_Response["hourly"], "temperature_2m", "precipitation_probability", "precipitation", 1),
+      ParseOpenMeteoBlock(d_Response["daily"], "temperature_2m_max", "precipitation_probability_max",
+                          "precipitation_sum", 24))
+
+# provider names used in configs.l_WeatherProviders
+d_ProviderTypes = {"darksky":   DarkSkyProvider,
+                   "openmeteo": OpenMeteoProvider}
+
+# class to get a forecast from the first provider that can give one. providers
+# are asked in order; the next one is asked when one fails or is out of budget,
+# and also, if hedging is on, when one hasn't answered after f_HedgeDelay_s.
+# the first forecast to come back is used and the slower request is left to
+# finish on its own
+class WeatherProviders:
+
+  '''*****************************************************************
+  * Name: __init__
+  * Description: Constructor for class WeatherProviders
+  * Parameters:  list  l_Providers
+  *                    (provider, URL, quota, quota period) of each
+  *                    provider, in order of preference.
+  *              float f_HedgeDelay_s
+  *                    Wait before asking the next provider as well, None
+  *                    to only move on once a provider fails.
+  * Returns:     N/A
+  *****************************************************************'''
+  def __init__(self, l_Providers = configs.l_WeatherProviders, f_HedgeDelay_s = configs.f_ProviderHedgeDelay_s):
+    self.l_Config       = l_Providers
+    self.f_HedgeDelay_s = f_HedgeDelay_s
+    self.l_Providers    = [d_ProviderTypes[s_Type](s_Type, s_URL, i_Quota, f_Period_s)
+                           for s_Type, s_URL, i_Quota, f_Period_s in l_Providers]
+    self.o_Executor = concurrent.futures.ThreadPoolExecutor(max_workers = len(self.l_Providers),
+                                                            thread_name_prefix = "weather")
+    self.d_InFlight = {}  # provider name -> future of its last request
+
+  '''*****************************************************************
+  * Name: NextProvider
+  * Description: Finds the next provider that may be asked now: one that
+  *              isn't still busy with an earlier request and has budget.
+  * Parameters:  int i_Next
+  *                  Index to start looking at.
+  * Returns:     obj o_Provider
+  *                  Provider, or None if none is left.
+  *              int i_Next
+  *                  Index to look from next time.
+  *****************************************************************'''
+  def NextProvider(self, i_Next):
+    while(i_Next < len(self.l_Providers)):
+      o_Provider = self.l_Providers[i_Next]
+      i_Next += 1
+      o_InFlight = self.d_InFlight.get(o_Provider.s_Name)
+      if(o_InFlight != None and not o_InFlight.done()):
+        continue
+      if(not o_Provider.o_Budget.take()):
+        metrics.o_ProviderRequests.inc((o_Provider.s_Name, "over_budget"))
+        continue
+      return o_Provider, i_Next
+    return None, i_Next
+
+  '''*****************************************************************
+  * Name: fetch
+  * Description: Gets a forecast, moving down the providers as they fail,
+  *              run out of budget or are slow.
+  * Parameters:  N/A
+  * Returns:     obj o_Forecast
+  *                  ParsedForecast, or None if no provider gave one.
+  *****************************************************************'''
+  def fetch(self):
+    d_Pending = {}  # future -> provider
+    i_Next    = 0
+    while(True):
+      o_Provider, i_Next = self.NextProvider(i_Next)
+      if(o_Provider != None):
+        if(len(d_Pending) > 0):
+          o_Provider.i_Hedges += 1
+        o_Future = self.o_Executor.submit(o_Provider.fetch)
+        self.d_InFlight[o_Provider.s_Name] = o_Future
+        d_Pending[o_Future] = o_Provider
+      if(len(d_Pending) == 0):
+        return None
+
+      # only wait out the hedge delay if there is a provider left to hedge with
+      f_Timeout = self.f_HedgeDelay_s if i_Next < len(self.l_Providers) else None
+      s_Done, s_NotDone = concurrent.futures.wait(d_Pending, timeout = f_Timeout,
+                                                  return_when = concurrent.futures.FIRST_COMPLETED)
+      for o_Future in s_Done:
+        o_Provider = d_Pending.pop(o_Future)
+        o_Forecast = o_Future.result()
+        if(o_Forecast != None):
+          o_Provider.i_Wins += 1
+          return o_Forecast
+
+  '''*****************************************************************
+  * Name: close
+  * Description: Closes every provider's connection. Requests still
+  *              running are not waited on.
+  * Parameters:  N/A
+  * Returns:     N/A
+  *****************************************************************'''
+  def close(self):
+    self.o_Executor.shutdown(wait = False)
+    for o_Provider in self.l_Providers:
+      o_Provider.o_Client.close()
+
+  '''*****************************************************************
+  * Name: GetStats
+  * Description: Returns the statistics of every provider.
+  * Parameters:  N/A
+  * Returns:     dict d_Stats
+  *                   Provider statistics keyed by provider name.
+  *****************************************************************'''
+  def GetStats(self):
+    return {o_Provider.s_Name: o_Provider.GetStats() for o_Provider in self.l_Providers}
+
+################################## end file ###################################